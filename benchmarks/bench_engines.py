@@ -0,0 +1,134 @@
+"""
+route-1-dijkistra search engines compared on one map and one points file.
+
+Without --map the map is a generators.road_network grid (10 % one-way)
+covering the points, --size cells on its longer side; the repository only
+ships the points file, usina_para_talhoes.json. Every engine routes the
+same queries, grouped by origin as the package does.
+
+Stages, per engine:
+  <engine>.prepare  prepare_engine (contraction hierarchies for ch)  (items: nodes)
+  <engine>.route    one sample per origin (run_route_tasks)          (items: queries)
+
+<engine>.route counters: max_length_diff_m, the largest route length
+difference from the first engine, and reachability_mismatches, the
+queries that one of the two engines could not route.
+
+    python3 benchmarks/bench_engines.py --size medium --engines dijkstra,ch
+    python3 benchmarks/bench_engines.py --map roads.geojson
+"""
+import json
+import math
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "route-1-dijkistra" / "dist"
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(DIST))
+
+from generators import METERS_PER_DEGREE, road_network  # noqa: E402
+from harness import BenchmarkRun, bench_arguments, quiet  # noqa: E402
+
+# cells on the longer side of the synthetic grid
+SIZES = {
+    "small": {"grid": 40},
+    "medium": {"grid": 80},
+    "large": {"grid": 160},
+}
+MODULES = ("networkx", "numpy", "shapely", "scipy")
+
+
+def synthetic_grid(points, cells, seed):
+    """generators.road_network grid covering the points, cells cells on its longer side."""
+    lons = [p[end]["point"][0] for p in points for end in ("from", "to")]
+    lats = [p[end]["point"][1] for p in points for end in ("from", "to")]
+    min_lon, max_lon = min(lons) - 0.01, max(lons) + 0.01
+    min_lat, max_lat = min(lats) - 0.01, max(lats) + 0.01
+    width_m = (max_lon - min_lon) * METERS_PER_DEGREE * math.cos(math.radians(min_lat))
+    height_m = (max_lat - min_lat) * METERS_PER_DEGREE
+    return road_network(cells, "grid", seed, origin=(min_lon, min_lat),
+                        spacing_m=max(width_m, height_m) / cells)
+
+
+def route_tasks(graph, points):
+    """(origin snap, destination snaps) per distinct origin, as package.process groups them."""
+    from shapely.geometry import Point
+
+    from overlay import snap_point
+
+    groups = {}
+    for points_element in points:
+        groups.setdefault(tuple(points_element["from"]["point"][:2]), []).append(points_element)
+    return [(snap_point(graph, Point(origin)),
+             [snap_point(graph, Point(el["to"]["point"][:2])) for el in elements])
+            for origin, elements in groups.items()]
+
+
+def bench_engines(run, a_map, points, engines, options):
+    from package import load_compiled_graph
+    from parallel import prepare_engine, run_route_tasks
+
+    with quiet():
+        graph = load_compiled_graph(a_map, options)
+    run.params["nodes"] = graph.number_of_nodes
+    run.params["edges"] = graph.number_of_edges
+    tasks = route_tasks(graph, points)
+    queries = sum(len(destinations) for _, destinations in tasks)
+    run.params["queries"] = queries
+
+    reference = None
+    for engine in engines:
+        with quiet():
+            run.measure(f"{engine}.prepare", lambda: prepare_engine(graph, engine),
+                        items=graph.number_of_nodes, repeat=1)
+        lengths = []
+        with run.stage(f"{engine}.route", items=queries) as stage:
+            for task in tasks:
+                with stage.op():
+                    group, = run_route_tasks(graph, [task], 1, engine)
+                lengths.extend(route[0] if route else None for route in group)
+            if reference is None:
+                reference = lengths
+            stage.counters["max_length_diff_m"] = max(
+                (abs(a - b) for a, b in zip(reference, lengths) if a is not None and b is not None),
+                default=0.0)
+            stage.counters["reachability_mismatches"] = sum(
+                (a is None) != (b is None) for a, b in zip(reference, lengths))
+
+
+def main(argv=None):
+    from parallel import ENGINES
+
+    parser = bench_arguments("route-1-dijkistra search engine benchmark", SIZES)
+    parser.add_argument("--map", help="road GeoJSON (default: synthetic grid)")
+    parser.add_argument("--points", default=str(DIST / "usina_para_talhoes.json"), help="points file")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma-separated engines")
+    parser.add_argument("--no_simplify", action="store_true", help="skip degree-2 simplification")
+    args = parser.parse_args(argv)
+
+    with open(args.points, "r", encoding="utf-8") as f:
+        points = json.load(f)
+    if args.map:
+        with open(args.map, "r", encoding="utf-8") as f:
+            a_map = json.load(f)
+    else:
+        a_map = synthetic_grid(points, SIZES[args.size]["grid"], args.seed)
+
+    engines = args.engines.split(",")
+    run = BenchmarkRun("engines", args.size, args.seed,
+                       dict(map=args.map or "grid", points=Path(args.points).name, engines=engines,
+                            simplify=not args.no_simplify), MODULES)
+    bench_engines(run, a_map, points, engines, {"cache": False, "simplify": not args.no_simplify})
+    run.print_table()
+    for engine in engines:
+        counters = run.stages[f"{engine}.route"]["counters"]
+        print(f"  {engine}: max length diff {counters['max_length_diff_m']:.2e} m, "
+              f"{counters['reachability_mismatches']} reachability mismatch(es)")
+    if args.json:
+        run.write_json(args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+inventory-prediction-1-xgboost benchmark on synthetic store x item daily
+sales, with PostgreSQL replaced by stubs.StubDatabase.
+
+Stages:
+  ingest.records            TrainingSource(records).load()       (items: rows)
+  ingest.json               read_payload() + load(), streamed     (items: rows)
+  ingest.npy                TrainingSource(npy dir).load()        (items: rows)
+  features                  prepare() on a copy of the frame      (items: rows)
+  train.memory              train_in_memory                        (items: rows)
+  train.chunked             fit_scaler_chunked + train_chunked     (items: rows)
+  generate_future_dataframe grid of the first scenario             (items: grid rows)
+  predict                   predict_scenarios, all scenarios       (items: grid rows)
+  export.<format>           PredictionExporter, one file/scenario  (items: rows)
+  db                        write_inference_results + model_mean   (items: rows)
+  process                   package.process end to end             (items: training rows)
+
+ingest.records and ingest.json build one dict per record, so the "large"
+preset skips them. process reads the .npy columns and writes its Parquet
+predictions to /tmp/is, like the package does.
+
+    python3 benchmarks/bench_inventory.py --size medium --json inventory.json
+"""
+import calendar
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "inventory-prediction-1-xgboost" / "dist"
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(DIST))
+
+from generators import future_scenarios, sales_history, sales_records  # noqa: E402
+from harness import BenchmarkRun, bench_arguments, quiet  # noqa: E402
+from stubs import StubDatabase  # noqa: E402
+
+SIZES = {
+    "small": {"stores": 10, "items": 50, "days": 365, "scenarios": 2, "records": True},
+    "medium": {"stores": 10, "items": 100, "days": 730, "scenarios": 3, "records": True},
+    "large": {"stores": 20, "items": 250, "days": 730, "scenarios": 6, "records": False},
+}
+MODULES = ("numpy", "pandas", "xgboost", "scikit-learn", "pyarrow")
+
+
+def write_npy(columns, directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, values in columns.items():
+        np.save(directory / f"{name}.npy", values)
+    return directory
+
+
+def main(argv=None):
+    parser = bench_arguments("inventory-prediction-1-xgboost benchmark", SIZES)
+    parser.add_argument("--training", default="memory,chunked", help="training modes to time (memory, chunked)")
+    parser.add_argument("--formats", default="xlsx,parquet", help="export formats to time")
+    args = parser.parse_args(argv)
+
+    import package
+    from db import write_inference_results, write_model_mean
+    from export import PredictionExporter
+    from ingest import TrainingSource, read_payload
+    from inference import predict_scenarios
+    from training import TrainingSummary, fit_scaler_chunked, prepare, train_chunked, train_in_memory
+
+    preset = SIZES[args.size]
+    run = BenchmarkRun("inventory-prediction-1-xgboost", args.size, args.seed,
+                       dict(preset, training=args.training, formats=args.formats, repeat=args.repeat), MODULES)
+    columns = sales_history(preset["stores"], preset["items"], preset["days"], seed=args.seed)
+    scenarios = future_scenarios(preset["scenarios"])
+    n_rows = len(columns["date"])
+    run.params["rows"] = n_rows
+
+    with tempfile.TemporaryDirectory(prefix="bench-inventory-") as workdir:
+        workdir = Path(workdir)
+        npy_dir = write_npy(columns, workdir / "train")
+
+        if preset["records"]:
+            records = sales_records(columns)
+            run.measure("ingest.records", lambda: TrainingSource(records).load(), items=n_rows, repeat=args.repeat)
+            payload = workdir / "payload.json"
+            payload.write_text(json.dumps({"train": records, "future": scenarios}))
+            del records
+            run.measure("ingest.json", lambda: read_payload(payload)["train"].load(), items=n_rows, repeat=1)
+
+        df = run.measure("ingest.npy", lambda: TrainingSource(str(npy_dir)).load(), items=n_rows, repeat=args.repeat)
+        df = run.measure("features", lambda: prepare(df.copy()), items=n_rows, repeat=args.repeat)
+        summary = TrainingSummary()
+        summary.add(df)
+
+        modes = args.training.split(",")
+        trained = None
+        if "memory" in modes:
+            trained = run.measure("train.memory", lambda: train_in_memory(df), items=len(df), repeat=1)
+        if "chunked" in modes:
+            def chunked():
+                source = TrainingSource(str(npy_dir))
+                scaler, feature_cols = fit_scaler_chunked(source)
+                return train_chunked(source, scaler, feature_cols, cache_dir=str(workdir / "xgboost"))
+            result = run.measure("train.chunked", chunked, items=n_rows, repeat=1)
+            trained = trained or result
+        if trained is None:
+            parser.error("--training needs memory and/or chunked")
+        model, scaler, feature_cols, _ = trained
+        del df
+
+        pairs = len(summary.stores) * len(summary.items)
+        first = scenarios[0]
+        pairs_df = pd.DataFrame({"store": np.repeat(summary.stores, len(summary.items)),
+                                 "item": np.tile(summary.items, len(summary.stores))})
+        run.measure("generate_future_dataframe",
+                    lambda: package.generate_future_dataframe(first["future_month"], first["future_year"], pairs_df),
+                    items=pairs * _days(first), repeat=args.repeat)
+
+        predictions = run.measure(
+            "predict", lambda: predict_scenarios(model, scaler, feature_cols, summary.stores, summary.items, scenarios),
+            items=sum(pairs * _days(s) for s in scenarios), repeat=args.repeat)
+        output_rows = sum(len(p) for p in predictions)
+
+        for fmt in args.formats.split(","):
+            def export(fmt=fmt):
+                with PredictionExporter(fmt, str(workdir / "out"), "fp") as exporter:
+                    for idx, (scenario, agg_df) in enumerate(zip(scenarios, predictions)):
+                        exporter.add(idx, scenario, agg_df)
+            run.measure(f"export.{fmt}", export, items=output_rows, repeat=args.repeat)
+
+        database = StubDatabase()
+
+        def write_db():
+            with database.connection() as conn, conn.cursor() as cur:
+                for idx, (scenario, agg_df) in enumerate(zip(scenarios, predictions)):
+                    write_inference_results(cur, idx + 1, agg_df)
+                    write_model_mean(cur, 1, summary.hist_mean(scenario["future_month"]))
+        run.measure("db", write_db, items=output_rows, repeat=args.repeat)
+        run.stages["db"]["counters"] = database.counters()
+
+        # End to end, with the connection pool replaced by the stub
+        database = StubDatabase()
+        package.connection = database.connection
+        options = {"model_cache": False, "instrumentation": False}
+        output = {"output_type": "parquet", "file_name": "bench"}
+        with quiet():
+            run.measure("process", lambda: package.process(str(npy_dir), scenarios, options, output),
+                        items=n_rows, repeat=1)
+        run.stages["process"]["counters"] = database.counters()
+
+    run.print_table()
+    if args.json:
+        run.write_json(args.json)
+    return run
+
+
+def _days(scenario):
+    return calendar.monthrange(int(scenario["future_year"]), int(scenario["future_month"]))[1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+route-1-dijkistra benchmark on synthetic grid and rural road networks.
+
+Stages, for each network kind (prefixed "grid." or "rural."):
+  parse              json.loads of the serialized map            (items: features)
+  geojson_dict_to_G  map dict -> nx.DiGraph                      (items: features)
+  build              build_graph, with degree-2 simplification   (items: features)
+  compile            CompiledGraph.from_networkx                 (items: nodes)
+  cache_put/get      GraphCache write, then memory-mapped read   (items: nodes)
+  edge_index         spatial index used to snap points           (items: edges)
+  snap               one sample per distinct point               (items: points)
+  route.<engine>     one sample per origin (route_group)         (items: queries)
+  write              every route through a RouteWriter (GPX)     (items: routes)
+
+    python3 benchmarks/bench_route.py --size medium --json route.json
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "route-1-dijkistra" / "dist"
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(DIST))
+
+from generators import od_pairs, road_network  # noqa: E402
+from harness import BenchmarkRun, bench_arguments, quiet  # noqa: E402
+
+# kind -> lattice size, plus origins x destinations per origin
+SIZES = {
+    "small": {"grid": 40, "rural": 12, "origins": 5, "destinations": 20},
+    "medium": {"grid": 120, "rural": 40, "origins": 20, "destinations": 50},
+    "large": {"grid": 300, "rural": 100, "origins": 50, "destinations": 100},
+}
+MODULES = ("networkx", "numpy", "shapely", "scipy")
+
+
+def bench_network(run, kind, preset, seed, repeat, engines, workdir):
+    from shapely.geometry import Point
+
+    from graph_cache import CompiledGraph, GraphCache, map_digest
+    from overlay import snap_point
+    from package import build_graph, geojson_dict_to_G
+    from parallel import prepare_engine, route_group
+    from route_writer import RouteWriter
+
+    network = road_network(preset[kind], kind, seed)
+    points = od_pairs(network, preset["origins"], preset["destinations"], seed)
+    text = json.dumps(network)
+    n_features = len(network["features"])
+    run.params[f"{kind}.features"] = n_features
+    run.params[f"{kind}.map_bytes"] = len(text)
+
+    run.measure(f"{kind}.parse", lambda: json.loads(text), items=n_features, repeat=repeat)
+    G = run.measure(f"{kind}.geojson_dict_to_G", lambda: geojson_dict_to_G(network),
+                    items=n_features, repeat=repeat)
+    run.params[f"{kind}.raw_nodes"] = G.number_of_nodes()
+    del G
+    with quiet():
+        G = run.measure(f"{kind}.build", lambda: build_graph(network), items=n_features, repeat=repeat)
+    graph = run.measure(f"{kind}.compile", lambda: CompiledGraph.from_networkx(G),
+                        items=G.number_of_nodes(), repeat=repeat)
+    del G
+    run.params[f"{kind}.nodes"] = graph.number_of_nodes
+    run.params[f"{kind}.edges"] = graph.number_of_edges
+
+    cache = GraphCache(Path(workdir) / f"graphs-{kind}")
+    key = map_digest(network, {"kind": kind})
+    run.measure(f"{kind}.cache_put", lambda: cache.put(key, graph), items=graph.number_of_nodes, repeat=1)
+    cached = run.measure(f"{kind}.cache_get", lambda: cache.get(key), items=graph.number_of_nodes, repeat=repeat)
+    run.measure(f"{kind}.edge_index", cached.edge_index, items=cached.number_of_edges, repeat=1)
+    graph = cached
+
+    coords = list(dict.fromkeys(tuple(el[end]["point"]) for el in points for end in ("from", "to")))
+    snaps = {}
+    with run.stage(f"{kind}.snap", items=len(coords)) as stage:
+        for coord in coords:
+            with stage.op():
+                snaps[coord] = snap_point(graph, Point(coord))
+        stage.counters["unsnapped"] = sum(snap is None for snap in snaps.values())
+
+    groups = {}
+    for el in points:
+        groups.setdefault(tuple(el["from"]["point"]), []).append(tuple(el["to"]["point"]))
+    tasks = [(snaps[origin], [snaps[d] for d in dests]) for origin, dests in groups.items()]
+
+    routes = []
+    for engine in engines:
+        with quiet():
+            run.measure(f"{kind}.prepare.{engine}", lambda: prepare_engine(graph, engine), repeat=1)
+        found = []
+        with run.stage(f"{kind}.route.{engine}", items=len(points)) as stage:
+            for origin_snap, dest_snaps in tasks:
+                with stage.op():
+                    found.extend(route_group(graph, origin_snap, dest_snaps, engine))
+            stage.counters["unreachable"] = sum(route is None for route in found)
+        routes = routes or [route for route in found if route is not None]
+
+    out = Path(workdir) / f"routes-{kind}"
+    out.mkdir(exist_ok=True)
+
+    def write():
+        with RouteWriter("gpx", combine=True, combined_path=str(out / "route")) as writer:
+            for n, (distance_m, rota) in enumerate(routes):
+                writer.add(rota, name=f"route {n}", properties={"distance_m": distance_m})
+
+    run.measure(f"{kind}.write", write, items=len(routes), repeat=repeat)
+
+
+def main(argv=None):
+    parser = bench_arguments("route-1-dijkistra benchmark", SIZES)
+    parser.add_argument("--kinds", default="grid,rural", help="network kinds (grid, rural)")
+    parser.add_argument("--engines", default="dijkstra,ch",
+                        help="search engines to time (dijkstra, bidirectional, astar, ch)")
+    args = parser.parse_args(argv)
+
+    preset = SIZES[args.size]
+    engines = args.engines.split(",")
+    run = BenchmarkRun("route-1-dijkistra", args.size, args.seed,
+                       dict(preset, engines=engines, repeat=args.repeat), MODULES)
+    with tempfile.TemporaryDirectory(prefix="bench-route-") as workdir:
+        for kind in args.kinds.split(","):
+            bench_network(run, kind, preset, args.seed, args.repeat, engines, workdir)
+
+    run.print_table()
+    if args.json:
+        run.write_json(args.json)
+    return run
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+scicrop-api benchmark on synthetic labelled fields, with the SciCrop API
+replaced by stubs.StubSciCropClient and the databases by stubs.StubOrm.
+Needs the infinitestack package, which package.py imports.
+
+Stages:
+  requests.<mode>   iter_request_data for each sampling mode, and for
+                    vertices snapped to --grid                 (items: features)
+  fetch             Fetcher.fetch_all, one sample per endpoint call,
+                    retries and backoff included               (items: requests)
+  fetch.cold/warm   the same through a ResponseCache, first empty and
+                    then filled                                (items: requests)
+  write             BatchWriter to two databases               (items: records)
+  pipeline          save_database end to end                   (items: requests)
+
+The fetch stages use the "--fetch_sampling" requests (default centroid),
+so the stub latency does not dominate the run.
+
+    python3 benchmarks/bench_scicrop.py --size medium --latency 0.05 --json scicrop.json
+"""
+import json
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "scicrop-api" / "dist"
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(DIST))
+
+from generators import label_geojson  # noqa: E402
+from harness import BenchmarkRun, bench_arguments, quiet  # noqa: E402
+from stubs import StubOrm, StubSciCropClient  # noqa: E402
+
+SIZES = {
+    "small": {"features": 200, "labels": 20},
+    "medium": {"features": 2000, "labels": 100},
+    "large": {"features": 20000, "labels": 500},
+}
+MODULES = ()
+DATABASES = ("bench-1", "bench-2")
+
+
+def main(argv=None):
+    parser = bench_arguments("scicrop-api benchmark", SIZES)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub API latency in seconds")
+    parser.add_argument("--failure_rate", type=float, default=0.02, help="share of failed stub API calls")
+    parser.add_argument("--max_workers", type=int, default=8)
+    parser.add_argument("--batch_size", type=int, default=500)
+    parser.add_argument("--grid", type=float, default=0.001, help="grid of the snapped requests, in degrees")
+    parser.add_argument("--fetch_sampling", default="centroid", help="requests used by the fetch stages")
+    args = parser.parse_args(argv)
+
+    import package
+    from fetch import Fetcher, ResponseCache
+    from sampling import SAMPLING_MODES
+    from writer import BatchWriter
+
+    preset = SIZES[args.size]
+    run = BenchmarkRun("scicrop-api", args.size, args.seed,
+                       dict(preset, latency=args.latency, failure_rate=args.failure_rate,
+                            max_workers=args.max_workers, batch_size=args.batch_size, grid=args.grid,
+                            fetch_sampling=args.fetch_sampling, repeat=args.repeat), MODULES)
+    geojson = label_geojson(preset["features"], preset["labels"], args.seed)
+
+    class TimedFetcher(Fetcher):
+        """Fetcher that keeps the duration of every fetch() call."""
+
+        def __init__(self, stage, **kwargs):
+            super().__init__(**kwargs)
+            self.stage = stage
+
+        def fetch(self, data):
+            start = time.perf_counter()
+            try:
+                return super().fetch(data)
+            finally:
+                self.stage.add_sample(time.perf_counter() - start)
+
+    def fetcher(stage, cache=None):
+        StubSciCropClient.reset()
+        return TimedFetcher(stage, max_workers=args.max_workers, rate_limit=0, backoff=0.01, cache=cache,
+                            client_factory=lambda: StubSciCropClient(args.latency, failure_rate=args.failure_rate,
+                                                                     seed=args.seed))
+
+    # iter_request_data reads /tmp/is/<workflow_id>.json
+    workflow_id = f"bench-scicrop-{args.size}-{args.seed}"
+    path = Path(f"/tmp/is/{workflow_id}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(geojson))
+    try:
+        requests = {}
+        for mode in SAMPLING_MODES:
+            requests[mode] = run.measure(f"requests.{mode}",
+                                         lambda: package.process_request_data(workflow_id, mode),
+                                         items=preset["features"], repeat=args.repeat)
+            run.stages[f"requests.{mode}"]["counters"] = {"requests": len(requests[mode])}
+        snapped = run.measure("requests.vertices_grid",
+                              lambda: package.process_request_data(workflow_id, "vertices", args.grid),
+                              items=preset["features"], repeat=args.repeat)
+        run.stages["requests.vertices_grid"]["counters"] = {"requests": len(snapped)}
+
+        data_list = requests[args.fetch_sampling]
+        with quiet(), run.stage("fetch", items=len(data_list)) as stage:
+            responses = list(fetcher(stage).fetch_all(data_list))
+
+        with tempfile.TemporaryDirectory(prefix="bench-scicrop-") as workdir:
+            cache = ResponseCache(str(Path(workdir) / "cache.sqlite"), ttl=3600)
+            for name in ("fetch.cold", "fetch.warm"):
+                with quiet(), run.stage(name, items=len(data_list)) as stage:
+                    list(fetcher(stage, cache).fetch_all(data_list))
+            cache.close()
+
+        orms = [StubOrm(database) for database in DATABASES]
+        records = [dict(response, label=data["label"]) for data, response in responses]
+
+        def write():
+            with BatchWriter(orms, args.batch_size) as writer:
+                for record in records:
+                    writer.add(record)
+        with quiet():
+            run.measure("write", write, items=len(records), repeat=args.repeat)
+
+        # End to end, with infinitestack.orm replaced by the stub
+        package.orm = types.SimpleNamespace(Orm=StubOrm)
+        with quiet(), run.stage("pipeline", items=len(data_list)) as stage:
+            package.save_database(package.iter_request_data(workflow_id, args.fetch_sampling),
+                                  DATABASES, "bench", fetcher(stage), args.batch_size)
+    finally:
+        path.unlink()
+
+    run.print_table()
+    if args.json:
+        run.write_json(args.json)
+    return run
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Startup time of the package executors: a fresh interpreter that runs
+`import package` in the package dist, as the platform does before every
+block. Nothing is executed past the import, so no data is needed.
+
+Stages (per package: route, inventory, scicrop):
+  interpreter              python3 -c pass, the floor of any process
+  <package>.import         import package, from python3 -X importtime
+  <package>.import.<root>  the part of it spent in one top-level module
+                           (numpy, xgboost, a dist module...), all its
+                           submodules included; the --top heaviest
+
+peak_rss_mb of <package>.import is the child's peak RSS after the import.
+A package whose median import is above its budget (BUDGETS, or
+--budget_ms for all) is reported on stderr and the exit status is 1, so
+the benchmark can gate a change that puts a heavy import back on the
+startup path. A package whose dependencies are not installed is skipped
+with a note.
+
+    python3 benchmarks/bench_startup.py --size medium route inventory
+"""
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from harness import BenchmarkRun, bench_arguments  # noqa: E402
+
+EXAMPLES = HERE.parent / "examples"
+PACKAGES = {
+    "route": EXAMPLES / "route-1-dijkistra" / "dist",
+    "inventory": EXAMPLES / "inventory-prediction-1-xgboost" / "dist",
+    "scicrop": EXAMPLES / "scicrop-api" / "dist",
+}
+# Median `import package` budget, in milliseconds. inventory is bound by
+# pandas: xgboost, scikit-learn, holidays and psycopg2 load on first use.
+BUDGETS = {"route": 500, "inventory": 1000, "scicrop": 500}
+SIZES = {
+    "small": {"runs": 5},
+    "medium": {"runs": 10},
+    "large": {"runs": 25},
+}
+MODULES = ()
+PROBE = ("import resource; import package; "
+         "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(stderr):
+    """
+    Parses -X importtime: (cumulative seconds of `package`, {root module:
+    seconds}). Only the imports made under package count, and each root
+    gets the self time of all its submodules.
+    """
+    total = None
+    roots = defaultdict(float)
+    pending = defaultdict(float)
+    for line in stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        pending[module.split(".")[0]] += int(self_us) / 1e6
+        # A module is printed after its own imports, one level deeper
+        if len(indent) == 1:
+            if module == "package":
+                total, roots = int(cumulative_us) / 1e6, pending
+            pending = defaultdict(float)
+    return total, dict(roots)
+
+
+def probe(dist):
+    """One fresh process importing package: (total s, {root: s}, peak RSS MiB)."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE],
+                               cwd=dist, capture_output=True, text=True)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"exit status {completed.returncode}")
+    total, roots = import_profile(completed.stderr)
+    return total, roots, int(completed.stdout.split()[-1]) / 1024
+
+
+def interpreter_startup(runs):
+    """Wall time of python3 -c pass, process creation included."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(argv=None):
+    parser = bench_arguments("package executor startup benchmark", SIZES)
+    parser.add_argument("packages", nargs="*", metavar="package",
+                        help=f"packages to run: {', '.join(PACKAGES)} (default: all)")
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level modules kept per package")
+    parser.add_argument("--budget_ms", type=float, help="import budget of every package (default: BUDGETS)")
+    args = parser.parse_args(argv)
+    unknown = set(args.packages) - set(PACKAGES)
+    if unknown:
+        parser.error(f"unknown package(s): {', '.join(sorted(unknown))}")
+
+    # --repeat only raises the number of processes of the size preset
+    runs = max(SIZES[args.size]["runs"], args.repeat)
+    run = BenchmarkRun("startup", args.size, args.seed, dict(runs=runs, budget_ms=args.budget_ms), MODULES)
+    run.add("interpreter", interpreter_startup(runs))
+
+    over_budget = []
+    for name in args.packages or PACKAGES:
+        try:
+            profiles = [probe(PACKAGES[name]) for _ in range(runs)]
+        except RuntimeError as error:
+            print(f"{name}: skipped ({error})", file=sys.stderr)
+            continue
+        totals = [total for total, _, _ in profiles]
+        budget = args.budget_ms or BUDGETS[name]
+        median_ms = statistics.median(totals) * 1000
+        run.add(f"{name}.import", totals, peak_rss_mb=max(rss for _, _, rss in profiles),
+                counters={"budget_ms": budget, "over_budget": median_ms > budget})
+        if median_ms > budget:
+            over_budget.append(f"{name}: import package {median_ms:.0f} ms > budget {budget:.0f} ms")
+
+        roots = defaultdict(list)
+        for _, profile, _ in profiles:
+            for root, seconds in profile.items():
+                roots[root].append(seconds)
+        heaviest = sorted(roots, key=lambda root: statistics.median(roots[root]), reverse=True)
+        for root in heaviest[:args.top]:
+            run.add(f"{name}.import.{root}", roots[root])
+
+    run.print_table()
+    if args.json:
+        run.write_json(args.json)
+    for message in over_budget:
+        print(message, file=sys.stderr)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Checks that inventory-prediction-1-xgboost's bulk database writes store
+the same rows as the per-row INSERTs they replaced:
+
+  inference_results  db.write_inference_results (COPY in batches of
+                     --batch_rows) vs one INSERT per row
+  model_mean         db.write_model_mean (execute_values, PAGE_SIZE rows
+                     per page) vs one INSERT per row
+
+Needs a PostgreSQL server: the DSN comes from --dsn or IS_DB_DSN, and
+without one the check is skipped (exit status 0). Both paths write to
+temporary tables (ON COMMIT DROP) on a connection borrowed from db's pool,
+which shadow any inference_results / model_mean of the database, so
+nothing is left behind. Rows are compared exactly, floats included; any
+difference is printed and the exit status is 1.
+
+    IS_DB_DSN="dbname=isdb user=is host=localhost" python3 benchmarks/check_db.py
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "inventory-prediction-1-xgboost" / "dist"
+sys.path.insert(0, str(DIST))
+
+TABLES = {
+    "inference_results": "inference_id integer, inference_key text, predicted_value double precision",
+    "model_mean": "model_id integer, inference_key text, mean_value double precision",
+}
+INFERENCE_ID = 7
+MODEL_ID = 3
+
+
+def predictions(rows, items, seed):
+    """agg_df as package.py hands it to the writers: store, item, predicted_sales."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    sales = rng.gamma(2.0, 40.0, rows)
+    # Values whose text form is easy to get wrong: integers, tiny and huge magnitudes
+    sales[:4] = [0.0, 1.0, 1e-12, 123456789.123456789]
+    return pd.DataFrame({"store": rng.integers(1, 11, rows), "item": rng.integers(1, items + 1, rows),
+                         "predicted_sales": sales})
+
+
+def legacy_write(cur, inference_id, agg_df, model_id, hist_mean):
+    """
+    The per-row INSERTs that package.py ran before db.py, into the legacy_*
+    tables. The old loop went through iterrows, which turned item into a
+    float ("5.0"); db.py keys inference_results by str(item) ("5"), as
+    model_mean always was, so that key is used here too.
+    """
+    for row in agg_df.itertuples(index=False):
+        cur.execute("INSERT INTO legacy_inference_results(inference_id, inference_key, predicted_value) "
+                    "VALUES (%s, %s, %s)", (inference_id, str(row.item), float(row.predicted_sales)))
+    for item_id, mean_val in hist_mean.items():
+        cur.execute("INSERT INTO legacy_model_mean(model_id, inference_key, mean_value) VALUES (%s, %s, %s)",
+                    (model_id, str(item_id), float(mean_val)))
+
+
+def table_rows(cur, table):
+    cur.execute(f"SELECT * FROM {table}")
+    return sorted(cur.fetchall())
+
+
+def compare(table, got, expected):
+    got_set, expected_set = set(got), set(expected)
+    missing = [row for row in expected if row not in got_set]
+    extra = [row for row in got if row not in expected_set]
+    for row in missing[:10]:
+        print(f"  {table}: per-row INSERT wrote {row}, bulk write did not")
+    for row in extra[:10]:
+        print(f"  {table}: bulk write wrote {row}, per-row INSERT did not")
+    mismatches = len(got) != len(expected) or bool(missing or extra)
+    print(f"{table}: {len(got)} bulk vs {len(expected)} per-row rows, "
+          f"{'MISMATCH' if mismatches else 'identical'}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks the bulk database writes against per-row INSERTs.")
+    parser.add_argument("--dsn", default=os.environ.get("IS_DB_DSN"), help="PostgreSQL DSN (default: IS_DB_DSN)")
+    parser.add_argument("--rows", type=int, default=20_000, help="inference_results rows")
+    parser.add_argument("--items", type=int, default=2_500, help="distinct items, i.e. model_mean rows")
+    parser.add_argument("--batch_rows", type=int, default=7_000, help="rows per COPY")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not args.dsn:
+        print("check_db: skipped (no --dsn or IS_DB_DSN)")
+        return 0
+    os.environ["IS_DB_DSN"] = args.dsn
+
+    import db
+
+    agg_df = predictions(args.rows, args.items, args.seed)
+    hist_mean = agg_df.groupby("item")["predicted_sales"].mean()
+    try:
+        with db.connection() as conn, conn.cursor() as cur:
+            for table, columns in TABLES.items():
+                for name in (table, f"legacy_{table}"):
+                    cur.execute(f"CREATE TEMP TABLE {name} ({columns}) ON COMMIT DROP")
+
+            start = time.perf_counter()
+            db.write_inference_results(cur, INFERENCE_ID, agg_df, args.batch_rows)
+            db.write_model_mean(cur, MODEL_ID, hist_mean)
+            bulk_s = time.perf_counter() - start
+            start = time.perf_counter()
+            legacy_write(cur, INFERENCE_ID, agg_df, MODEL_ID, hist_mean)
+            legacy_s = time.perf_counter() - start
+            print(f"bulk {bulk_s * 1000:.1f} ms, per-row {legacy_s * 1000:.1f} ms")
+
+            mismatches = sum(compare(table, table_rows(cur, table), table_rows(cur, f"legacy_{table}"))
+                             for table in TABLES)
+    finally:
+        db.close_pool()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
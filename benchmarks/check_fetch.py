@@ -0,0 +1,170 @@
+"""
+Checks scicrop-api's Fetcher (fetch.py) against stubs.StubSciCropClient:
+
+  retry      a call failing with 429, 500 or 503 is retried after
+             --backoff * 2 ** attempt seconds and then succeeds; a call
+             that keeps failing raises after max_retries retries
+  rate       with --rate calls per second over --workers threads, the
+             k-th call starts no earlier than k / --rate seconds after
+             fetch_all did
+  cache_ttl  a ResponseCache entry is reused (also by a new ResponseCache
+             on the same file) until it is --ttl seconds old, and then
+             fetched again; purge() deletes expired entries
+
+Every failed expectation is printed and the exit status is 1. Needs the
+infinitestack package, which fetch.py imports.
+
+    python3 benchmarks/check_fetch.py
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "scicrop-api" / "dist"
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(DIST))
+
+from harness import quiet  # noqa: E402
+from stubs import StubAPIError, StubSciCropClient  # noqa: E402
+
+STATUSES = (429, 500, 503)
+
+
+def point(i):
+    return {"lat": f"{-20.8 + i * 0.01:.4f}", "lon": f"{-49.2 - i * 0.01:.4f}"}
+
+
+class TimedClient(StubSciCropClient):
+    """StubSciCropClient that records when each call started (time.monotonic)."""
+
+    def __init__(self, started, **kwargs):
+        super().__init__(**kwargs)
+        self.started = started
+
+    def call_endpoint(self, endpoint, data):
+        self.started.append(time.monotonic())
+        return super().call_endpoint(endpoint, data)
+
+
+def check_retry(backoff):
+    from fetch import Fetcher
+
+    errors = []
+    cases = [((status,), 2) for status in STATUSES] + [((429, 503), 3)]
+    for failures, expected_calls in cases:
+        client = StubSciCropClient(latency=0.0, jitter=0.0, failures=failures)
+        fetcher = Fetcher(max_retries=3, backoff=backoff, rate_limit=0, client_factory=lambda: client)
+        start = time.monotonic()
+        with quiet():
+            response = fetcher.fetch(point(0))
+        elapsed = time.monotonic() - start
+        waited = sum(backoff * 2 ** attempt for attempt in range(len(failures)))
+        if response is None or response["lat"] != point(0)["lat"]:
+            errors.append(f"after {failures}: no response")
+        if client.calls != expected_calls:
+            errors.append(f"after {failures}: {client.calls} calls, expected {expected_calls}")
+        if elapsed < waited:
+            errors.append(f"after {failures}: retried after {elapsed:.3f} s, backoff is {waited:.3f} s")
+
+    client = StubSciCropClient(latency=0.0, jitter=0.0, failures=(503,) * 3)
+    fetcher = Fetcher(max_retries=2, backoff=backoff, rate_limit=0, client_factory=lambda: client)
+    try:
+        with quiet():
+            fetcher.fetch(point(0))
+        errors.append("503 on every call: no error raised")
+    except StubAPIError as e:
+        if e.status != 503 or client.calls != 3:
+            errors.append(f"503 on every call: raised {e} after {client.calls} calls, expected 3")
+    return errors
+
+
+def check_rate(rate, workers, calls):
+    from fetch import Fetcher
+
+    started = []
+    lock = threading.Lock()
+
+    def client():
+        with lock:
+            return TimedClient(started, latency=0.0, jitter=0.0)
+
+    fetcher = Fetcher(max_workers=workers, rate_limit=rate, max_retries=0, client_factory=client)
+    begin = time.monotonic()
+    fetched = sum(1 for _ in fetcher.fetch_all(point(i) for i in range(calls)))
+    started.sort()
+    errors = []
+    if fetched != calls or len(started) != calls:
+        errors.append(f"{fetched} responses and {len(started)} calls, expected {calls}")
+    for k, at in enumerate(started):
+        if at - begin < k / rate:
+            errors.append(f"call {k} started {at - begin:.3f} s after fetch_all, limit is {k / rate:.3f} s")
+    span = started[-1] - begin if started else 0.0
+    print(f"  rate: {calls} calls over {workers} threads in {span:.3f} s "
+          f"({(calls - 1) / span if span else float('inf'):.1f}/s, limit {rate}/s)")
+    return errors
+
+
+def check_cache_ttl(ttl):
+    from fetch import Fetcher, ResponseCache
+
+    errors = []
+    with tempfile.TemporaryDirectory(prefix="check-fetch-") as tmp:
+        path = str(Path(tmp) / "responses.sqlite")
+        client = StubSciCropClient(latency=0.0, jitter=0.0)
+
+        def fetch(cache):
+            return Fetcher(rate_limit=0, cache=cache, client_factory=lambda: client).fetch(point(0))
+
+        cache = ResponseCache(path, ttl)
+        for step, expected_calls in (("first fetch", 1), ("within the TTL", 1)):
+            fetch(cache)
+            if client.calls != expected_calls:
+                errors.append(f"{step}: {client.calls} calls, expected {expected_calls}")
+        cache.close()
+
+        cache = ResponseCache(path, ttl)
+        fetch(cache)
+        if client.calls != 1:
+            errors.append(f"new cache on the same file: {client.calls} calls, expected 1")
+        time.sleep(ttl * 1.5)
+        fetch(cache)
+        if client.calls != 2:
+            errors.append(f"after the TTL: {client.calls} calls, expected 2")
+        time.sleep(ttl * 1.5)
+        purged = cache.purge()
+        if purged != 1:
+            errors.append(f"purge after the TTL deleted {purged} entries, expected 1")
+        cache.close()
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks the SciCrop fetcher's retries, rate limit and cache TTL.")
+    parser.add_argument("--backoff", type=float, default=0.05, help="retry backoff, in seconds")
+    parser.add_argument("--rate", type=float, default=50.0, help="rate limit, in calls per second")
+    parser.add_argument("--workers", type=int, default=4, help="fetcher threads of the rate check")
+    parser.add_argument("--calls", type=int, default=40, help="calls of the rate check")
+    parser.add_argument("--ttl", type=float, default=0.2, help="cache TTL, in seconds")
+    args = parser.parse_args(argv)
+
+    checks = {
+        "retry": lambda: check_retry(args.backoff),
+        "rate": lambda: check_rate(args.rate, args.workers, args.calls),
+        "cache_ttl": lambda: check_cache_ttl(args.ttl),
+    }
+    failed = 0
+    for name, check in checks.items():
+        errors = check()
+        for error in errors:
+            print(f"  {name}: {error}")
+        print(f"{name}: {'FAILED' if errors else 'ok'}")
+        failed += bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Checks that route-1-dijkistra's degree-2 simplification keeps every road:
+route distances on the simplified graph must equal those on the full one.
+
+Maps (coordinates in units of --scale degrees around generators.ORIGIN):
+  parallel   two roads, one straight and one winding, joining the same
+             two intersections (plus a one-way pair doing the same)
+  loop       a two-way loop leaving and returning to a single intersection
+  ring       a closed road with no intersection at all
+  rural      generators.road_network(--rural, "rural")
+
+Points are taken on every segment of every road (start, middle, end), at
+most --points of them (a seeded sample). For each map, all pairs are
+routed with simplify on and off. Any pair whose distance or reachability
+differs is printed, and the exit status is 1.
+
+    python3 benchmarks/check_simplify.py
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DIST = HERE.parent / "examples" / "route-1-dijkistra" / "dist"
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(DIST))
+
+from generators import ORIGIN, road_network  # noqa: E402
+from harness import quiet  # noqa: E402
+
+PARALLEL = [
+    ([(-1, 0), (0, 0)], False), ([(1, 0), (2, 0)], False),
+    ([(0, 0), (0.5, 0), (1, 0)], False),
+    ([(0, 0), (0.5, 0.5), (1, 0)], False),
+    ([(0, -1), (0, 0)], False), ([(1, 0), (1, -1)], False),
+    ([(0, -1), (0.5, -1.2), (1, -1)], True),
+    ([(0, -1), (0.5, -1.6), (1, -1)], True),
+]
+LOOP = [
+    ([(-1, 0), (0, 0)], False), ([(0, 0), (0, -1)], False),
+    ([(0, 0), (0.5, 0.5), (1, 0.5), (1, 0), (0, 0)], False),
+]
+RING = [([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)], False)]
+
+
+def road_map(roads, scale):
+    features = []
+    for coords, oneway in roads:
+        coordinates = [[ORIGIN[0] + x * scale, ORIGIN[1] + y * scale] for x, y in coords]
+        features.append({"type": "Feature", "properties": {"oneway": "true" if oneway else "false"},
+                         "geometry": {"type": "LineString", "coordinates": coordinates}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def road_points(a_map, limit, seed):
+    points = []
+    for feature in a_map["features"]:
+        coords = feature["geometry"]["coordinates"]
+        for (x0, y0), (x1, y1) in zip(coords, coords[1:]):
+            points.extend([(x0, y0), ((x0 + x1) / 2, (y0 + y1) / 2), (x1, y1)])
+    points = list(dict.fromkeys(points))
+    if len(points) > limit:
+        points = random.Random(seed).sample(points, limit)
+    return points
+
+
+def distances(a_map, points, simplify):
+    from shapely.geometry import Point
+
+    from overlay import snap_point
+    from package import load_compiled_graph
+    from parallel import route_group
+
+    with quiet():
+        graph = load_compiled_graph(a_map, {"cache": False, "simplify": simplify})
+    snaps = [snap_point(graph, Point(point)) for point in points]
+    return graph.number_of_nodes, [
+        [None if route is None else route[0] for route in route_group(graph, origin, snaps)]
+        for origin in snaps
+    ]
+
+
+def check(name, a_map, points, tolerance):
+    full_nodes, full = distances(a_map, points, simplify=False)
+    nodes, simplified = distances(a_map, points, simplify=True)
+    mismatches = 0
+    for i, (row, expected_row) in enumerate(zip(simplified, full)):
+        for j, (got, expected) in enumerate(zip(row, expected_row)):
+            same = (got is None and expected is None) or (
+                got is not None and expected is not None and abs(got - expected) <= tolerance)
+            if not same:
+                mismatches += 1
+                print(f"  {name}: {points[i]} -> {points[j]}: simplified {got}, full {expected}")
+    print(f"{name}: {full_nodes} -> {nodes} nodes, {len(points) ** 2} pairs, {mismatches} mismatch(es)")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks route distances with and without simplification.")
+    parser.add_argument("--scale", type=float, default=0.01, help="degrees per map unit")
+    parser.add_argument("--rural", type=int, default=6, help="lattice size of the rural map")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--points", type=int, default=80, help="points routed per map")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="allowed difference, in meters")
+    args = parser.parse_args(argv)
+
+    maps = {
+        "parallel": road_map(PARALLEL, args.scale),
+        "loop": road_map(LOOP, args.scale),
+        "ring": road_map(RING, args.scale),
+        "rural": road_network(args.rural, "rural", args.seed),
+    }
+    mismatches = sum(check(name, a_map, road_points(a_map, args.points, args.seed), args.tolerance)
+                     for name, a_map in maps.items())
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Compares two benchmark result files stage by stage.
+
+    python3 benchmarks/compare.py OLD.json NEW.json [--threshold 0.10] [--metric p50]
+
+For every stage present in both files it prints the chosen latency
+percentile and the peak RSS of each run, with the relative change. A
+stage whose latency or peak memory grew more than --threshold is flagged,
+and the exit status is 1 when any stage is. Stages faster than --min_ms
+in the old run are shown but never flagged for latency: at that scale the
+timer noise is larger than the threshold. Both files can be run.py
+results (all packages) or single bench_*.py reports. Comparing different
+sizes or seeds is refused, because the data differ.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def packages(result):
+    """{package: report} for a run.py result or a single bench_*.py report."""
+    if "packages" in result:
+        return result["packages"]
+    return {result["package"]: result}
+
+
+def stages(report):
+    return {entry["stage"]: entry for entry in report.get("stages", [])}
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compares two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative growth flagged as a regression")
+    parser.add_argument("--metric", choices=("mean", "p50", "p90", "p99", "max"), default="p50")
+    parser.add_argument("--min_ms", type=float, default=5.0, help="latency below which a stage is not flagged")
+    args = parser.parse_args(argv)
+
+    old = json.loads(Path(args.old).read_text())
+    new = json.loads(Path(args.new).read_text())
+    for key in ("size", "seed"):
+        if old.get(key) != new.get(key):
+            parser.error(f"the files differ in {key}: {old.get(key)} vs {new.get(key)}")
+
+    regressions = 0
+    old_packages, new_packages = packages(old), packages(new)
+    for name, new_report in new_packages.items():
+        old_report = old_packages.get(name)
+        if old_report is None or "error" in old_report or "error" in new_report:
+            print(f"{name}: not comparable")
+            continue
+        print(name)
+        print(f"  {'stage':<28}{'old ms':>11}{'new ms':>11}{'change':>9}{'old MiB':>10}{'new MiB':>10}{'change':>9}")
+        old_stages = stages(old_report)
+        for stage, entry in stages(new_report).items():
+            previous = old_stages.get(stage)
+            if previous is None:
+                continue
+            old_ms = previous["latency_ms"].get(args.metric)
+            new_ms = entry["latency_ms"].get(args.metric)
+            d_time = change(old_ms, new_ms)
+            d_mem = change(previous.get("peak_rss_mb"), entry.get("peak_rss_mb"))
+            slow = old_ms >= args.min_ms and (d_time or 0) > args.threshold
+            flagged = slow or (d_mem or 0) > args.threshold
+            regressions += flagged
+            print(f"  {stage:<28}{old_ms:>11.2f}{new_ms:>11.2f}{_percent(d_time):>9}"
+                  f"{_mib(previous['peak_rss_mb']):>10}{_mib(entry['peak_rss_mb']):>10}{_percent(d_mem):>9}"
+                  + ("  <-" if flagged else ""))
+    print(f"{regressions} stage(s) above +{args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def _mib(value):
+    return "" if value is None else f"{value:.0f}"
+
+
+def _percent(value):
+    return "" if value is None else f"{value:+.0%}"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Seeded synthetic inputs for the package benchmarks. The same arguments
+always produce the same data, so results from different runs can be
+compared.
+
+  - road_network(size, kind)      – road GeoJSON for route-1-dijkistra:
+      "grid"  a size x size street lattice with short two-way segments
+              (10 % one-way);
+      "rural" a sparse network over the same lattice: a random spanning
+              tree plus a few extra roads, each road a long winding
+              polyline, so it is dominated by degree-2 chains
+  - od_pairs(network, origins, destinations) – the "points" list (origins
+      such as mills, destinations such as fields) inside the network area
+  - sales_history(stores, items, days) – daily store x item sales columns
+      for inventory-prediction-1-xgboost, with weekly and yearly
+      seasonality; sales_records() turns them into the payload records
+  - future_scenarios(n)           – consecutive {"future_month", "future_year"}
+  - label_geojson(features, labels) – labelled fields for scicrop-api:
+      polygons (some with holes), multipolygons, lines and points, laid on
+      a lattice so neighbouring fields share their border vertices
+
+Coordinates are (lon, lat) around ORIGIN, in the state of São Paulo.
+"""
+import math
+import random
+
+ORIGIN = (-49.2, -20.8)
+METERS_PER_DEGREE = 111_320.0
+
+
+def _degrees(meters, lat=ORIGIN[1]):
+    """(d_lon, d_lat) spanning 'meters' at latitude 'lat'."""
+    return meters / (METERS_PER_DEGREE * math.cos(math.radians(lat))), meters / METERS_PER_DEGREE
+
+
+def _lattice(size, spacing_m, rnd, origin, jitter=0.2):
+    """(size + 1) x (size + 1) jittered lattice vertices, keyed by (i, j)."""
+    step_lon, step_lat = _degrees(spacing_m, origin[1])
+    vertices = {}
+    for i in range(size + 1):
+        for j in range(size + 1):
+            vertices[i, j] = [origin[0] + (i + rnd.uniform(-jitter, jitter)) * step_lon,
+                              origin[1] + (j + rnd.uniform(-jitter, jitter)) * step_lat]
+    return vertices, step_lon, step_lat
+
+
+def _road(properties, coordinates):
+    return {"type": "Feature", "properties": properties,
+            "geometry": {"type": "LineString", "coordinates": coordinates}}
+
+
+def road_network(size, kind="grid", seed=0, origin=ORIGIN, spacing_m=None, oneway_share=0.1):
+    """
+    Road FeatureCollection over a size x size lattice (see the module
+    docstring). spacing_m defaults to 150 m for "grid" and 1.5 km for
+    "rural".
+    """
+    if kind not in ("grid", "rural"):
+        raise ValueError(f"Unknown network kind: {kind} (use 'grid' or 'rural')")
+    rnd = random.Random(seed)
+    spacing_m = spacing_m or (150.0 if kind == "grid" else 1500.0)
+    vertices, step_lon, step_lat = _lattice(size, spacing_m, rnd, origin)
+
+    edges = [((i, j), (i + di, j + dj)) for i in range(size + 1) for j in range(size + 1)
+             for di, dj in ((1, 0), (0, 1)) if i + di <= size and j + dj <= size]
+
+    features = []
+    if kind == "grid":
+        for a, b in edges:
+            a, b = vertices[a], vertices[b]
+            middle = [(a[0] + b[0]) / 2 + rnd.uniform(-0.1, 0.1) * step_lon,
+                      (a[1] + b[1]) / 2 + rnd.uniform(-0.1, 0.1) * step_lat]
+            oneway = "true" if rnd.random() < oneway_share else "false"
+            features.append(_road({"oneway": oneway, "highway": "residential"}, [a, middle, b]))
+        return {"type": "FeatureCollection", "features": features}
+
+    # Rural: spanning tree (Kruskal over shuffled edges) plus 15 % of the rest
+    rnd.shuffle(edges)
+    parent = {v: v for v in vertices}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    chosen = []
+    for a, b in edges:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[ra] = rb
+            chosen.append((a, b))
+        elif rnd.random() < 0.15:
+            chosen.append((a, b))
+
+    for a, b in chosen:
+        a, b = vertices[a], vertices[b]
+        bends = rnd.randint(6, 20)
+        amplitude = rnd.uniform(0.05, 0.2)
+        phase = rnd.uniform(0, 2 * math.pi)
+        # Winding road: a sine wave across the straight line between the ends
+        d_lon, d_lat = b[0] - a[0], b[1] - a[1]
+        coords = []
+        for k in range(bends + 1):
+            t = k / bends
+            offset = amplitude * math.sin(phase + 2 * math.pi * t) * math.sin(math.pi * t)
+            coords.append([a[0] + t * d_lon - offset * d_lat, a[1] + t * d_lat + offset * d_lon])
+        oneway = "true" if rnd.random() < oneway_share / 4 else "false"
+        features.append(_road({"oneway": oneway, "highway": "unclassified"}, coords))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _bounds(network):
+    lons, lats = [], []
+    for feature in network["features"]:
+        for lon, lat in feature["geometry"]["coordinates"]:
+            lons.append(lon)
+            lats.append(lat)
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def od_pairs(network, origins=5, destinations=20, seed=0):
+    """
+    origins x destinations points elements ({"from": {"name", "point"},
+    "to": {...}}), with random origins and destinations inside the network
+    bounding box. Every origin gets its own destinations.
+    """
+    rnd = random.Random(seed)
+    min_lon, min_lat, max_lon, max_lat = _bounds(network)
+
+    def point():
+        return [rnd.uniform(min_lon, max_lon), rnd.uniform(min_lat, max_lat)]
+
+    points = []
+    for o in range(origins):
+        origin = point()
+        for d in range(destinations):
+            points.append({"from": {"name": f"Usina {o}", "point": origin},
+                           "to": {"name": f"Talhao {o}-{d}", "point": point()}})
+    return points
+
+
+def sales_history(stores=10, items=50, days=365, start="2022-01-01", seed=0):
+    """
+    Daily sales of every store x item pair, as columns of NumPy arrays
+    (date as datetime64[D], store, item and sales as integers), sorted by
+    date, store and item.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    dates = np.arange(np.datetime64(start, "D"), np.datetime64(start, "D") + days)
+    store_ids = np.arange(1, stores + 1)
+    item_ids = np.arange(1, items + 1)
+
+    day = np.repeat(np.arange(days), stores * items)
+    store = np.tile(np.repeat(store_ids, items), days)
+    item = np.tile(item_ids, days * stores)
+
+    base = rng.uniform(5, 60, size=(stores, items))[store - 1, item - 1]
+    weekday = (dates.astype("datetime64[D]").view("int64") + 3) % 7   # 0 = Monday
+    weekly = np.where(weekday >= 5, 1.25, 1.0)[day]
+    yearly = 1 + 0.3 * np.sin(2 * np.pi * day / 365.25)
+    sales = rng.poisson(base * weekly * yearly)
+    return {"date": dates[day], "store": store, "item": item, "sales": sales}
+
+
+def sales_records(columns):
+    """The payload "train" records ({"date": "YYYY-MM-DD", "store", "item", "sales"})."""
+    dates = columns["date"].astype(str).tolist()
+    return [{"date": d, "store": s, "item": i, "sales": v}
+            for d, s, i, v in zip(dates, columns["store"].tolist(), columns["item"].tolist(),
+                                  columns["sales"].tolist())]
+
+
+def future_scenarios(n=1, year=2025, month=1):
+    """n consecutive monthly scenarios starting at year/month."""
+    scenarios = []
+    for k in range(n):
+        y, m = divmod(month - 1 + k, 12)
+        scenarios.append({"future_month": m + 1, "future_year": year + y})
+    return scenarios
+
+
+def label_geojson(features=200, labels=20, seed=0, origin=ORIGIN, field_m=400.0, side_vertices=6):
+    """
+    FeatureCollection of labelled geometries for the scicrop-api package.
+    About 70 % are field polygons (a quarter of them with a hole), 10 %
+    two-field multipolygons, 10 % roads (LineString) and 10 % points.
+    Fields are cells of a lattice and every side of a cell has
+    side_vertices vertices computed from the shared lattice corners, so
+    neighbouring fields repeat each other's border coordinates exactly.
+    """
+    rnd = random.Random(seed)
+    size = max(2, int(math.ceil(math.sqrt(features * 1.2))))
+    corners, step_lon, step_lat = _lattice(size, field_m, rnd, origin, jitter=0.15)
+
+    def side(a, b):
+        a, b = corners[a], corners[b]
+        return [[a[0] + (b[0] - a[0]) * k / side_vertices, a[1] + (b[1] - a[1]) * k / side_vertices]
+                for k in range(side_vertices)]
+
+    def field(i, j):
+        ring = (side((i, j), (i + 1, j)) + side((i + 1, j), (i + 1, j + 1))
+                + side((i + 1, j + 1), (i, j + 1)) + side((i, j + 1), (i, j)))
+        return ring + [ring[0]]
+
+    def hole(i, j):
+        cx, cy = (corners[i, j][0] + corners[i + 1, j + 1][0]) / 2, (corners[i, j][1] + corners[i + 1, j + 1][1]) / 2
+        rx, ry = 0.15 * step_lon, 0.15 * step_lat
+        ring = [[cx + rx * math.cos(t), cy + ry * math.sin(t)]
+                for t in (2 * math.pi * k / 8 for k in range(8, 0, -1))]
+        return ring + [ring[0]]
+
+    cells = [(i, j) for i in range(size) for j in range(size)]
+    rnd.shuffle(cells)
+    out = []
+    for n in range(features):
+        label = f"farm-{rnd.randrange(labels):03d}"
+        draw = rnd.random()
+        i, j = cells[n % len(cells)]
+        if draw < 0.7:
+            rings = [field(i, j)]
+            if rnd.random() < 0.25:
+                rings.append(hole(i, j))
+            geometry = {"type": "Polygon", "coordinates": rings}
+        elif draw < 0.8:
+            k, m = cells[(n + features) % len(cells)]
+            geometry = {"type": "MultiPolygon", "coordinates": [[field(i, j)], [field(k, m)]]}
+        elif draw < 0.9:
+            # Road along the border of the cell, sharing its vertices
+            geometry = {"type": "LineString", "coordinates": side((i, j), (i + 1, j)) + [corners[i + 1, j]]}
+        else:
+            geometry = {"type": "Point", "coordinates": list(corners[i, j])}
+        out.append({"type": "Feature", "properties": {"label": label}, "geometry": geometry})
+    return {"type": "FeatureCollection", "features": out}
@@ -0,0 +1,306 @@
+"""
+Measurement helpers shared by the package benchmarks.
+
+A BenchmarkRun collects, per stage:
+  - latency_ms: mean, p50, p90, p99 and max over the stage samples. There
+    is one sample per repetition of the stage, or one per operation when
+    the stage times its own operations (one route query, one API call...);
+  - throughput_per_s: items processed per second of stage wall time;
+  - peak_rss_mb: process resident-memory high-water mark during the stage,
+    and rss_growth_mb, how far it rose above the RSS at the stage start.
+    On Linux the high-water mark is reset before every stage through
+    /proc/self/clear_refs, so each stage reports its own peak; elsewhere
+    ru_maxrss is used, which only ever grows.
+
+Only the standard library is used, so the harness runs in the environment
+of any of the packages.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_VERSION = 1
+
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """Current resident memory of the process, in MiB (None if unknown)."""
+    return _status_mb("VmRSS")
+
+
+def peak_rss_mb():
+    """Resident-memory high-water mark of the process, in MiB."""
+    peak = _status_mb("VmHWM")
+    if peak is None and resource is not None:
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    return peak or 0.0
+
+
+def reset_peak_rss():
+    """Resets the high-water mark to the current RSS (Linux only). Returns whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def percentile(sorted_values, q):
+    """q-th percentile (0-100) of an already sorted list, linearly interpolated."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize(samples_s):
+    """Latency summary, in milliseconds, of a list of durations in seconds."""
+    values = sorted(samples_s)
+    if not values:
+        return {}
+    ms = [v * 1000.0 for v in values]
+    return {
+        "samples": len(ms),
+        "mean": sum(ms) / len(ms),
+        "p50": percentile(ms, 50),
+        "p90": percentile(ms, 90),
+        "p99": percentile(ms, 99),
+        "max": ms[-1],
+    }
+
+
+def git_revision():
+    """(commit, dirty) of the checkout the benchmarks run from, or (None, None)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def environment(modules=()):
+    """Machine, interpreter and library versions, stored with every result file."""
+    from importlib import metadata
+    commit, dirty = git_revision()
+    versions = {}
+    for name in modules:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return {
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "libraries": versions,
+    }
+
+
+class _Op:
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stage.samples.append(time.perf_counter() - self._start)
+        return False
+
+
+class Stage:
+    """
+    One measured stage. Used through BenchmarkRun.stage():
+
+        with run.stage("route", items=len(tasks)) as stage:
+            for task in tasks:
+                with stage.op():
+                    ...
+            stage.counters["unreachable"] = n
+
+    Without op() (or add_sample()) the whole block is a single sample.
+    """
+
+    def __init__(self, run, name, items):
+        self.run = run
+        self.name = name
+        self.items = items
+        self.repeat = 1
+        self.samples = []
+        self.counters = {}
+
+    def op(self):
+        return _Op(self)
+
+    def add_sample(self, seconds):
+        self.samples.append(seconds)
+
+    def __enter__(self):
+        reset_peak_rss()
+        self._rss = rss_mb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        if exc_type is None:
+            self.run._record(self, wall, cpu, self._rss, peak_rss_mb())
+        return False
+
+
+class BenchmarkRun:
+    """Results of one package benchmark: metadata plus one entry per stage, in execution order."""
+
+    def __init__(self, package, size, seed, params=None, modules=()):
+        self.package = package
+        self.size = size
+        self.seed = seed
+        self.params = dict(params or {})
+        self.modules = tuple(modules)
+        self.stages = {}
+        self._started = time.time()
+
+    def stage(self, name, items=None):
+        return Stage(self, name, items)
+
+    def measure(self, name, fn, items=None, repeat=3, warmup=0):
+        """
+        Runs fn() warmup + repeat times; each timed repetition is one sample.
+        Returns the result of the last call.
+        """
+        result = None
+        for _ in range(warmup):
+            result = fn()
+        with self.stage(name, items) as stage:
+            stage.repeat = max(1, repeat)
+            for _ in range(stage.repeat):
+                with stage.op():
+                    result = fn()
+        return result
+
+    def add(self, name, samples_s, items=None, peak_rss_mb=None, counters=None):
+        """
+        Records a stage measured elsewhere, e.g. in a child process: one
+        duration (seconds) per sample, and the peak RSS if known.
+        """
+        wall = sum(samples_s)
+        entry = {
+            "stage": name,
+            "items": items,
+            "repeat": len(samples_s),
+            "wall_s": wall,
+            "cpu_s": None,
+            "throughput_per_s": items * len(samples_s) / wall if items is not None and wall else None,
+            "latency_ms": summarize(samples_s),
+            "peak_rss_mb": peak_rss_mb,
+            "rss_growth_mb": None,
+        }
+        if counters:
+            entry["counters"] = dict(counters)
+        self.stages[name] = entry
+
+    def _record(self, stage, wall, cpu, rss_before, peak):
+        samples = stage.samples or [wall]
+        entry = {
+            "stage": stage.name,
+            "items": stage.items,
+            "repeat": stage.repeat,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            # items of one repetition times the repetitions, over the whole stage
+            "throughput_per_s": stage.items * stage.repeat / wall if stage.items is not None and wall else None,
+            "latency_ms": summarize(samples),
+            "peak_rss_mb": peak,
+            "rss_growth_mb": max(0.0, peak - rss_before) if rss_before is not None else None,
+        }
+        if stage.counters:
+            entry["counters"] = dict(stage.counters)
+        self.stages[stage.name] = entry
+
+    def report(self):
+        return {
+            "schema": SCHEMA_VERSION,
+            "package": self.package,
+            "size": self.size,
+            "seed": self.seed,
+            "params": self.params,
+            "created": self._started,
+            "total_s": time.time() - self._started,
+            "peak_rss_mb": peak_rss_mb(),
+            "environment": environment(self.modules),
+            "stages": list(self.stages.values()),
+        }
+
+    def write_json(self, path):
+        report = self.report()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(report, indent=2))
+        return report
+
+    def print_table(self, file=sys.stdout):
+        print(f"{self.package} ({self.size}, seed {self.seed})", file=file)
+        print(f"  {'stage':<28}{'items':>10}{'items/s':>12}{'p50 ms':>11}{'p90 ms':>11}"
+              f"{'p99 ms':>11}{'peak MiB':>10}", file=file)
+        for entry in self.stages.values():
+            latency = entry["latency_ms"]
+            items = "" if entry["items"] is None else entry["items"]
+            rate = "" if entry["throughput_per_s"] is None else f"{entry['throughput_per_s']:.1f}"
+            peak = "" if entry["peak_rss_mb"] is None else f"{entry['peak_rss_mb']:.0f}"
+            print(f"  {entry['stage']:<28}{items:>10}{rate:>12}{latency['p50']:>11.2f}{latency['p90']:>11.2f}"
+                  f"{latency['p99']:>11.2f}{peak:>10}", file=file)
+
+
+@contextmanager
+def quiet():
+    """Sends the packages' progress prints to /dev/null while a stage runs."""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        yield
+
+
+def bench_arguments(description, sizes):
+    """Command line shared by the bench_*.py scripts."""
+    import argparse
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--size", choices=sorted(sizes), default="small",
+                        help="data size preset (default: small)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of the repeated stages")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser
@@ -0,0 +1,87 @@
+"""
+Runs the package benchmarks and saves one JSON result file per run.
+
+    python3 benchmarks/run.py                          # every package, small
+    python3 benchmarks/run.py --size medium route inventory
+    python3 benchmarks/compare.py benchmarks/results/A.json benchmarks/results/B.json
+
+Each package runs in its own Python process. The three dists all have a
+package.py, and a separate process keeps one benchmark's memory out of
+the next one's peak. The result file, results/<UTC time>-<commit>.json,
+holds the report of every package (see harness.BenchmarkRun.report). A
+package whose benchmark fails, e.g. because its dependencies are not
+installed, gets {"error": ...} and the others still run.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from harness import SCHEMA_VERSION, environment, git_revision
+
+HERE = Path(__file__).resolve().parent
+BENCHMARKS = {
+    "route": "bench_route.py",
+    "inventory": "bench_inventory.py",
+    "scicrop": "bench_scicrop.py",
+    "startup": "bench_startup.py",
+    "engines": "bench_engines.py",
+}
+RESULTS_DIR = HERE / "results"
+
+
+def run_package(name, size, seed, repeat, extra=()):
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        out = Path(tmp) / "result.json"
+        command = [sys.executable, str(HERE / BENCHMARKS[name]), "--size", size, "--seed", str(seed),
+                   "--repeat", str(repeat), "--json", str(out), *extra]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        sys.stdout.write(completed.stdout)
+        if completed.returncode != 0 or not out.exists():
+            error = completed.stderr.strip().splitlines()
+            print(f"{name}: failed ({error[-1] if error else completed.returncode})", file=sys.stderr)
+            return {"error": "\n".join(error[-20:])}
+        return json.loads(out.read_text())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the package benchmarks.")
+    parser.add_argument("packages", nargs="*", metavar="package",
+                        help=f"packages to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--size", choices=("small", "medium", "large"), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=str(RESULTS_DIR), help="directory of the result files")
+    parser.add_argument("--label", help="appended to the result file name")
+    args = parser.parse_args(argv)
+    unknown = set(args.packages) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown package(s): {', '.join(sorted(unknown))}")
+
+    started = time.time()
+    results = {name: run_package(name, args.size, args.seed, args.repeat)
+               for name in (args.packages or BENCHMARKS)}
+
+    commit, _ = git_revision()
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(started))
+    name = "-".join(filter(None, [stamp, (commit or "")[:10], args.label])) + ".json"
+    path = Path(args.out) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "schema": SCHEMA_VERSION,
+        "created": started,
+        "size": args.size,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "environment": environment(),
+        "packages": results,
+    }, indent=2))
+    print(f"Results: {path}")
+    return 1 if any("error" in result for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+In-process stand-ins for the services the packages talk to, so the
+benchmarks run offline and measure the package code rather than the
+network.
+
+  - StubDatabase        – PostgreSQL for inventory-prediction-1-xgboost:
+      connection() has the same contract as db.connection(), and its
+      cursors accept execute, fetchone, copy_expert and the mogrify and
+      connection.encoding that psycopg2.extras.execute_values relies on.
+      Nothing is stored; statements, rows and bytes are counted.
+  - StubSciCropClient   – SciCropClient.call_endpoint with a configurable
+      latency, a seeded share of failed calls and, optionally, a fixed
+      sequence of HTTP errors (429, 503...) for the first calls.
+  - StubOrm             – infinitestack.orm.Orm: set_project and
+      insert_data_json, with an optional per-insert latency.
+
+Latencies are slept, so they overlap across threads like real I/O.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StubDatabase:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.statements = 0
+        self.copied_rows = 0
+        self.copied_bytes = 0
+        self.commits = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    @contextmanager
+    def connection(self):
+        conn = StubConnection(self)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def counters(self):
+        return {"statements": self.statements, "copied_rows": self.copied_rows,
+                "copied_bytes": self.copied_bytes, "commits": self.commits}
+
+
+class StubConnection:
+    encoding = "UTF8"
+
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def commit(self):
+        self.database.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class StubCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def _round_trip(self):
+        database = self.connection.database
+        database.statements += 1
+        if database.latency:
+            time.sleep(database.latency)
+
+    def execute(self, sql, params=None):
+        self._round_trip()
+        returning = b"RETURNING" if isinstance(sql, bytes) else "RETURNING"
+        self._row = (self.connection.database.next_id(),) if returning in sql else None
+
+    def fetchone(self):
+        return self._row
+
+    def mogrify(self, template, args):
+        return template % tuple(_literal(value) for value in args)
+
+    def copy_expert(self, sql, file):
+        self._round_trip()
+        database = self.connection.database
+        for line in file:
+            database.copied_rows += 1
+            database.copied_bytes += len(line)
+
+
+def _literal(value):
+    if value is None:
+        return b"NULL"
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    return b"'" + str(value).replace("'", "''").encode() + b"'"
+
+
+class StubAPIError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+class StubSciCropClient:
+    """
+    Answers call_endpoint(endpoint, data) after 'latency' seconds (plus up
+    to 'jitter' seconds) with a weather reading for the coordinate, or
+    raises StubAPIError for a 'failure_rate' share of the calls. The
+    failures come from a Random seeded with 'seed' and shared by every
+    client with that seed, so a run fails the same number of calls
+    whatever the number of threads. 'failures' lists HTTP statuses raised,
+    in order, by the first calls of this client, before any other outcome.
+    """
+
+    _streams = {}
+    _streams_lock = threading.Lock()
+
+    def __init__(self, latency=0.05, jitter=0.01, failure_rate=0.0, seed=0, failures=()):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failures = list(failures)
+        with self._streams_lock:
+            self._stream = self._streams.setdefault(seed, (random.Random(seed), threading.Lock()))
+        self.calls = 0
+
+    @classmethod
+    def reset(cls):
+        with cls._streams_lock:
+            cls._streams.clear()
+
+    def call_endpoint(self, endpoint, data):
+        rnd, lock = self._stream
+        with lock:
+            failed = rnd.random() < self.failure_rate
+            delay = self.latency + rnd.uniform(0, self.jitter)
+        self.calls += 1
+        time.sleep(delay)
+        if self.failures:
+            raise StubAPIError(self.failures.pop(0), f"HTTP error ({endpoint})")
+        if failed:
+            raise StubAPIError(503, f"Service Unavailable ({endpoint})")
+        lat, lon = float(data["lat"]), float(data["lon"])
+        return {
+            "endpoint": endpoint,
+            "lat": data["lat"],
+            "lon": data["lon"],
+            "temperature": round(25 + 5 * abs(lat) % 3, 2),
+            "humidity": round(60 + 10 * abs(lon) % 7, 2),
+            "wind_speed": round(abs(lat + lon) % 9, 2),
+            "precipitation": 0.0,
+            "observed_at": "2025-01-01T12:00:00Z",
+        }
+
+
+class StubOrm:
+
+    def __init__(self, database, latency=0.0):
+        self.database = database
+        self.latency = latency
+        self.project = None
+        self.inserted = 0
+
+    def set_project(self, project_name):
+        self.project = project_name
+
+    def insert_data_json(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        self.inserted += 1
@@ -0,0 +1,133 @@
+"""
+Acesso ao PostgreSQL do modelo de previsão de estoque.
+
+  • conexões vêm de um pool (psycopg2.pool.ThreadedConnectionPool) criado
+    uma vez por processo e configurado por variáveis de ambiente;
+  • as linhas de inference_results são enviadas com COPY FROM STDIN, em
+    lotes de batch_rows linhas, em vez de um INSERT por linha;
+  • os demais inserts em lote usam execute_values (um comando por página).
+
+Configuração (em ordem de prioridade):
+  1. IS_DB_DSN – DSN completa, ex.: "dbname=isdb user=is host=db port=5432"
+     ou "postgresql://is:senha@db:5432/isdb";
+  2. PGDATABASE, PGUSER, PGPASSWORD, PGHOST, PGPORT – cada parâmetro
+     separado (as variáveis padrão do libpq);
+  3. os valores padrão abaixo (os mesmos usados antes pelo package.py).
+IS_DB_POOL_MAX define o máximo de conexões abertas no pool (padrão 4).
+"""
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CONNECTION = {
+    'dbname': 'isdb',
+    'user': 'is',
+    'password': 'oliveira',
+    'host': 'localhost',
+    'port': 5432,
+}
+ENV_PARAMS = {
+    'dbname': 'PGDATABASE',
+    'user': 'PGUSER',
+    'password': 'PGPASSWORD',
+    'host': 'PGHOST',
+    'port': 'PGPORT',
+}
+BATCH_ROWS = 50_000
+PAGE_SIZE = 1_000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def connection_settings():
+    """Parâmetros de conexão: {'dsn': ...} se IS_DB_DSN existir, senão os parâmetros separados."""
+    dsn = os.environ.get('IS_DB_DSN')
+    if dsn:
+        return {'dsn': dsn}
+    return {key: os.environ.get(env, DEFAULT_CONNECTION[key]) for key, env in ENV_PARAMS.items()}
+
+
+def get_pool():
+    """Pool de conexões do processo, criado na primeira chamada."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            from psycopg2.pool import ThreadedConnectionPool
+
+            maxconn = int(os.environ.get('IS_DB_POOL_MAX', 4))
+            _pool = ThreadedConnectionPool(1, maxconn, **connection_settings())
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def connection():
+    """
+    Conexão emprestada do pool. Faz commit ao final do bloco, rollback se
+    houver exceção, e devolve a conexão ao pool em qualquer caso.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def copy_dataframe(cur, table, df, batch_rows=BATCH_ROWS):
+    """
+    Envia as linhas de df para 'table' (colunas = colunas de df) com
+    COPY FROM STDIN em CSV, em lotes de batch_rows linhas. Retorna o total
+    de linhas enviadas.
+    """
+    columns = ', '.join(df.columns)
+    sql = f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)'
+    for start in range(0, len(df), batch_rows):
+        buffer = io.StringIO()
+        df.iloc[start:start + batch_rows].to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cur.copy_expert(sql, buffer)
+    return len(df)
+
+
+def insert_many(cur, sql, rows, page_size=PAGE_SIZE):
+    """execute_values: 'sql' com um único VALUES %s, enviado em páginas de page_size linhas."""
+    from psycopg2.extras import execute_values
+
+    execute_values(cur, sql, rows, page_size=page_size)
+
+
+def write_inference_results(cur, inference_id, agg_df, batch_rows=BATCH_ROWS):
+    """
+    inference_results do cenário: uma linha por linha de agg_df, com a chave
+    do item (str(item), a mesma de model_mean) e a soma prevista.
+    """
+    rows = pd.DataFrame({
+        'inference_id': np.full(len(agg_df), inference_id),
+        'inference_key': agg_df['item'].astype(str).to_numpy(),
+        'predicted_value': agg_df['predicted_sales'].to_numpy(dtype=np.float64),
+    })
+    return copy_dataframe(cur, 'inference_results', rows, batch_rows)
+
+
+def write_model_mean(cur, model_id, hist_mean):
+    """model_mean do modelo: uma linha por item (hist_mean é uma Series item -> média)."""
+    rows = [(model_id, str(item_id), float(mean_val)) for item_id, mean_val in hist_mean.items()]
+    insert_many(cur, '''INSERT INTO model_mean(model_id, inference_key, mean_value) VALUES %s''', rows)
+    return len(rows)
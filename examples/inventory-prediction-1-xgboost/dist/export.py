@@ -0,0 +1,244 @@
+"""
+Gravação das previsões de cada cenário (colunas store, item e
+predicted_sales).
+
+O formato vem da seção "output" do payload, como no route-1-dijkistra:
+{"output_type": "xlsx", "file_name": "fp"} (ou a lista do descriptor,
+[{"type": "xls", ...}]). Formatos:
+
+  • xlsx    – planilha gravada em streaming pelo modo write_only do
+              openpyxl (XlsxStream), sem um objeto por célula como no
+              DataFrame.to_excel
+  • parquet – colunar, compactado (requer pyarrow)
+  • csv     – texto, uma linha por loja/item
+  • npy     – array estruturado do NumPy (store, item, predicted_sales)
+
+Por padrão cada cenário vai para o seu arquivo, <dir>/fp-<idx>.<ext> (os
+mesmos nomes de antes). Com combine=True todos os cenários vão para um
+único <dir>/<file_name>.<ext>: uma aba por cenário no xlsx e, nos demais,
+as colunas scenario, future_month e future_year antes das previsões.
+"""
+import csv
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+EXPORT_FORMATS = ('xlsx', 'parquet', 'csv', 'npy')
+OUTPUT_DIR = '/tmp/is'
+COLUMNS = ['store', 'item', 'predicted_sales']
+SCENARIO_COLUMNS = ['scenario', 'future_month', 'future_year']
+XLSX_BLOCK_ROWS = 50_000
+
+_ALIASES = {'xls': 'xlsx', 'excel': 'xlsx', 'pq': 'parquet'}
+
+
+def output_settings(output):
+    """
+    (formato, file_name) a partir da seção "output": um dict
+    {"output_type", "file_name"} ou a lista do descriptor [{"type", ...}].
+    Sem seção, (xlsx, "fp").
+    """
+    if isinstance(output, list):
+        output = next((o for o in output if isinstance(o, dict) and o.get('type')), {})
+        output = {'output_type': output.get('type'), 'file_name': output.get('file_name')}
+    output = output or {}
+    fmt = str(output.get('output_type') or 'xlsx').lower()
+    fmt = _ALIASES.get(fmt, fmt)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Formato de saída desconhecido: {fmt} (use um de {EXPORT_FORMATS})')
+    return fmt, output.get('file_name') or 'fp'
+
+
+def _with_scenario(idx, scenario, agg_df):
+    n = len(agg_df)
+    frame = pd.DataFrame({
+        'scenario': np.full(n, idx, dtype=np.int32),
+        'future_month': np.full(n, int(scenario['future_month']), dtype=np.int16),
+        'future_year': np.full(n, int(scenario['future_year']), dtype=np.int16),
+    })
+    for column in COLUMNS:
+        frame[column] = agg_df[column].to_numpy()
+    return frame
+
+
+def _records(df):
+    return df.to_records(index=False)
+
+
+class PredictionExporter:
+    """
+    Uso:
+
+        with PredictionExporter('parquet', combine=True) as exporter:
+            path = exporter.add(idx, scenario, agg_df)
+
+    add() retorna o arquivo onde o cenário foi (ou vai ser) gravado;
+    close() fecha o arquivo combinado e retorna a lista de arquivos.
+    """
+
+    def __init__(self, fmt='xlsx', directory=OUTPUT_DIR, file_name='fp', combine=False):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'Formato de saída desconhecido: {fmt} (use um de {EXPORT_FORMATS})')
+        self.fmt = fmt
+        self.directory = directory
+        self.combine = combine
+        self.combined_path = os.path.join(directory, f'{file_name}.{fmt}') if combine else None
+        self.files = []
+        self._handle = None
+        self._frames = []
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def path(self, idx):
+        return os.path.join(self.directory, f'fp-{idx}.{self.fmt}')
+
+    def add(self, idx, scenario, agg_df):
+        if self.combine:
+            getattr(self, f'_add_combined_{self.fmt}')(idx, scenario, agg_df)
+            return self.combined_path
+        path = self.path(idx)
+        getattr(self, f'_write_{self.fmt}')(path, agg_df[COLUMNS])
+        self.files.append(path)
+        return path
+
+    def close(self):
+        if self.combine and self.combined_path not in self.files:
+            self._close_combined()
+            self.files.append(self.combined_path)
+        return self.files
+
+    # ------------------------------------------------------------------
+    # Um arquivo por cenário
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _write_xlsx(path, df):
+        with XlsxStream(path) as workbook:
+            workbook.add_sheet('Sheet1', df)
+
+    @staticmethod
+    def _write_parquet(path, df):
+        pq, pa = _pyarrow()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+
+    @staticmethod
+    def _write_csv(path, df):
+        df.to_csv(path, index=False)
+
+    @staticmethod
+    def _write_npy(path, df):
+        np.save(path, _records(df))
+
+    # ------------------------------------------------------------------
+    # Arquivo combinado
+    # ------------------------------------------------------------------
+    def _add_combined_xlsx(self, idx, scenario, agg_df):
+        if self._handle is None:
+            self._handle = XlsxStream(self.combined_path)
+        title = f"{idx}-{int(scenario['future_year'])}-{int(scenario['future_month']):02d}"
+        self._handle.add_sheet(title, agg_df[COLUMNS])
+
+    def _add_combined_parquet(self, idx, scenario, agg_df):
+        pq, pa = _pyarrow()
+        table = pa.Table.from_pandas(_with_scenario(idx, scenario, agg_df), preserve_index=False)
+        if self._handle is None:
+            self._handle = pq.ParquetWriter(self.combined_path, table.schema)
+        # Um row group por cenário
+        self._handle.write_table(table)
+
+    def _add_combined_csv(self, idx, scenario, agg_df):
+        if self._handle is None:
+            self._handle = open(self.combined_path, 'w', newline='')
+            csv.writer(self._handle).writerow(SCENARIO_COLUMNS + COLUMNS)
+        _with_scenario(idx, scenario, agg_df).to_csv(self._handle, header=False, index=False)
+
+    def _add_combined_npy(self, idx, scenario, agg_df):
+        # O cabeçalho do .npy precisa do total de linhas: junta e grava no close()
+        self._frames.append(_with_scenario(idx, scenario, agg_df))
+
+    def _close_combined(self):
+        if self.fmt == 'xlsx':
+            if self._handle is None:
+                self._handle = XlsxStream(self.combined_path)
+            self._handle.close()
+        elif self.fmt == 'parquet':
+            if self._handle is None:
+                pq, pa = _pyarrow()
+                empty = pd.DataFrame({c: pd.Series(dtype=np.int64) for c in SCENARIO_COLUMNS + COLUMNS})
+                pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), self.combined_path)
+            else:
+                self._handle.close()
+        elif self.fmt == 'csv':
+            if self._handle is None:
+                self._handle = open(self.combined_path, 'w', newline='')
+                csv.writer(self._handle).writerow(SCENARIO_COLUMNS + COLUMNS)
+            self._handle.close()
+        else:
+            frames = self._frames or [pd.DataFrame(columns=SCENARIO_COLUMNS + COLUMNS)]
+            np.save(self.combined_path, _records(pd.concat(frames, ignore_index=True)))
+            self._frames = []
+        self._handle = None
+
+
+class XlsxStream:
+    """
+    .xlsx de uma aba por add_sheet(título, df), com a linha de cabeçalho
+    (nomes das colunas) e os valores de df, gravado pelo modo write_only do
+    openpyxl: as linhas são serializadas à medida que entram, sem manter um
+    objeto por célula. Valores não finitos (NaN, inf) viram células vazias.
+    """
+
+    def __init__(self, path):
+        Workbook = _openpyxl_workbook()
+        self.path = path
+        self.sheets = []
+        self._workbook = Workbook(write_only=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_sheet(self, title, df):
+        # Títulos de aba: até 31 caracteres, sem []:*?/\
+        title = ''.join('_' if ch in '[]:*?/\\' else ch for ch in str(title))[:31]
+        self.sheets.append(title)
+        sheet = self._workbook.create_sheet(title)
+        sheet.append([str(c) for c in df.columns])
+        for start in range(0, len(df), XLSX_BLOCK_ROWS):
+            block = df.iloc[start:start + XLSX_BLOCK_ROWS]
+            columns = [block[c].tolist() for c in block.columns]
+            for row in zip(*columns):
+                sheet.append([None if isinstance(v, float) and not math.isfinite(v) else v for v in row])
+
+    def close(self):
+        if self._workbook is None:
+            return
+        if not self.sheets:
+            self.add_sheet('Sheet1', pd.DataFrame(columns=COLUMNS))
+        self._workbook.save(self.path)
+        self._workbook = None
+
+
+def _openpyxl_workbook():
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise ImportError('openpyxl é necessário para gravar as previsões em xlsx') from e
+    return Workbook
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError('pyarrow é necessário para gravar as previsões em Parquet') from e
+    return pq, pa
@@ -0,0 +1,122 @@
+"""
+Features de calendário do modelo de previsão de estoque, calculadas por
+coluna (sem apply linha a linha).
+
+O calendário de feriados é montado uma única vez por país e intervalo de
+anos (holiday_dates, com cache) e as datas são marcadas com uma busca
+vetorizada (np.isin), em vez de criar um holidays.country_holidays para
+cada linha.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+COUNTRY = 'IN'
+FUTURE_CHUNK_ROWS = 2_000_000
+
+
+@lru_cache(maxsize=32)
+def holiday_dates(first_year, last_year, country=COUNTRY):
+    """Array datetime64[D] ordenado com os feriados de 'country' entre first_year e last_year."""
+    import holidays
+
+    calendar = holidays.country_holidays(country, years=range(first_year, last_year + 1))
+    return np.array(sorted(calendar.keys()), dtype='datetime64[D]')
+
+
+def holiday_flags(dates, country=COUNTRY):
+    """1 para as datas que são feriado e 0 para as demais (array int64)."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if len(days) == 0:
+        return np.zeros(0, dtype=np.int64)
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    calendar = holiday_dates(int(years.min()), int(years.max()), country)
+    return np.isin(days, calendar).astype(np.int64)
+
+
+def month_encoding(month):
+    """Codificação cíclica do mês: (m1, m2) = (seno, cosseno) de month * 2π / 12."""
+    angle = np.asarray(month) * 2 * np.pi / 12
+    return np.sin(angle), np.cos(angle)
+
+
+def add_calendar_features(df, date_col='date'):
+    """
+    Adiciona a df, a partir da coluna de datas, as colunas year, month, day,
+    holidays, m1, m2, weekday e weekend, nessa ordem (a ordem das colunas
+    define a ordem das features do modelo). As colunas inteiras usam int8
+    (year usa int16).
+    """
+    dates = pd.to_datetime(df[date_col])
+    df['year'] = dates.dt.year.astype(np.int16)
+    df['month'] = dates.dt.month.astype(np.int8)
+    df['day'] = dates.dt.day.astype(np.int8)
+    df['holidays'] = holiday_flags(dates.to_numpy()).astype(np.int8)
+    df['m1'], df['m2'] = month_encoding(df['month'].to_numpy())
+    df['weekday'] = dates.dt.weekday.astype(np.int8)
+    df['weekend'] = (df['weekday'] >= 5).astype(np.int8)
+    return df
+
+
+def month_calendar(year, month):
+    """Features de calendário de cada dia do mês, uma linha por dia (sem a coluna de data)."""
+    first = np.datetime64(f'{year:04d}-{month:02d}', 'M')
+    days = np.arange(first, first + 1, dtype='datetime64[D]')
+    calendar = add_calendar_features(pd.DataFrame({'date': days}))
+    return calendar.drop(columns='date')
+
+
+def future_day_columns(year, month):
+    """
+    Colunas por dia do mês (day, weekday, weekend, holidays, m1, m2) da
+    grade de previsão, calculadas uma vez por cenário.
+    """
+    calendar = month_calendar(year, month)
+    return {
+        'day': calendar['day'].to_numpy(dtype=np.int8),
+        'weekday': calendar['weekday'].to_numpy(dtype=np.int8),
+        'weekend': calendar['weekend'].to_numpy(dtype=np.int8),
+        'holidays': calendar['holidays'].to_numpy(dtype=np.int8),
+        'm1': calendar['m1'].to_numpy(),
+        'm2': calendar['m2'].to_numpy(),
+    }
+
+
+def future_grid_block(month, day_columns, stores, items, start, stop):
+    """
+    Linhas dos pares loja/item de índice start..stop-1 (par = loja * len(items)
+    + item) para todos os dias do mês, como dict de arrays NumPy: loja e item
+    com np.repeat e as colunas de cada dia replicadas com np.tile. Colunas:
+    store, item, month, day, weekday, weekend, holidays, m1, m2.
+    """
+    days = len(day_columns['day'])
+    pair = np.arange(start, stop)
+    grid = {
+        'store': np.repeat(stores[pair // len(items)], days),
+        'item': np.repeat(items[pair % len(items)], days),
+        'month': np.full(len(pair) * days, month, dtype=np.int8),
+    }
+    for name in ('day', 'weekday', 'weekend', 'holidays', 'm1', 'm2'):
+        grid[name] = np.tile(day_columns[name], len(pair))
+    return grid
+
+
+def pair_blocks(n_pairs, days, chunk_rows=FUTURE_CHUNK_ROWS):
+    """Intervalos (start, stop) de pares loja/item com até 'chunk_rows' linhas cada."""
+    step = max(1, chunk_rows // max(days, 1))
+    return [(start, min(start + step, n_pairs)) for start in range(0, n_pairs, step)]
+
+
+def iter_future_grid(month, year, stores, items, chunk_rows=FUTURE_CHUNK_ROWS):
+    """
+    Gera a grade de previsão loja x item x dia do mês como DataFrames de até
+    'chunk_rows' linhas. Cada bloco tem pares loja/item inteiros, então um
+    par nunca fica dividido entre dois blocos. As features de cada dia são
+    calculadas uma vez (future_day_columns) e replicadas para cada par.
+    """
+    stores = np.asarray(stores)
+    items = np.asarray(items)
+    day_columns = future_day_columns(year, month)
+    for start, stop in pair_blocks(len(stores) * len(items), len(day_columns['day']), chunk_rows):
+        yield pd.DataFrame(future_grid_block(month, day_columns, stores, items, start, stop))
@@ -0,0 +1,94 @@
+"""
+Inferência de todos os cenários futuros numa única passada em blocos.
+
+Em vez de montar a grade inteira de cada cenário, transformar, prever e
+agregar um cenário depois do outro, todos os blocos de todos os cenários
+viram tarefas independentes:
+
+  1. o bloco (pares loja/item inteiros x dias do mês) é montado direto em
+     arrays (features.future_grid_block);
+  2. a normalização é aplicada coluna a coluna com a média e o desvio do
+     StandardScaler treinado (mesma conta de scaler.transform);
+  3. a previsão usa Booster.inplace_predict, sem DataFrame nem DMatrix
+     intermediário;
+  4. a soma por par loja/item é um reshape (pares, dias).sum(axis=1),
+     gravada na posição do par no acumulador do cenário.
+
+Só os acumuladores (um valor por loja/item e cenário) ficam na memória;
+os blocos são descartados assim que somados. Com workers > 1 os blocos são
+distribuídos num pool de threads (inplace_predict libera o GIL).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import FUTURE_CHUNK_ROWS, future_day_columns, future_grid_block, pair_blocks
+from instrumentation import DISABLED
+
+
+def _scaling(scaler, n_features):
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def predict_scenarios(model, scaler, feature_cols, stores, items, scenarios,
+                      chunk_rows=FUTURE_CHUNK_ROWS, workers=1, stats=DISABLED):
+    """
+    Previsões agregadas por loja/item para cada cenário de 'scenarios'
+    ({"future_month", "future_year", ...}). Retorna uma lista, na ordem dos
+    cenários, de DataFrames com as colunas store, item e predicted_sales,
+    ordenados por loja e item (como um groupby(['store', 'item']).sum()).
+    A montagem dos blocos (future_grid) e a previsão com a soma (predict)
+    são medidas em 'stats' (ver instrumentation.py).
+    """
+    stores = np.sort(np.asarray(stores))
+    items = np.sort(np.asarray(items))
+    n_pairs = len(stores) * len(items)
+    mean, scale = _scaling(scaler, len(feature_cols))
+
+    workers = max(1, int(workers or 1))
+    booster = model.get_booster()
+    if workers > 1:
+        # Cada thread prevê um bloco; divide os núcleos entre elas
+        booster = booster.copy()
+        booster.set_param({'nthread': max(1, (os.cpu_count() or 1) // workers)})
+
+    days_of = []
+    tasks = []
+    for idx, scenario in enumerate(scenarios):
+        month, year = int(scenario['future_month']), int(scenario['future_year'])
+        day_columns = future_day_columns(year, month)
+        days_of.append((month, day_columns))
+        tasks.extend((idx, start, stop) for start, stop in pair_blocks(n_pairs, len(day_columns['day']), chunk_rows))
+
+    totals = [np.zeros(n_pairs, dtype=np.float64) for _ in scenarios]
+
+    def run(task):
+        idx, start, stop = task
+        month, day_columns = days_of[idx]
+        with stats.stage('future_grid') as stage:
+            grid = future_grid_block(month, day_columns, stores, items, start, stop)
+            X = np.empty((len(grid['store']), len(feature_cols)), dtype=np.float64)
+            for j, name in enumerate(feature_cols):
+                X[:, j] = (grid[name] - mean[j]) / scale[j]
+            stage.rows = len(X)
+        with stats.stage('predict', rows=len(X)):
+            preds = booster.inplace_predict(X)
+            # Cada bloco tem os dias de cada par em sequência
+            totals[idx][start:stop] = preds.reshape(stop - start, -1).sum(axis=1, dtype=np.float64)
+
+    if workers == 1:
+        for task in tasks:
+            run(task)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, tasks))
+
+    store_col = np.repeat(stores, len(items))
+    item_col = np.tile(items, len(stores))
+    return [pd.DataFrame({'store': store_col, 'item': item_col,
+                          'predicted_sales': total.astype(np.float32)})
+            for total in totals]
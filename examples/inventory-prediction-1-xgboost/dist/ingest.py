@@ -0,0 +1,238 @@
+"""
+Leitura dos dados de treino em blocos, com tipos compactos.
+
+json.loads do payload inteiro cria um dict Python por registro de treino e
+pd.DataFrame(registros) ainda gera colunas int64/object: o pico de memória
+fica muitas vezes maior que os dados. Aqui os registros são lidos em
+blocos de chunk_rows linhas, cada bloco vira um DataFrame com date em
+datetime64 e store/item/sales no menor tipo inteiro que comporta os
+valores, e só então segue para o treino.
+
+  • TrainingSource(source, chunk_rows) – iterável (relido do início a cada
+    iteração) de blocos com as colunas date, store, item e sales
+  • read_payload(path) – lê o payload do workflow; "train" vira um
+    TrainingSource e as outras chaves são decodificadas normalmente
+
+Formatos aceitos em 'source':
+  • lista de registros {"date", "store", "item", "sales"} (payload atual)
+  • caminho de um arquivo .json com o array de registros (lido em streaming)
+  • caminho de um arquivo .parquet/.pq (lido por lotes; requer pyarrow)
+  • caminho de uma pasta com date.npy, store.npy, item.npy e sales.npy
+    (abertos com np.load(mmap_mode='r'); só o bloco atual é lido do disco)
+"""
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TRAIN_COLUMNS = ('date', 'store', 'item', 'sales')
+TRAIN_CHUNK_ROWS = 500_000
+READ_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+
+def compact_frame(df):
+    """
+    Colunas de treino com tipos compactos: date em datetime64[ns] (a mesma
+    unidade para todos os formatos, o que mantém a chave do registro de
+    modelos) e store, item e sales (se inteiros) no menor tipo inteiro que
+    comporta os valores.
+    """
+    out = pd.DataFrame({'date': pd.to_datetime(df['date']).astype('datetime64[ns]')})
+    for column in ('store', 'item', 'sales'):
+        values = pd.to_numeric(df[column])
+        if pd.api.types.is_integer_dtype(values):
+            values = pd.to_numeric(values, downcast='integer')
+        out[column] = np.asarray(values)
+    return out
+
+
+class _Reader:
+    """Cursor sobre um arquivo de texto JSON lido em blocos."""
+
+    def __init__(self, f, read_size=READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        pending = self.buf[self.pos:]
+        chunk = self.f.read(max(self.read_size, len(pending)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = pending + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f'JSON inválido: esperado um de {chars!r}, encontrado {ch!r}')
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Valor cortado no fim do bloco: lê mais e tenta de novo
+                if self._fill():
+                    continue
+                raise
+            # Um número no fim do bloco pode continuar no próximo
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def object_keys(self):
+        """Chaves de um objeto JSON; o valor de cada uma precisa ser consumido antes da próxima."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def array_items(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_json_records(path, prefix=()):
+    """
+    Registros do array JSON guardado em 'path', dentro do objeto indicado
+    por 'prefix' (ex.: ('train',) para o payload do workflow, ou () para um
+    arquivo que já é o array). Um registro decodificado por vez.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _Reader(f)
+        for name in prefix:
+            for key in reader.object_keys():
+                if key == name:
+                    break
+                reader.value()
+            else:
+                return
+        yield from reader.array_items()
+
+
+def _record_chunks(records, chunk_rows):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            yield compact_frame(pd.DataFrame(chunk, columns=TRAIN_COLUMNS))
+            chunk = []
+    if chunk:
+        yield compact_frame(pd.DataFrame(chunk, columns=TRAIN_COLUMNS))
+
+
+def _parquet_chunks(path, chunk_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError('pyarrow é necessário para ler dados de treino em Parquet') from e
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(TRAIN_COLUMNS)):
+        yield compact_frame(batch.to_pandas())
+
+
+def _npy_chunks(directory, chunk_rows):
+    columns = {name: np.load(Path(directory) / f'{name}.npy', mmap_mode='r') for name in TRAIN_COLUMNS}
+    n_rows = len(columns['date'])
+    for start in range(0, n_rows, chunk_rows):
+        yield compact_frame({name: np.asarray(values[start:start + chunk_rows])
+                             for name, values in columns.items()})
+
+
+class TrainingSource:
+    """
+    Dados de treino lidos em blocos de até chunk_rows linhas. Pode ser
+    percorrido várias vezes; cada iteração relê a origem do início.
+    """
+
+    def __init__(self, source, chunk_rows=TRAIN_CHUNK_ROWS, prefix=()):
+        self.source = source
+        self.chunk_rows = int(chunk_rows)
+        self.prefix = tuple(prefix)
+
+    def __iter__(self):
+        source = self.source
+        if not isinstance(source, (str, Path)):
+            return _record_chunks(source, self.chunk_rows)
+        path = Path(source)
+        if path.is_dir():
+            return _npy_chunks(path, self.chunk_rows)
+        if path.suffix in ('.parquet', '.pq'):
+            return _parquet_chunks(path, self.chunk_rows)
+        return _record_chunks(iter_json_records(path, self.prefix), self.chunk_rows)
+
+    def load(self):
+        """Todos os blocos num único DataFrame (tipos compactos preservados)."""
+        chunks = list(self)
+        if not chunks:
+            return compact_frame(pd.DataFrame(columns=TRAIN_COLUMNS))
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+def training_source(train, chunk_rows=TRAIN_CHUNK_ROWS):
+    """
+    TrainingSource para 'train' (registros, caminho ou um TrainingSource já
+    criado). Um TrainingSource recebido não é alterado: o retorno é uma
+    cópia com o chunk_rows pedido.
+    """
+    if isinstance(train, TrainingSource):
+        return TrainingSource(train.source, chunk_rows, train.prefix)
+    return TrainingSource(train, chunk_rows)
+
+
+def read_payload(path):
+    """
+    Lê o payload do workflow ({"train": ..., "future": ..., "options": ...})
+    sem carregar os registros de treino na memória: "train" vira um
+    TrainingSource que relê o próprio payload (ou o arquivo indicado, se
+    "train" for um caminho). As demais chaves são decodificadas normalmente.
+    """
+    payload = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _Reader(f)
+        for key in reader.object_keys():
+            if key == 'train' and reader.peek() == '[':
+                for _ in reader.array_items():
+                    pass
+                payload[key] = TrainingSource(path, prefix=('train',))
+            elif key == 'train':
+                value = reader.value()
+                payload[key] = TrainingSource(value) if isinstance(value, str) else value
+            else:
+                payload[key] = reader.value()
+    return payload
@@ -0,0 +1,162 @@
+"""
+Medição por etapa do pipeline de treino e inferência.
+
+Cada etapa (ingest, features, scaling, fit, future_grid, predict, export,
+db, ...) é medida com
+
+    with stats.stage('features') as stage:
+        ...
+        stage.rows = len(df)
+
+e acumula, por nome (uma etapa executada várias vezes soma as medidas):
+  • wall_s      – tempo de relógio
+  • cpu_s       – tempo de CPU do processo (inclui as threads do XGBoost)
+  • peak_rss_mb – pico de memória residente do processo ao final da etapa
+  • rss_growth_mb – quanto o pico subiu durante a etapa
+  • rows        – linhas processadas (quando informado)
+  • calls       – quantas vezes a etapa foi executada
+
+Etapas executadas em threads (predict com workers > 1) se sobrepõem: os
+tempos somam o trabalho de todas as threads.
+
+Com Instrumentation(enabled=False) (ou DISABLED) stage() devolve sempre o
+mesmo objeto vazio, sem ler relógio nem memória.
+"""
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from db import insert_many
+
+# Nome de tabela aceito em write_table: identificador simples ou schema.tabela
+TABLE_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?')
+
+
+def table_identifier(table):
+    """
+    sql.Identifier de 'table' ("tabela" ou "schema.tabela"). O nome vem do
+    payload, então é validado e citado em vez de entrar cru no SQL.
+    """
+    if not isinstance(table, str) or not TABLE_NAME.fullmatch(table):
+        raise ValueError(f'Nome de tabela inválido: {table!r}')
+    from psycopg2 import sql
+
+    return sql.Identifier(*table.split('.'))
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo, em MiB (0 se indisponível)."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss é em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _Stage:
+    __slots__ = ('stats', 'name', 'rows', '_wall', '_cpu', '_rss')
+
+    def __init__(self, stats, name, rows):
+        self.stats = stats
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._rss = peak_rss_mb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self.stats._record(self.name, wall, cpu, self._rss, peak_rss_mb(), self.rows)
+        return False
+
+
+class _NullStage:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def stage(self, name, rows=None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows)
+
+    def _record(self, name, wall, cpu, rss_before, rss_after, rows):
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                entry = self._stages[name] = {'stage': name, 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                              'peak_rss_mb': 0.0, 'rss_growth_mb': 0.0, 'rows': None}
+            entry['calls'] += 1
+            entry['wall_s'] += wall
+            entry['cpu_s'] += cpu
+            entry['peak_rss_mb'] = max(entry['peak_rss_mb'], rss_after)
+            entry['rss_growth_mb'] += max(0.0, rss_after - rss_before)
+            if rows is not None:
+                entry['rows'] = (entry['rows'] or 0) + int(rows)
+
+    def report(self):
+        """Relatório em dict: as etapas na ordem em que começaram a ser medidas e os totais."""
+        with self._lock:
+            stages = [dict(entry) for entry in self._stages.values()]
+        return {
+            'created': time.time(),
+            'total_wall_s': time.perf_counter() - self._started,
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+        }
+
+    def write_json(self, path, **extra):
+        """Grava o relatório (mais as chaves de 'extra', ex.: model_id) em 'path'."""
+        if not self.enabled:
+            return None
+        report = dict(extra, **self.report())
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(report, indent=2))
+        return path
+
+    def write_table(self, cur, table, model_id):
+        """
+        Uma linha por etapa em 'table', ligada a model_train por model_id.
+        Colunas: model_id, stage, calls, wall_s, cpu_s, peak_rss_mb,
+        rss_growth_mb, rows.
+        """
+        if not self.enabled:
+            return 0
+        rows = [(model_id, s['stage'], s['calls'], s['wall_s'], s['cpu_s'],
+                 s['peak_rss_mb'], s['rss_growth_mb'], s['rows'])
+                for s in self.report()['stages']]
+        from psycopg2 import sql
+
+        statement = sql.SQL('''INSERT INTO {}(model_id, stage, calls, wall_s, cpu_s,
+                                           peak_rss_mb, rss_growth_mb, rows) VALUES %s''')
+        insert_many(cur, statement.format(table_identifier(table)), rows)
+        return len(rows)
+
+
+DISABLED = Instrumentation(enabled=False)
@@ -1,176 +1,198 @@
 import sys
 import json
 from pathlib import Path
-from datetime import datetime
-import os
 
-import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error as mae, r2_score
-from xgboost import XGBRegressor
-import holidays
-import psycopg2
 
-
-def is_holiday(date_str):
-    india_holidays = holidays.country_holidays('IN')
-    return 1 if india_holidays.get(date_str) else 0
-
-
-def which_day(year, month, day):
-    return datetime(year, month, day).weekday()
+from db import BATCH_ROWS, connection, write_inference_results, write_model_mean
+from export import OUTPUT_DIR, PredictionExporter, output_settings
+from features import FUTURE_CHUNK_ROWS, iter_future_grid
+from inference import predict_scenarios
+from ingest import TRAIN_CHUNK_ROWS, read_payload, training_source
+from instrumentation import Instrumentation, table_identifier
+from registry import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ModelRegistry, TrainingHasher
+from training import (EXTERNAL_CACHE_DIR, TrainingSummary, fit_scaler_chunked, hyperparameters,
+                      prepare, train_chunked, train_in_memory)
 
 
 def generate_future_dataframe(month, year, df):
     """
     Gera DataFrame de previsão para todas as lojas e itens em um mês/ano.
+    Para grades grandes prefira iter_future_grid, que gera a mesma grade em
+    blocos de tamanho limitado.
     """
-    stores = df['store'].unique()
-    items = df['item'].unique()
-    records = []
-    for store in stores:
-        for item in items:
-            for day in range(1, 32):
-                try:
-                    d = datetime(year, month, day)
-                except ValueError:
-                    break  # dia inválido para o mês
-                weekday = d.weekday()
-                weekend = 1 if weekday >= 5 else 0
-                m1 = np.sin(month * 2 * np.pi / 12)
-                m2 = np.cos(month * 2 * np.pi / 12)
-                holiday = is_holiday(d.strftime('%Y-%m-%d'))
-                records.append({
-                    'store': store,
-                    'item': item,
-                    'month': month,
-                    'day': day,
-                    'weekday': weekday,
-                    'weekend': weekend,
-                    'holidays': holiday,
-                    'm1': m1,
-                    'm2': m2
-                })
-    return pd.DataFrame(records)
-
-
-def process(train_records, future_scenarios):
-    # Carrega dados de treino
-    df = pd.DataFrame(train_records)
-    df['date'] = pd.to_datetime(df['date'])
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day'] = df['date'].dt.day
-
-    # Features temporais
-    df['holidays'] = df['date'].dt.strftime('%Y-%m-%d').apply(is_holiday)
-    df['m1'] = np.sin(df['month'] * 2 * np.pi / 12)
-    df['m2'] = np.cos(df['month'] * 2 * np.pi / 12)
-    df['weekday'] = df.apply(lambda x: which_day(x['year'], x['month'], x['day']), axis=1)
-    df['weekend'] = (df['weekday'] >= 5).astype(int)
-    df.drop('date', axis=1, inplace=True)
-
-    # Remove outliers
-    df = df[df['sales'] < 140]
-
-    # Prepara X e y
-    feature_cols = [c for c in df.columns if c not in ('sales', 'year')]
-    X = df[feature_cols]
-    y = df['sales'].values
-
-    # Split e normalização
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.05, random_state=22
-    )
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train)
-    X_val = scaler.transform(X_val)
-
-    # Treina modelo XGBoost
-    model = XGBRegressor()
-    model.fit(X_train, y_train)
-
-    # Avalia desempenho
-    train_preds = model.predict(X_train)
-    val_preds = model.predict(X_val)
-    train_error = mae(y_train, train_preds)
-    val_error = mae(y_val, val_preds)
-    r2_train = r2_score(y_train, train_preds)
-    r2_val = r2_score(y_val, val_preds)
-
-    print('Model trained: XGBRegressor')
-    print(f'Training MAE: {train_error:.4f}, R2: {r2_train:.4f}')
-    print(f'Validation MAE: {val_error:.4f}, R2: {r2_val:.4f}')
+    chunks = list(iter_future_grid(month, year, df['store'].unique(), df['item'].unique()))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
 
-    # Conecta ao banco
-    conn = psycopg2.connect(
-        dbname='isdb', user='is', password='oliveira',
-        host='localhost', port=5432
-    )
-    cur = conn.cursor()
 
-    # Insere meta-modelo
-    cur.execute(
-        '''INSERT INTO model_train(model_name, mae_v, mae_t, r_square_v, r_square_t)
-           VALUES (%s, %s, %s, %s, %s) RETURNING id''',
-        ('xgboost', val_error, train_error, r2_val, r2_train)
-    )
-    model_id = cur.fetchone()[0]
-
-    # Processa cada cenário de inferência
-    for idx, scenario in enumerate(future_scenarios):
-        month = scenario['future_month']
-        year = scenario['future_year']
-        # Insere metadados de inferência
-        inf_dict = json.dumps(scenario)
-        cur.execute(
-            '''INSERT INTO model_inference(model_id, inference_dict)
-               VALUES (%s, %s) RETURNING id''',
-            (model_id, inf_dict)
-        )
-        inference_id = cur.fetchone()[0]
-
-        # Gera previsões
-        fut_df = generate_future_dataframe(month, year, df)
-        X_fut = scaler.transform(fut_df[feature_cols])
-        fut_preds = model.predict(X_fut)
-        fut_df['predicted_sales'] = fut_preds
-
-        # Agrega total previsto por item e loja
-        agg_df = fut_df.groupby(['store', 'item'])['predicted_sales'].sum().reset_index()
-
-        # Salva Excel com colunas store, item, predicted_sales
-        os.makedirs('/tmp/is', exist_ok=True)
-        agg_df.to_excel(f'/tmp/is/fp-{idx}.xlsx', index=False, columns=['store', 'item', 'predicted_sales'])
-
-        # Insere inference_results: uma linha por item
-        for _, row in agg_df.iterrows():
-            cur.execute(
-                '''INSERT INTO inference_results(inference_id, inference_key, predicted_value)
-                   VALUES (%s, %s, %s)''',
-                (inference_id, str(row['item']), float(row['predicted_sales']))
+def process(train_records, future_scenarios, options=None, output=None):
+    """
+    Treina o modelo e gera as previsões de cada cenário de 'future_scenarios'.
+
+    'train_records' é a lista de registros de treino, o caminho de um
+    arquivo (.json, .parquet ou pasta de colunas .npy) ou um
+    ingest.TrainingSource (ver ingest.py).
+
+    'output' é a seção "output" do payload (output_type "xlsx", "parquet",
+    "csv" ou "npy" e file_name, ver export.py); sem ela, um .xlsx por
+    cenário em /tmp/is/fp-<idx>.xlsx.
+
+    options (todas opcionais):
+      • chunk_rows – linhas da grade de previsão por bloco (padrão 2 milhões)
+      • workers    – threads que prevêem os blocos em paralelo (padrão 1)
+      • batch_rows – linhas por COPY ao gravar inference_results (padrão 50 mil)
+      • model_cache – reaproveita o modelo já treinado com os mesmos dados de
+                      treino e hiperparâmetros (padrão True, ver registry.py)
+      • model_cache_dir – pasta do registro (padrão /tmp/is/cache/models)
+      • model_cache_max_bytes – tamanho máximo do registro (padrão 1 GiB)
+      • retrain    – treina de novo mesmo havendo modelo salvo (padrão False)
+      • training   – "memory" (padrão): DataFrame inteiro na memória;
+                     "chunked": QuantileDMatrix montado bloco a bloco;
+                     "external": memória externa do XGBoost (ver training.py)
+      • train_chunk_rows – linhas de treino lidas por bloco (padrão 500 mil)
+      • external_cache_dir – páginas do modo "external" (padrão /tmp/is/cache/xgboost)
+      • instrumentation – mede cada etapa (tempo, CPU, memória, linhas) e grava
+                          /tmp/is/stages-<model_id>.json (padrão True; False
+                          desliga sem custo, ver instrumentation.py)
+      • instrumentation_table – tabela onde gravar também as medidas, ligadas
+                                a model_train por model_id (padrão nenhuma)
+      • combine_output – todos os cenários num único arquivo
+                         /tmp/is/<file_name>.<formato> (padrão False)
+
+    A conexão com o banco vem do pool de db.py (configurável por variáveis
+    de ambiente).
+    """
+    options = options or {}
+    training = options.get('training', 'memory')
+    if training not in ('memory', 'chunked', 'external'):
+        raise ValueError(f'Modo de treino desconhecido: {training}')
+    export_format, file_name = output_settings(output)
+
+    stats = Instrumentation(enabled=bool(options.get('instrumentation', True)))
+    if options.get('instrumentation_table'):
+        # Valida o nome antes do treino, não só na hora de gravar
+        table_identifier(options['instrumentation_table'])
+
+    # Dados de treino em blocos com tipos compactos (ver ingest.py)
+    source = training_source(train_records, options.get('train_chunk_rows', TRAIN_CHUNK_ROWS))
+
+    # Registro de modelos: chave = dados de treino (antes das features) + hiperparâmetros
+    params = dict(hyperparameters(), training=training)
+    registry = None
+    hasher = TrainingHasher(params)
+    if options.get('model_cache', True):
+        registry = ModelRegistry(options.get('model_cache_dir', DEFAULT_CACHE_DIR),
+                                 options.get('model_cache_max_bytes', DEFAULT_MAX_BYTES))
+
+    # Lojas, itens e totais de vendas usados depois da previsão
+    summary = TrainingSummary()
+    if training == 'memory':
+        with stats.stage('ingest') as stage:
+            df = source.load()
+            hasher.update(df)
+            stage.rows = len(df)
+        with stats.stage('features') as stage:
+            df = prepare(df)
+            summary.add(df)
+            stage.rows = len(df)
+    else:
+        # Primeira passada: hash, features, resumo e ajuste do scaler
+        df = None
+        with stats.stage('scan') as stage:
+            scaler, feature_cols = fit_scaler_chunked(source, summary, hasher.update)
+            stage.rows = summary.rows
+    key = hasher.hexdigest()
+
+    cached = None
+    if registry is not None and not options.get('retrain', False):
+        with stats.stage('registry_load'):
+            cached = registry.get(key)
+
+    if cached is not None:
+        # Mesmo treino já feito antes: vai direto para a inferência
+        model, scaler, feature_cols, metrics = cached
+        print(f'Model loaded from registry: XGBRegressor ({key[:12]})')
+    else:
+        if training == 'memory':
+            model, scaler, feature_cols, metrics = train_in_memory(df, stats)
+        else:
+            model, scaler, feature_cols, metrics = train_chunked(
+                source, scaler, feature_cols, external_memory=training == 'external',
+                cache_dir=options.get('external_cache_dir', EXTERNAL_CACHE_DIR), stats=stats
             )
+        print('Model trained: XGBRegressor')
+        if registry is not None:
+            with stats.stage('registry_save'):
+                registry.put(key, model, scaler, feature_cols, metrics, params)
+    del df
+
+    train_error, val_error = metrics['mae_t'], metrics['mae_v']
+    r2_train, r2_val = metrics['r_square_t'], metrics['r_square_v']
+    print(f'Training MAE: {train_error:.4f}, R2: {r2_train:.4f}')
+    print(f'Validation MAE: {val_error:.4f}, R2: {r2_val:.4f}')
 
-        # Calcula média histórica mensal por item
-        hist_totals = (
-            df[df['month'] == month]
-              .groupby(['item','year'])['sales']
-              .sum()
-        )
-        hist_mean = hist_totals.groupby('item').mean()
-        for item_id, mean_val in hist_mean.items():
+    # Previsões de todos os cenários numa única passada em blocos, já
+    # agregadas por loja e item (ver inference.py)
+    predictions = predict_scenarios(
+        model, scaler, feature_cols, summary.stores, summary.items, future_scenarios,
+        chunk_rows=int(options.get('chunk_rows', FUTURE_CHUNK_ROWS)),
+        workers=options.get('workers', 1), stats=stats
+    )
+    batch_rows = int(options.get('batch_rows', BATCH_ROWS))
+
+    # Conexão do pool; commit único no final (rollback se algo falhar)
+    exporter = PredictionExporter(export_format, OUTPUT_DIR, file_name,
+                                  combine=bool(options.get('combine_output', False)))
+    with connection() as conn, conn.cursor() as cur, exporter:
+        # Insere meta-modelo
+        with stats.stage('db'):
             cur.execute(
-                '''INSERT INTO model_mean(model_id, inference_key, mean_value)
-                   VALUES (%s, %s, %s)''',
-                (model_id, str(item_id), float(mean_val))
+                '''INSERT INTO model_train(model_name, mae_v, mae_t, r_square_v, r_square_t)
+                   VALUES (%s, %s, %s, %s, %s) RETURNING id''',
+                ('xgboost', val_error, train_error, r2_val, r2_train)
             )
-
-    # Salva e fecha conexão
-    conn.commit()
-    cur.close()
-    conn.close()
+            model_id = cur.fetchone()[0]
+
+        # Processa cada cenário de inferência
+        written_months = set()
+        for idx, (scenario, agg_df) in enumerate(zip(future_scenarios, predictions)):
+            month = scenario['future_month']
+            # Insere metadados de inferência
+            inf_dict = json.dumps(scenario)
+            with stats.stage('db'):
+                cur.execute(
+                    '''INSERT INTO model_inference(model_id, inference_dict)
+                       VALUES (%s, %s) RETURNING id''',
+                    (model_id, inf_dict)
+                )
+                inference_id = cur.fetchone()[0]
+
+            # Salva as previsões (store, item, predicted_sales) no formato da seção output
+            with stats.stage('export', rows=len(agg_df)):
+                exporter.add(idx, scenario, agg_df)
+
+            # Insere inference_results (uma linha por loja/item) com COPY
+            with stats.stage('db', rows=len(agg_df)):
+                write_inference_results(cur, inference_id, agg_df, batch_rows)
+
+            # Média histórica mensal por item: depende só do modelo e do mês,
+            # então é gravada uma vez por mês mesmo com vários cenários
+            if month in written_months:
+                continue
+            written_months.add(month)
+            with stats.stage('db') as stage:
+                hist_mean = summary.hist_mean(month)
+                stage.rows = write_model_mean(cur, model_id, hist_mean)
+
+    # Relatório das etapas ao lado das saídas e, se pedido, no banco
+    stats.write_json(f'/tmp/is/stages-{model_id}.json', model_id=model_id, training=training,
+                     model_cached=cached is not None)
+    table = options.get('instrumentation_table')
+    if table and stats.enabled:
+        with connection() as conn, conn.cursor() as cur:
+            stats.write_table(cur, table, model_id)
 
 
 def main(workflow_id: str):
@@ -178,8 +200,9 @@ def main(workflow_id: str):
     if not path.exists():
         raise FileNotFoundError(f'File {path} not found')
 
-    data = json.loads(path.read_text())
-    process(data['train'], data['future'])
+    # "train" é lido em blocos direto do arquivo (ver ingest.read_payload)
+    data = read_payload(path)
+    process(data['train'], data['future'], data.get('options', {}), data.get('output'))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,174 @@
+"""
+Registro em disco dos modelos treinados (booster, scaler e feature_cols).
+
+A chave é o hash do conteúdo dos dados de treino mais os hiperparâmetros
+(TrainingHasher / training_key). Uma execução com os mesmos dados de treino encontra o
+modelo já treinado e vai direto para a inferência, sem refazer o
+StandardScaler nem o XGBRegressor.
+
+Cada modelo fica numa subpasta <cache_dir>/<chave>/:
+  • model.ubj   – booster do XGBoost (XGBRegressor.save_model)
+  • scaler.npz  – mean_, scale_, var_ e n_samples_seen_ do StandardScaler
+  • meta.json   – feature_cols, métricas de treino e hiperparâmetros
+
+Um treino concorrente com a mesma chave monta o modelo em .<chave>.*.tmp
+e só o publica com um rename; quem chegar depois descarta a sua cópia.
+O limite max_bytes vale para os modelos: get() renova o mtime da
+subpasta, e ao salvar um novo modelo saem os de mtime mais antigo.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = '/tmp/is/cache/models'
+DEFAULT_MAX_BYTES = 1024 ** 3
+KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+ENTRY_FILES = ('meta.json', 'model.ubj', 'scaler.npz')
+
+
+class TrainingHasher:
+    """
+    Hash SHA-256 dos dados de treino e dos hiperparâmetros 'params' (dict
+    serializável em JSON), alimentado bloco a bloco com update(df). O hash
+    é feito linha a linha, na ordem das linhas, então não depende do
+    tamanho dos blocos (ver ingest.TrainingSource). A versão do XGBoost
+    entra na chave, pois muda o modelo treinado.
+    """
+
+    def __init__(self, params):
+        import xgboost
+
+        self._hash = hashlib.sha256()
+        self._hash.update(f'v{FORMAT_VERSION}\0xgboost {xgboost.__version__}\0'.encode())
+        self._hash.update(json.dumps(params, sort_keys=True, default=str).encode())
+
+    def update(self, df):
+        self._hash.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def training_key(frames, params):
+    """Chave do registro para 'frames' (um DataFrame ou uma sequência de blocos) e 'params'."""
+    if isinstance(frames, pd.DataFrame):
+        frames = (frames,)
+    hasher = TrainingHasher(params)
+    for df in frames:
+        hasher.update(df)
+    return hasher.hexdigest()
+
+
+def _scaler_arrays(scaler):
+    return {name: np.asarray(getattr(scaler, name))
+            for name in ('mean_', 'scale_', 'var_', 'n_samples_seen_')
+            if getattr(scaler, name, None) is not None}
+
+
+def _restore_scaler(arrays):
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    for name, value in arrays.items():
+        setattr(scaler, name, value if value.ndim else value.item())
+    scaler.n_features_in_ = len(arrays['scale_'])
+    return scaler
+
+
+class ModelRegistry:
+    """
+    Modelos treinados em 'cache_dir', indexados por training_key.
+
+    O registro só reconhece (e só apaga em evict) as subpastas que ele
+    mesmo grava: nome igual a uma chave SHA-256 e com os arquivos de
+    ENTRY_FILES. Outras pastas em model_cache_dir não são tocadas.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+
+    def _entry(self, key):
+        if not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f'Chave de modelo inválida: {key!r}')
+        return self.cache_dir / key
+
+    @staticmethod
+    def _is_entry(path):
+        return (KEY_PATTERN.fullmatch(path.name) is not None and not path.is_symlink() and path.is_dir()
+                and all((path / name).is_file() for name in ENTRY_FILES))
+
+    def get(self, key):
+        """
+        Retorna (model, scaler, feature_cols, metrics) do modelo salvo com
+        'key', ou None se não houver (ou se a entrada estiver corrompida).
+        """
+        import xgboost
+        from xgboost import XGBRegressor
+
+        entry = self._entry(key)
+        if not (entry / 'meta.json').exists():
+            return None
+        try:
+            meta = json.loads((entry / 'meta.json').read_text())
+            model = XGBRegressor()
+            model.load_model(entry / 'model.ubj')
+            with np.load(entry / 'scaler.npz') as arrays:
+                scaler = _restore_scaler(dict(arrays))
+        except (OSError, ValueError, KeyError, xgboost.core.XGBoostError):
+            return None
+        now = time.time()
+        os.utime(entry, (now, now))
+        return model, scaler, meta['feature_cols'], meta['metrics']
+
+    def put(self, key, model, scaler, feature_cols, metrics, params=None):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(key)
+        tmp = self.cache_dir / f'.{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        tmp.mkdir()
+        model.save_model(tmp / 'model.ubj')
+        np.savez(tmp / 'scaler.npz', **_scaler_arrays(scaler))
+        meta = {'format_version': FORMAT_VERSION, 'created': time.time(),
+                'feature_cols': list(feature_cols), 'metrics': metrics, 'params': params}
+        (tmp / 'meta.json').write_text(json.dumps(meta, default=str))
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Outro processo gravou a mesma chave antes
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+        return entry
+
+    def entries(self):
+        """Lista (mtime, bytes, path) de cada modelo salvo."""
+        result = []
+        if not self.cache_dir.exists():
+            return result
+        for entry in self.cache_dir.iterdir():
+            if not self._is_entry(entry):
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+            result.append((entry.stat().st_mtime, size, entry))
+        return result
+
+    def evict(self):
+        """Remove os modelos menos usados até o total caber em max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed.append(entry.name)
+        return removed
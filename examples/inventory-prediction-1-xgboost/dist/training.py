@@ -0,0 +1,277 @@
+"""
+Treino do XGBRegressor do modelo de previsão de estoque.
+
+  • train_in_memory(df) – o treino original: train_test_split, StandardScaler
+    e XGBRegressor.fit sobre o DataFrame inteiro (com tree_method hist o
+    XGBoost já monta um QuantileDMatrix a partir de X);
+  • train_chunked(source) – para dados maiores que a memória: os blocos do
+    TrainingSource são relidos a cada passada e entregues ao XGBoost por um
+    xgboost.DataIter, então nunca existe um X completo em float64. Com
+    external_memory=False as passadas montam um QuantileDMatrix (os valores
+    ficam só quantizados, ~1 byte por valor); com external_memory=True as
+    páginas quantizadas vão para arquivos em cache_dir (memória externa).
+
+No treino em blocos a separação treino/validação é um sorteio por linha
+(semente RANDOM_STATE, fração TEST_SIZE), independente do tamanho dos
+blocos, em vez do train_test_split; o scaler é ajustado com partial_fit.
+
+Os dois caminhos retornam (model, scaler, feature_cols, metrics), com
+metrics = {'mae_t', 'mae_v', 'r_square_t', 'r_square_v'}.
+
+xgboost e scikit-learn são importados dentro das funções que os usam, para
+que importar o pacote não pague o import deles (ver benchmarks/bench_startup.py).
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from features import add_calendar_features
+from instrumentation import DISABLED
+
+TEST_SIZE = 0.05
+RANDOM_STATE = 22
+SALES_LIMIT = 140
+EXTERNAL_CACHE_DIR = '/tmp/is/cache/xgboost'
+
+
+def hyperparameters():
+    """Hiperparâmetros do treino (entram na chave do registro de modelos)."""
+    from xgboost import XGBRegressor
+
+    return {'model': 'xgboost', 'xgb': XGBRegressor().get_params(),
+            'test_size': TEST_SIZE, 'random_state': RANDOM_STATE, 'sales_limit': SALES_LIMIT}
+
+
+def prepare(df):
+    """Features temporais (ver features.py) e remoção de outliers de um bloco de treino."""
+    add_calendar_features(df)
+    df.drop('date', axis=1, inplace=True)
+    return df[df['sales'] < SALES_LIMIT]
+
+
+def feature_columns(df):
+    return [c for c in df.columns if c not in ('sales', 'year')]
+
+
+class TrainingSummary:
+    """
+    O que o restante do pipeline precisa dos dados de treino, acumulado
+    bloco a bloco: lojas, itens e o total de vendas por mês, item e ano
+    (para a média histórica de model_mean).
+    """
+
+    def __init__(self):
+        self._stores = set()
+        self._items = set()
+        self._totals = []
+        self.rows = 0
+
+    def add(self, df):
+        self.rows += len(df)
+        self._stores.update(df['store'].unique().tolist())
+        self._items.update(df['item'].unique().tolist())
+        self._totals.append(df.groupby(['month', 'item', 'year'])['sales'].sum())
+
+    @property
+    def stores(self):
+        return np.array(sorted(self._stores))
+
+    @property
+    def items(self):
+        return np.array(sorted(self._items))
+
+    def hist_mean(self, month):
+        """Média, entre os anos, do total de vendas de cada item no mês 'month'."""
+        if not self._totals:
+            return pd.Series(dtype=np.float64)
+        totals = pd.concat(self._totals)
+        totals = totals.groupby(level=['month', 'item', 'year']).sum()
+        totals = totals[totals.index.get_level_values('month') == month]
+        return totals.groupby(level='item').mean()
+
+
+def train_in_memory(df, stats=DISABLED):
+    """
+    Treina com o DataFrame inteiro já preparado (prepare). As etapas
+    scaling, fit e evaluation são medidas em 'stats' (ver instrumentation.py).
+    """
+    from sklearn.metrics import mean_absolute_error as mae, r2_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBRegressor
+
+    feature_cols = feature_columns(df)
+    X = df[feature_cols]
+    y = df['sales'].values
+
+    # Split e normalização
+    with stats.stage('scaling', rows=len(df)):
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X_train)
+        X_val = scaler.transform(X_val)
+
+    # Treina modelo XGBoost
+    with stats.stage('fit', rows=len(X_train)):
+        model = XGBRegressor()
+        model.fit(X_train, y_train)
+
+    # Avalia desempenho
+    with stats.stage('evaluation', rows=len(df)):
+        train_preds = model.predict(X_train)
+        val_preds = model.predict(X_val)
+    metrics = {
+        'mae_t': float(mae(y_train, train_preds)),
+        'mae_v': float(mae(y_val, val_preds)),
+        'r_square_t': float(r2_score(y_train, train_preds)),
+        'r_square_v': float(r2_score(y_val, val_preds)),
+    }
+    return model, scaler, feature_cols, metrics
+
+
+def _scaled(df, feature_cols, scaler):
+    X = df[feature_cols].to_numpy(dtype=np.float64)
+    return ((X - scaler.mean_) / scaler.scale_).astype(np.float32)
+
+
+def _prepared_chunks(source, observe=None):
+    """
+    (bloco preparado, máscara de validação) de cada bloco de 'source', com
+    sorteio reprodutível. 'observe' recebe cada bloco antes da preparação.
+    """
+    rng = np.random.default_rng(RANDOM_STATE)
+    for chunk in source:
+        if observe is not None:
+            observe(chunk)
+        df = prepare(chunk)
+        if len(df):
+            yield df, rng.random(len(df)) < TEST_SIZE
+
+
+@lru_cache(maxsize=None)
+def _train_iter_class():
+    """A classe _TrainIter, criada no primeiro uso (deriva de xgboost.DataIter)."""
+    import xgboost
+
+    class _TrainIter(xgboost.DataIter):
+        """Linhas de treino (fora da validação), normalizadas, bloco a bloco."""
+
+        def __init__(self, source, feature_cols, scaler, cache_prefix=None):
+            self._source = source
+            self._feature_cols = feature_cols
+            self._scaler = scaler
+            self._chunks = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def reset(self):
+            self._chunks = _prepared_chunks(self._source)
+
+        def next(self, input_data):
+            for df, val in self._chunks:
+                train = df[~val]
+                if len(train):
+                    input_data(data=_scaled(train, self._feature_cols, self._scaler),
+                               label=train['sales'].to_numpy(dtype=np.float32))
+                    return True
+            return False
+
+    return _TrainIter
+
+
+class _ErrorSums:
+    """Somas para MAE e R² sem guardar as previsões."""
+
+    def __init__(self):
+        self.n = 0
+        self.abs_error = self.sq_error = self.y_sum = self.y_sq_sum = 0.0
+
+    def add(self, y, preds):
+        error = y - preds
+        self.n += len(y)
+        self.abs_error += float(np.abs(error).sum())
+        self.sq_error += float((error * error).sum())
+        self.y_sum += float(y.sum())
+        self.y_sq_sum += float((y * y).sum())
+
+    def mae(self):
+        return self.abs_error / self.n if self.n else float('nan')
+
+    def r2(self):
+        if not self.n:
+            return float('nan')
+        total = self.y_sq_sum - self.y_sum * self.y_sum / self.n
+        return 1.0 - self.sq_error / total if total else float('nan')
+
+
+def fit_scaler_chunked(source, summary=None, observe=None):
+    """
+    Passada de ajuste do StandardScaler (partial_fit nas linhas de treino).
+    Se 'summary' for informado, também acumula o TrainingSummary; 'observe'
+    recebe cada bloco bruto (ex.: TrainingHasher.update). Retorna
+    (scaler, feature_cols).
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    feature_cols = None
+    for df, val in _prepared_chunks(source, observe):
+        if summary is not None:
+            summary.add(df)
+        feature_cols = feature_cols or feature_columns(df)
+        train = df[~val]
+        if len(train):
+            scaler.partial_fit(train[feature_cols].to_numpy(dtype=np.float64))
+    if feature_cols is None:
+        raise ValueError('Dados de treino vazios')
+    return scaler, feature_cols
+
+
+def train_chunked(source, scaler, feature_cols, external_memory=False, cache_dir=EXTERNAL_CACHE_DIR,
+                  stats=DISABLED):
+    """
+    Treina bloco a bloco com o scaler já ajustado (fit_scaler_chunked).
+    external_memory=True usa o DMatrix de memória externa, com as páginas
+    em 'cache_dir'. As etapas fit e evaluation são medidas em 'stats'.
+    """
+    import xgboost
+    from xgboost import XGBRegressor
+
+    _TrainIter = _train_iter_class()
+    model = XGBRegressor()
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+    params.setdefault('tree_method', 'hist')
+
+    # Passadas de leitura, features e normalização que montam a matriz quantizada
+    with stats.stage('dmatrix') as stage:
+        if external_memory:
+            os.makedirs(cache_dir, exist_ok=True)
+            it = _TrainIter(source, feature_cols, scaler, cache_prefix=os.path.join(cache_dir, 'train'))
+            dtrain = xgboost.DMatrix(it)
+        else:
+            dtrain = xgboost.QuantileDMatrix(_TrainIter(source, feature_cols, scaler))
+        stage.rows = dtrain.num_row()
+    with stats.stage('fit', rows=dtrain.num_row()):
+        booster = xgboost.train(params, dtrain, num_boost_round=model.get_num_boosting_rounds())
+    del dtrain
+    model.load_model(bytearray(booster.save_raw()))
+
+    # Avalia desempenho numa última passada
+    train_sums, val_sums = _ErrorSums(), _ErrorSums()
+    with stats.stage('evaluation') as stage:
+        for df, val in _prepared_chunks(source):
+            y = df['sales'].to_numpy(dtype=np.float64)
+            preds = booster.inplace_predict(_scaled(df, feature_cols, scaler)).astype(np.float64)
+            train_sums.add(y[~val], preds[~val])
+            val_sums.add(y[val], preds[val])
+        stage.rows = train_sums.n + val_sums.n
+    metrics = {
+        'mae_t': train_sums.mae(),
+        'mae_v': val_sums.mae(),
+        'r_square_t': train_sums.r2(),
+        'r_square_v': val_sums.r2(),
+    }
+    return model, scaler, feature_cols, metrics
@@ -0,0 +1,311 @@
+"""
+Hierarquia de contração (Contraction Hierarchies) sobre um CompiledGraph.
+
+Pré-processamento (uma vez por mapa): os nós são contraídos em ordem de
+importância (diferença de arestas + vizinhos já contraídos). Ao contrair x,
+para cada par u->x->v sem caminho alternativo de mesmo custo (busca de
+testemunha limitada) é criado um atalho u->v com o nó do meio x. No final
+cada aresta (original ou atalho) vai para:
+  • up   – arestas u->v com rank(u) < rank(v), usadas pela busca da origem;
+  • down – arestas u->v com rank(u) > rank(v), guardadas invertidas (por v)
+           para a busca que parte do destino.
+
+A consulta é um Dijkstra bidirecional que só sobe na hierarquia, e por isso
+visita poucas centenas de nós mesmo em mapas grandes. Os atalhos do caminho
+encontrado são expandidos recursivamente pelo nó do meio.
+
+O pré-processamento é em Python puro e pode levar minutos em mapas grandes:
+vale a pena para mapas consultados muitas vezes. Os arrays são gravados
+junto com o grafo no cache (ch_*.npy) e reaproveitados nas execuções
+seguintes.
+"""
+import heapq
+import math
+import os
+from itertools import count
+from pathlib import Path
+
+import numpy as np
+
+from graph_cache import _load_array
+
+ARRAYS = ("rank",
+          "up_indptr", "up_indices", "up_lengths", "up_middle",
+          "down_indptr", "down_indices", "down_lengths", "down_middle")
+
+
+def _to_csr(n, adjacency):
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(adjacency[u]) for u in range(n)], out=indptr[1:])
+    flat = [entry for u in range(n) for entry in adjacency[u]]
+    indices = np.array([e[0] for e in flat], dtype=np.int64)
+    lengths = np.array([e[1] for e in flat], dtype=np.float64)
+    middle = np.array([e[2] for e in flat], dtype=np.int64)
+    return indptr, indices, lengths, middle
+
+
+class ContractionHierarchy:
+
+    def __init__(self, rank, up_indptr, up_indices, up_lengths, up_middle,
+                 down_indptr, down_indices, down_lengths, down_middle):
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_lengths = up_lengths
+        self.up_middle = up_middle
+        self.down_indptr = down_indptr
+        self.down_indices = down_indices
+        self.down_lengths = down_lengths
+        self.down_middle = down_middle
+
+    @property
+    def number_of_nodes(self):
+        return len(self.rank)
+
+    # ------------------------------------------------------------------
+    # Pré-processamento
+    # ------------------------------------------------------------------
+    @classmethod
+    def build(cls, graph, witness_settle_limit=50):
+        n = graph.number_of_nodes
+        # Grafo restante (só nós ainda não contraídos): out[u][v] = (comprimento, nó do meio)
+        out = [dict() for _ in range(n)]
+        inn = [dict() for _ in range(n)]
+        for u, v, w in zip(graph.edge_sources().tolist(), graph.indices.tolist(), graph.lengths.tolist()):
+            if u == v:
+                continue
+            if v not in out[u] or w < out[u][v][0]:
+                out[u][v] = (w, -1)
+                inn[v][u] = (w, -1)
+
+        deleted_neighbors = [0] * n
+
+        def witness(source, skip, limit, targets):
+            """Dijkstra local a partir de 'source' sem passar por 'skip', limitado em distância e nós."""
+            seen = {source: 0.0}
+            done = set()
+            remaining = len(targets)
+            c = count()
+            heap = [(0.0, next(c), source)]
+            while heap and len(done) < witness_settle_limit:
+                d, _, u = heapq.heappop(heap)
+                if u in done:
+                    continue
+                if d > limit:
+                    break
+                done.add(u)
+                if u in targets:
+                    remaining -= 1
+                    if remaining == 0:
+                        break
+                for v, (w, _) in out[u].items():
+                    if v == skip:
+                        continue
+                    vd = d + w
+                    if vd < seen.get(v, math.inf):
+                        seen[v] = vd
+                        heapq.heappush(heap, (vd, next(c), v))
+            return seen
+
+        def shortcuts(x):
+            outs = out[x]
+            needed = []
+            for u, (w1, _) in inn[x].items():
+                targets = {v: w2 for v, (w2, _) in outs.items() if v != u}
+                if not targets:
+                    continue
+                seen = witness(u, x, w1 + max(targets.values()), targets)
+                for v, w2 in targets.items():
+                    if seen.get(v, math.inf) > w1 + w2:
+                        needed.append((u, v, w1 + w2))
+            return needed, len(inn[x]) + len(outs)
+
+        def priority(x):
+            needed, degree = shortcuts(x)
+            return len(needed) - degree + deleted_neighbors[x]
+
+        heap = [(priority(x), x) for x in range(n)]
+        heapq.heapify(heap)
+        rank = np.zeros(n, dtype=np.int64)
+        contracted = [False] * n
+        next_rank = 0
+        up = [[] for _ in range(n)]
+        down = [[] for _ in range(n)]
+
+        while heap:
+            _, x = heapq.heappop(heap)
+            if contracted[x]:
+                continue
+            # Atualização preguiçosa: se a prioridade piorou, volta para a fila
+            needed, degree = shortcuts(x)
+            current = len(needed) - degree + deleted_neighbors[x]
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, x))
+                continue
+
+            for u, v, w in needed:
+                if v not in out[u] or w < out[u][v][0]:
+                    out[u][v] = (w, x)
+                    inn[v][u] = (w, x)
+
+            # As arestas que restam em x ligam nós de rank maior: x->v vai para
+            # 'up' e u->x para 'down' (guardada pelo destino x)
+            contracted[x] = True
+            rank[x] = next_rank
+            next_rank += 1
+            for v, (w, middle) in out[x].items():
+                up[x].append((v, w, middle))
+                del inn[v][x]
+                deleted_neighbors[v] += 1
+            for u, (w, middle) in inn[x].items():
+                down[x].append((u, w, middle))
+                del out[u][x]
+                deleted_neighbors[u] += 1
+            out[x] = {}
+            inn[x] = {}
+
+        return cls(rank, *_to_csr(n, up), *_to_csr(n, down))
+
+    def save(self, path):
+        """
+        Grava os arrays em 'path' (normalmente a pasta do grafo no cache). Cada
+        arquivo é escrito com nome temporário e renomeado; ch_rank.npy, que
+        marca a hierarquia como completa, é o último.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS[1:] + ARRAYS[:1]:
+            tmp = path / f".ch_{name}.{os.getpid()}.npy"
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, path / f"ch_{name}.npy")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        if not (path / "ch_rank.npy").exists():
+            return None
+        mode = "r" if mmap else None
+        return cls(**{name: _load_array(path / f"ch_{name}.npy", mode) for name in ARRAYS})
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def _up(self, u):
+        start, end = int(self.up_indptr[u]), int(self.up_indptr[u + 1])
+        return zip(self.up_indices[start:end].tolist(), self.up_lengths[start:end].tolist())
+
+    def _down(self, v):
+        start, end = int(self.down_indptr[v]), int(self.down_indptr[v + 1])
+        return zip(self.down_indices[start:end].tolist(), self.down_lengths[start:end].tolist())
+
+    def _middle(self, u, v):
+        """Nó do meio do atalho u->v (-1 para aresta original)."""
+        if self.rank[u] < self.rank[v]:
+            start, end = int(self.up_indptr[u]), int(self.up_indptr[u + 1])
+            hits = np.flatnonzero(self.up_indices[start:end] == v)
+            return int(self.up_middle[start + hits[0]])
+        start, end = int(self.down_indptr[v]), int(self.down_indptr[v + 1])
+        hits = np.flatnonzero(self.down_indices[start:end] == u)
+        return int(self.down_middle[start + hits[0]])
+
+    def unpack(self, u, v):
+        """Expande a aresta u->v da hierarquia na sequência de nós do grafo original."""
+        path = [u]
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._middle(a, b)
+            if middle < 0:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+        return path
+
+    def query(self, overlay, source, target):
+        """
+        Caminho mínimo entre dois nós de um QueryOverlay (virtuais ou do grafo
+        base). Retorna (distância, caminho) ou None se não houver caminho.
+        """
+        if source == target:
+            return 0.0, [source]
+
+        n = self.number_of_nodes
+        best = math.inf
+        meet = None
+        direct = None
+
+        # Sementes: nós do grafo base ligados à origem/destino virtuais
+        def seeds(node, edges, other):
+            nonlocal best, direct
+            if node < n:
+                return {node: 0.0}
+            result = {}
+            for x, w in edges(node):
+                if x == other and w < best:
+                    best, direct = w, True
+                elif x < n and w < result.get(x, math.inf):
+                    result[x] = w
+            return result
+
+        forward_seeds = seeds(source, overlay.successors, target)
+        backward_seeds = seeds(target, overlay.predecessors, source)
+
+        c = count()
+        seen = (dict(forward_seeds), dict(backward_seeds))
+        pred = ({x: None for x in forward_seeds}, {x: None for x in backward_seeds})
+        done = (set(), set())
+        heaps = ([(d, next(c), x) for x, d in forward_seeds.items()],
+                 [(d, next(c), x) for x, d in backward_seeds.items()])
+        for h in heaps:
+            heapq.heapify(h)
+        neighbors = (self._up, self._down)
+
+        while heaps[0] or heaps[1]:
+            side = 0 if heaps[0] and (not heaps[1] or heaps[0][0][0] <= heaps[1][0][0]) else 1
+            d, _, u = heapq.heappop(heaps[side])
+            if u in done[side]:
+                continue
+            if d >= best:
+                # Esta direção não pode mais melhorar o resultado
+                heaps[side].clear()
+                continue
+            done[side].add(u)
+
+            if u in seen[1 - side] and d + seen[1 - side][u] < best:
+                best = d + seen[1 - side][u]
+                meet, direct = u, None
+
+            for v, w in neighbors[side](u):
+                vd = d + w
+                if vd < seen[side].get(v, math.inf):
+                    seen[side][v] = vd
+                    pred[side][v] = u
+                    heapq.heappush(heaps[side], (vd, next(c), v))
+                    if v in seen[1 - side] and vd + seen[1 - side][v] < best:
+                        best = vd + seen[1 - side][v]
+                        meet, direct = v, None
+
+        if direct:
+            return best, [source, target]
+        if meet is None:
+            return None
+
+        # Cadeia da origem até o encontro e do encontro até o destino
+        forward = [meet]
+        while pred[0][forward[-1]] is not None:
+            forward.append(pred[0][forward[-1]])
+        forward.reverse()
+        backward = [meet]
+        while pred[1][backward[-1]] is not None:
+            backward.append(pred[1][backward[-1]])
+        chain = forward + backward[1:]
+
+        path = [chain[0]]
+        for a, b in zip(chain, chain[1:]):
+            path.extend(self.unpack(a, b)[1:])
+        if source >= n:
+            path.insert(0, source)
+        if target >= n:
+            path.append(target)
+        return best, path
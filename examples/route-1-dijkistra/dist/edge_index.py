@@ -0,0 +1,178 @@
+import math
+
+from shapely import STRtree
+from shapely.geometry import LineString
+
+
+class EdgeIndex:
+    """
+    Índice espacial (R-tree / STRtree) sobre as geometrias das arestas de um
+    nx.DiGraph, usado para encontrar a aresta mais próxima de um ponto sem
+    percorrer G.edges inteiro.
+
+    O STRtree do shapely é imutável, então as alterações feitas depois da
+    construção ficam em duas estruturas auxiliares:
+      • removed – posições da árvore cujas arestas não existem mais
+      • extra   – arestas novas (ex.: metades criadas por add_node_in_edge),
+                  varridas linearmente
+    Quando essas estruturas passam de 'rebuild_threshold' a árvore é
+    reconstruída a partir do grafo.
+
+    Desempate: a varredura linear original escolhe, entre arestas à mesma
+    distância, a primeira na ordem de G.edges. O índice reproduz essa ordem
+    usando (posição do nó u em G, posição de v na adjacência de u), de modo
+    que a aresta retornada é sempre a mesma da varredura linear.
+    """
+
+    def __init__(self, G, rebuild_threshold=None):
+        self.G = G
+        self._rebuild_threshold = rebuild_threshold
+        self.rebuild()
+
+    @staticmethod
+    def edge_line(u, v, data):
+        line = data.get("geometry", None)
+        if line is None:
+            line = LineString([u, v])
+        return line
+
+    def rebuild(self):
+        keys = []
+        lines = []
+        for (u, v, data) in self.G.edges(data=True):
+            keys.append((u, v))
+            lines.append(self.edge_line(u, v, data))
+
+        self._keys = keys
+        self._lines = lines
+        self._slot = {key: i for i, key in enumerate(keys)}
+        self._tree = STRtree(lines) if lines else None
+        self._removed = set()
+        self._extra = {}
+        self._node_pos = {n: i for i, n in enumerate(self.G)}
+
+        threshold = self._rebuild_threshold
+        if threshold is None:
+            threshold = max(256, int(math.sqrt(len(keys))))
+        self._threshold = threshold
+
+    def __len__(self):
+        return len(self._keys) - len(self._removed) + len(self._extra)
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+    def add_node(self, node):
+        if node not in self._node_pos:
+            self._node_pos[node] = len(self._node_pos)
+
+    def add_edge(self, u, v, line):
+        self.add_node(u)
+        self.add_node(v)
+        slot = self._slot.get((u, v))
+        if slot is not None and slot not in self._removed:
+            # Aresta já indexada na árvore: a geometria nova substitui a antiga
+            self._removed.add(slot)
+        self._extra[(u, v)] = line
+        self._maybe_rebuild()
+
+    def remove_edge(self, u, v):
+        if self._extra.pop((u, v), None) is not None:
+            return
+        slot = self._slot.get((u, v))
+        if slot is not None:
+            self._removed.add(slot)
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if len(self._removed) + len(self._extra) > self._threshold:
+            self.rebuild()
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def _order_key(self, key):
+        u, v = key
+        adj = self.G._adj.get(u, {})
+        try:
+            adj_pos = list(adj).index(v)
+        except ValueError:
+            adj_pos = len(adj)
+        return self._node_pos.get(u, len(self._node_pos)), adj_pos
+
+    def _tree_candidates(self, point):
+        """Retorna [(dist, key, line)] das arestas vivas mais próximas na árvore."""
+        if self._tree is None or len(self._removed) == len(self._keys):
+            return []
+
+        idxs = self._tree.query_nearest(point, all_matches=True)
+        alive = [i for i in idxs if i not in self._removed]
+
+        if not alive:
+            # As mais próximas foram removidas: expande a busca por raio até
+            # encontrar alguma aresta ainda presente no grafo.
+            radius = max(self._lines[idxs[0]].distance(point), 1e-9)
+            while not alive:
+                radius *= 2
+                idxs = self._tree.query(point, predicate="dwithin", distance=radius)
+                alive = [i for i in idxs if i not in self._removed]
+                if len(idxs) == len(self._keys) and not alive:
+                    return []
+
+        result = []
+        for i in alive:
+            line = self._lines[i]
+            result.append((line.distance(point), self._keys[i], line))
+        return result
+
+    def nearest(self, point):
+        """
+        Retorna (u, v, line) da aresta mais próxima de 'point', ou None se o
+        índice estiver vazio.
+        """
+        candidates = self._tree_candidates(point)
+        for key, line in self._extra.items():
+            candidates.append((line.distance(point), key, line))
+
+        if not candidates:
+            return None
+
+        min_dist = min(c[0] for c in candidates)
+        ties = [c for c in candidates if c[0] == min_dist]
+        if len(ties) > 1:
+            ties.sort(key=lambda c: self._order_key(c[1]))
+        _, (u, v), line = ties[0]
+        return u, v, line
+
+
+class CompiledEdgeIndex:
+    """
+    Índice espacial estático sobre as arestas de um CompiledGraph.
+
+    Como o grafo compilado nunca é alterado (os pontos de consulta viram nós
+    virtuais, ver overlay.py), basta um STRtree construído uma vez. As
+    arestas estão na ordem de G.edges, então o desempate pela menor posição
+    reproduz a escolha da varredura linear.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._lines = graph.edge_lines()
+        self._tree = STRtree(self._lines) if len(self._lines) else None
+
+    def __len__(self):
+        return len(self._lines)
+
+    def nearest(self, point):
+        """Retorna o id da aresta mais próxima de 'point', ou None se não houver arestas."""
+        if self._tree is None:
+            return None
+        idxs = self._tree.query_nearest(point, all_matches=True)
+        if len(idxs) == 1:
+            return int(idxs[0])
+        dists = [self._lines[i].distance(point) for i in idxs]
+        min_dist = min(dists)
+        return int(min(i for i, d in zip(idxs, dists) if d == min_dist))
+
+    def line(self, edge):
+        return self._lines[edge]
@@ -0,0 +1,52 @@
+"""
+Cálculo vetorizado de distâncias entre coordenadas (lon, lat) em graus.
+
+  • "geodesic"  – distância geodésica no elipsoide WGS-84 (algoritmo de
+                  Karney via pyproj.Geod.inv). É o mesmo modelo usado pelo
+                  geopy.distance.distance, e os resultados coincidem com o
+                  geopy com diferença menor que 1e-6 m por segmento.
+  • "haversine" – aproximação esférica (raio médio de 6 371 008.8 m), mais
+                  rápida. Erro relativo de até ~0.5 % em relação à geodésica
+                  (tipicamente 0.1–0.3 % nas latitudes do Brasil).
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+LENGTH_METHODS = ("geodesic", "haversine")
+
+_GEOD = None
+
+
+def _get_geod():
+    global _GEOD
+    if _GEOD is None:
+        from pyproj import Geod
+        _GEOD = Geod(ellps="WGS84")
+    return _GEOD
+
+
+def geodesic_lengths(lon1, lat1, lon2, lat2):
+    """Distância geodésica WGS-84 em metros para arrays de segmentos."""
+    lon1, lat1, lon2, lat2 = (np.asarray(a, dtype=np.float64) for a in (lon1, lat1, lon2, lat2))
+    if lon1.size == 0:
+        return np.zeros(0, dtype=np.float64)
+    _, _, dist = _get_geod().inv(lon1, lat1, lon2, lat2)
+    return np.asarray(dist, dtype=np.float64)
+
+
+def haversine_lengths(lon1, lat1, lon2, lat2):
+    """Distância de grande círculo (esfera) em metros para arrays de segmentos."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lon1, lat1, lon2, lat2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def segment_lengths(lon1, lat1, lon2, lat2, method="geodesic"):
+    """Despacha para o método de distância escolhido ('geodesic' ou 'haversine')."""
+    if method == "geodesic":
+        return geodesic_lengths(lon1, lat1, lon2, lat2)
+    if method == "haversine":
+        return haversine_lengths(lon1, lat1, lon2, lat2)
+    raise ValueError(f"Método de distância desconhecido: {method} (use um de {LENGTH_METHODS})")
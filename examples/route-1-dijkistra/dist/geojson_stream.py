@@ -0,0 +1,193 @@
+"""
+Leitura em streaming de mapas GeoJSON grandes.
+
+json.load do payload inteiro cria todos os dicts e listas do mapa de uma
+vez, e o mapa ainda é copiado ao longo da construção do grafo. Aqui o
+arquivo é lido em blocos e cada feature de "features" é decodificada
+sozinha (json.JSONDecoder.raw_decode sobre o bloco atual), entregue a quem
+está construindo o grafo e descartada. A memória fica limitada ao bloco de
+leitura, a uma feature e ao grafo que está sendo montado.
+
+  • read_payload(path)   – lê o payload do workflow; "map" vira um
+                           GeoJSONStream e as outras chaves são decodificadas
+  • GeoJSONStream        – iterável (relido do disco a cada iteração) com as
+                           features do mapa e o hash do seu conteúdo
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+    """Cursor sobre um arquivo de texto JSON lido em blocos."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Lê mais um bloco (ao menos do tamanho do que ainda não foi consumido)."""
+        if self.eof:
+            return False
+        pending = self.buf[self.pos:]
+        chunk = self.f.read(max(self.chunk_size, len(pending)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = pending + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Próximo caractere depois dos espaços, ou "" no fim do arquivo."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"JSON inválido: esperado um de {chars!r}, encontrado {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        """Decodifica o próximo valor JSON. Retorna (valor, texto original)."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Valor cortado no fim do bloco: lê mais e tenta de novo
+                if self._fill():
+                    continue
+                raise
+            # Um número no fim do bloco pode continuar no próximo
+            if end == len(self.buf) and self._fill():
+                continue
+            raw = self.buf[self.pos:end]
+            self.pos = end
+            return value, raw
+
+    def object_keys(self):
+        """
+        Percorre um objeto JSON gerando as suas chaves. Quem consome o
+        gerador precisa ler (value()) ou percorrer o valor de cada chave
+        antes de pedir a próxima.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key, _ = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def array_items(self):
+        """Gera (valor, texto original) de cada elemento de um array JSON."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def _iter_features(reader, hasher=None):
+    """
+    Percorre o objeto FeatureCollection na posição atual do reader, gerando
+    cada feature. Se 'hasher' for informado, recebe o texto de cada uma.
+    """
+    for key in reader.object_keys():
+        if key != "features":
+            reader.value()
+            continue
+        for feature, raw in reader.array_items():
+            if hasher is not None:
+                hasher.update(raw.encode("utf-8"))
+                hasher.update(b"\n")
+            yield feature
+
+
+class GeoJSONStream:
+    """
+    Features de um mapa GeoJSON guardado em 'path', dentro do objeto
+    indicado por 'prefix' (ex.: ("map",) para o payload do workflow, ou ()
+    para um arquivo que já é a FeatureCollection).
+
+    Pode ser percorrido várias vezes; cada iteração relê o arquivo.
+    content_digest() é o hash do texto das features, usado como chave do
+    cache de grafos (ver graph_cache.map_digest).
+    """
+
+    def __init__(self, path, prefix=(), chunk_size=CHUNK_SIZE, digest=None):
+        self.path = Path(path)
+        self.prefix = tuple(prefix)
+        self.chunk_size = chunk_size
+        self._digest = digest
+
+    def _open(self, hasher=None):
+        with open(self.path, "r", encoding="utf-8") as f:
+            reader = _Reader(f, self.chunk_size)
+            for name in self.prefix:
+                for key in reader.object_keys():
+                    if key == name:
+                        break
+                    reader.value()
+                else:
+                    return
+            yield from _iter_features(reader, hasher)
+
+    def __iter__(self):
+        return self._open()
+
+    def content_digest(self):
+        if self._digest is None:
+            hasher = hashlib.sha256()
+            for _ in self._open(hasher):
+                pass
+            self._digest = hasher.hexdigest()
+        return self._digest
+
+
+def read_payload(path, chunk_size=CHUNK_SIZE):
+    """
+    Lê o payload do workflow ({"map": ..., "points": ..., "options": ...})
+    sem carregar o mapa na memória. "map" é retornado como GeoJSONStream:
+    se o payload traz a FeatureCollection, as features são percorridas uma
+    vez só para calcular o hash; se traz o caminho de um arquivo, o arquivo
+    é lido só quando o grafo precisar ser construído. As demais chaves são
+    decodificadas normalmente.
+    """
+    payload = {}
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        for key in reader.object_keys():
+            if key == "map" and reader.peek() == "{":
+                hasher = hashlib.sha256()
+                for _ in _iter_features(reader, hasher):
+                    pass
+                payload[key] = GeoJSONStream(path, ("map",), chunk_size, digest=hasher.hexdigest())
+            elif key == "map":
+                value, _ = reader.value()
+                payload[key] = GeoJSONStream(value, (), chunk_size) if isinstance(value, str) else value
+            else:
+                payload[key], _ = reader.value()
+    return payload
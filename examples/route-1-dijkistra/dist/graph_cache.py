@@ -0,0 +1,416 @@
+"""
+Grafo viário compilado (CSR) e cache em disco.
+
+O grafo compilado guarda a rede em arrays NumPy:
+  • coords  (n, 2) float64 – (lon, lat) de cada nó, na ordem de G.nodes
+  • indptr  (n + 1) int64   – início das arestas de saída de cada nó
+  • indices (m,) int32/64   – nó de destino de cada aresta
+  • lengths (m,) float64    – comprimento de cada aresta em metros
+  • geom_indptr (m + 1) int64 / geom_coords (k, 2) float64 – vértices
+    intermediários de cada aresta (arestas contraídas por simplify.py);
+    arestas retas não têm vértices intermediários
+
+Os arrays são gravados como .npy e carregados com mmap_mode="r", então um
+acerto no cache custa apenas abrir os arquivos: as páginas são lidas sob
+demanda e compartilhadas entre processos pelo cache do sistema operacional.
+
+A chave do cache é o hash do conteúdo do mapa mais as opções de construção
+(ex.: length_method). O diretório do cache é limitado em bytes e as entradas
+menos usadas recentemente são removidas primeiro.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+
+from edge_index import CompiledEdgeIndex
+
+# Entra na chave do cache: incrementar quando mudar o formato dos arrays ou o
+# grafo construído para o mesmo mapa (3: simplify.py não descarta mais vias)
+FORMAT_VERSION = 3
+ARRAYS = ("coords", "indptr", "indices", "lengths", "geom_indptr", "geom_coords")
+DEFAULT_CACHE_DIR = "/tmp/is/cache/graphs"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MEMORY_GRAPHS = 8
+DEFAULT_MEMORY_BYTES = 4 * 1024 ** 3
+# Nome das entradas do GraphCache: o hash de map_digest
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class CompiledGraph:
+    """Grafo dirigido em formato CSR, com nós numerados de 0 a n-1."""
+
+    def __init__(self, coords, indptr, indices, lengths, geom_indptr=None, geom_coords=None):
+        self.coords = coords
+        self.indptr = indptr
+        self.indices = indices
+        self.lengths = lengths
+        if geom_indptr is None:
+            geom_indptr = np.zeros(len(indices) + 1, dtype=np.int64)
+            geom_coords = np.zeros((0, 2), dtype=np.float64)
+        self.geom_indptr = geom_indptr
+        self.geom_coords = geom_coords
+        self._node_ids = None
+        self._edge_sources = None
+        self._edge_index = None
+        self._reverse = None
+        self.path = None
+        self.ch = None
+
+    @property
+    def number_of_nodes(self):
+        return len(self.coords)
+
+    @property
+    def number_of_edges(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_networkx(cls, G, weight="length"):
+        """Compila um nx.DiGraph cujos nós são tuplas (lon, lat)."""
+        nodes = list(G)
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+
+        coords = np.array(nodes, dtype=np.float64).reshape(n, 2)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        targets = []
+        lengths = []
+        geom_counts = []
+        geom_coords = []
+        for i, node in enumerate(nodes):
+            adj = G._adj[node]
+            targets.extend(node_ids[nbr] for nbr in adj)
+            lengths.extend(data[weight] for data in adj.values())
+            for data in adj.values():
+                geometry = data.get("geometry")
+                interior = list(geometry.coords)[1:-1] if geometry is not None else []
+                geom_counts.append(len(interior))
+                geom_coords.extend(interior)
+            indptr[i + 1] = len(targets)
+
+        indices = np.array(targets, dtype=np.int32 if n < 2 ** 31 else np.int64)
+        lengths = np.array(lengths, dtype=np.float64)
+        geom_indptr = np.zeros(len(targets) + 1, dtype=np.int64)
+        np.cumsum(geom_counts, out=geom_indptr[1:])
+        geom_coords = np.array(geom_coords, dtype=np.float64).reshape(-1, 2)
+
+        compiled = cls(coords, indptr, indices, lengths, geom_indptr, geom_coords)
+        compiled._node_ids = node_ids
+        return compiled
+
+    def to_networkx(self):
+        """Reconstrói o nx.DiGraph (mesma ordem de nós e arestas do original)."""
+        import networkx as nx
+
+        G = nx.DiGraph()
+        nodes = list(map(tuple, self.coords.tolist()))
+        G.add_nodes_from(nodes)
+        sources = self.edge_sources()
+        G.add_edges_from(
+            (nodes[u], nodes[v], {"length": length})
+            for u, v, length in zip(sources.tolist(), self.indices.tolist(), self.lengths.tolist())
+        )
+        for edge in np.flatnonzero(np.diff(self.geom_indptr)).tolist():
+            u, v = nodes[int(sources[edge])], nodes[int(self.indices[edge])]
+            G._adj[u][v]["geometry"] = LineString(self.edge_coords(edge))
+        return G
+
+    def node_id(self, node):
+        """Retorna o id inteiro do nó (lon, lat), ou None se não existir."""
+        if self._node_ids is None:
+            self._node_ids = {node: i for i, node in enumerate(map(tuple, self.coords.tolist()))}
+        return self._node_ids.get(tuple(node))
+
+    def successors(self, u):
+        """Lista de (v, length) das arestas de saída do nó u."""
+        start, end = int(self.indptr[u]), int(self.indptr[u + 1])
+        return list(zip(self.indices[start:end].tolist(), self.lengths[start:end].tolist()))
+
+    def predecessors(self, v):
+        """Lista de (u, length) das arestas de entrada do nó v (CSR reverso, montado uma vez)."""
+        if self._reverse is None:
+            order = np.argsort(self.indices, kind="stable")
+            rev_indptr = np.zeros(self.number_of_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.number_of_nodes), out=rev_indptr[1:])
+            self._reverse = (rev_indptr, self.edge_sources()[order], self.lengths[order])
+        rev_indptr, rev_sources, rev_lengths = self._reverse
+        start, end = int(rev_indptr[v]), int(rev_indptr[v + 1])
+        return list(zip(rev_sources[start:end].tolist(), rev_lengths[start:end].tolist()))
+
+    def edge_sources(self):
+        """Array (m,) com o nó de origem de cada aresta (inverso do indptr)."""
+        if self._edge_sources is None:
+            self._edge_sources = np.repeat(
+                np.arange(self.number_of_nodes, dtype=self.indices.dtype), np.diff(self.indptr))
+        return self._edge_sources
+
+    def edge_source(self, edge):
+        """Nó de origem de uma aresta (busca binária no indptr, sem array extra)."""
+        return int(np.searchsorted(self.indptr, edge, side="right")) - 1
+
+    def find_edge(self, u, v):
+        """Retorna o id da aresta u->v, ou None se ela não existir."""
+        start = int(self.indptr[u])
+        hits = np.flatnonzero(self.indices[start:int(self.indptr[u + 1])] == v)
+        return start + int(hits[0]) if len(hits) else None
+
+    def edge_interior(self, edge):
+        """Vértices intermediários (lon, lat) da aresta; lista vazia para arestas retas."""
+        start, end = int(self.geom_indptr[edge]), int(self.geom_indptr[edge + 1])
+        if start == end:
+            return []
+        return list(map(tuple, self.geom_coords[start:end].tolist()))
+
+    def edge_coords(self, edge):
+        """Todos os vértices (lon, lat) da aresta, de u até v."""
+        u, v = self.edge_source(edge), int(self.indices[edge])
+        return [tuple(self.coords[u].tolist())] + self.edge_interior(edge) + [tuple(self.coords[v].tolist())]
+
+    def edge_lines(self):
+        """Array de LineStrings de cada aresta (com a geometria completa), na ordem das arestas."""
+        m = self.number_of_edges
+        interior_counts = np.diff(self.geom_indptr)
+        counts = interior_counts + 2
+        offsets = np.zeros(m + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        points = np.empty((int(offsets[-1]), 2), dtype=np.float64)
+        points[offsets[:-1]] = self.coords[self.edge_sources()]
+        points[offsets[1:] - 1] = self.coords[self.indices]
+        if len(self.geom_coords):
+            owner = np.repeat(np.arange(m), interior_counts)
+            position = offsets[owner] + 1 + (np.arange(len(self.geom_coords)) - self.geom_indptr[owner])
+            points[position] = self.geom_coords
+
+        return shapely.linestrings(points, indices=np.repeat(np.arange(m), counts))
+
+    def edge_index(self):
+        """Índice espacial das arestas (CompiledEdgeIndex), construído uma única vez."""
+        if self._edge_index is None:
+            self._edge_index = CompiledEdgeIndex(self)
+        return self._edge_index
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        mode = "r" if mmap else None
+        # view(np.ndarray) mantém o mapeamento, mas evita o custo da subclasse
+        # np.memmap a cada fatia feita durante as buscas
+        arrays = {name: _load_array(path / f"{name}.npy", mode) for name in ARRAYS}
+        compiled = cls(**arrays)
+        if mmap:
+            compiled.path = path
+        return compiled
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+
+def _load_array(file, mode):
+    try:
+        return np.load(file, mmap_mode=mode).view(np.ndarray)
+    except ValueError:
+        # Arrays vazios (ex.: geom_coords sem arestas contraídas) não podem ser mapeados
+        return np.load(file)
+
+
+def map_digest(a_map, options=None):
+    """
+    Hash SHA-256 do conteúdo do mapa (dict GeoJSON, str, bytes ou um
+    GeoJSONStream, que informa o hash das suas features) mais as opções de
+    construção do grafo. É a chave usada pelo GraphCache.
+    """
+    h = hashlib.sha256()
+    h.update(f"v{FORMAT_VERSION}\0".encode())
+    h.update(json.dumps(options or {}, sort_keys=True).encode())
+    h.update(b"\0")
+    if hasattr(a_map, "content_digest"):
+        h.update(a_map.content_digest().encode())
+    elif isinstance(a_map, bytes):
+        h.update(a_map)
+    elif isinstance(a_map, str):
+        h.update(a_map.encode("utf-8"))
+    else:
+        h.update(json.dumps(a_map, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return h.hexdigest()
+
+
+class GraphCache:
+    """
+    Cache de grafos compilados em disco, uma subpasta por chave.
+
+    Cada gravação é feita numa pasta temporária e renomeada no final, então
+    leitores concorrentes nunca veem uma entrada pela metade. O horário de
+    modificação da pasta marca o último acesso e é usado na remoção LRU
+    quando o total passa de 'max_bytes'.
+
+    Só contam como entradas (e só são removidas) as subpastas cujo nome é
+    um hash de map_digest e que têm meta.json; qualquer outra coisa em
+    'cache_dir' é ignorada, então a pasta pode ser compartilhada.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+
+    def _entry(self, key):
+        if not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Chave de cache inválida: {key!r}")
+        return self.cache_dir / key
+
+    @staticmethod
+    def _is_entry(path):
+        return (KEY_PATTERN.fullmatch(path.name) is not None and not path.is_symlink()
+                and path.is_dir() and (path / "meta.json").is_file())
+
+    def get(self, key, mmap=True):
+        entry = self._entry(key)
+        if not (entry / "meta.json").exists():
+            return None
+        try:
+            compiled = CompiledGraph.load(entry, mmap=mmap)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        try:
+            os.utime(entry, (now, now))
+        except FileNotFoundError:
+            # Entrada removida por outro processo (evict) depois da leitura
+            return None
+        return compiled
+
+    def put(self, key, compiled, meta=None):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(key)
+        tmp = self.cache_dir / f".{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        compiled.save(tmp)
+        info = {"format_version": FORMAT_VERSION, "created": time.time(),
+                "nodes": compiled.number_of_nodes, "edges": compiled.number_of_edges}
+        info.update(meta or {})
+        (tmp / "meta.json").write_text(json.dumps(info))
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Outro processo gravou a mesma chave antes
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+        if entry.exists():
+            compiled.path = entry
+        return entry
+
+    def entries(self):
+        """Lista (mtime, bytes, path) de cada entrada válida do cache."""
+        result = []
+        if not self.cache_dir.exists():
+            return result
+        for entry in self.cache_dir.iterdir():
+            if not self._is_entry(entry):
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+            result.append((entry.stat().st_mtime, size, entry))
+        return result
+
+    def evict(self):
+        """Remove as entradas menos usadas até o total caber em max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed.append(entry.name)
+        return removed
+
+
+class MemoryGraphCache:
+    """
+    LRU de grafos compilados já abertos, para processos de longa duração
+    (modo servidor). Limitado em número de grafos e em bytes
+    (CompiledGraph.nbytes); o grafo usado há mais tempo sai primeiro.
+
+    Pode ser usado por várias threads: get_or_load garante que cada chave é
+    carregada por uma única thread, enquanto as outras que pedem a mesma
+    chave esperam e recebem o mesmo objeto.
+    """
+
+    def __init__(self, max_graphs=DEFAULT_MEMORY_GRAPHS, max_bytes=DEFAULT_MEMORY_BYTES):
+        self.max_graphs = int(max_graphs)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._graphs = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._graphs)
+
+    def _lookup(self, key):
+        compiled = self._graphs.get(key)
+        if compiled is not None:
+            self._graphs.move_to_end(key)
+            self.hits += 1
+        return compiled
+
+    def get_or_load(self, key, load):
+        """
+        Retorna (grafo, acerto). Se a chave não estiver no LRU, load() é
+        chamado sem argumentos e o grafo retornado entra no LRU.
+        """
+        with self._lock:
+            compiled = self._lookup(key)
+            if compiled is not None:
+                return compiled, True
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                compiled = self._lookup(key)
+                if compiled is not None:
+                    return compiled, True
+                self.misses += 1
+            try:
+                compiled = load()
+                with self._lock:
+                    self._graphs[key] = compiled
+                    self.evict()
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return compiled, False
+
+    def evict(self):
+        """Remove os grafos menos usados até caber nos limites (chamar com o lock)."""
+        total = sum(compiled.nbytes for compiled in self._graphs.values())
+        while len(self._graphs) > 1 and (len(self._graphs) > self.max_graphs or total > self.max_bytes):
+            _, compiled = self._graphs.popitem(last=False)
+            total -= compiled.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {"graphs": len(self._graphs),
+                    "bytes": sum(compiled.nbytes for compiled in self._graphs.values()),
+                    "max_graphs": self.max_graphs,
+                    "max_bytes": self.max_bytes,
+                    "hits": self.hits,
+                    "misses": self.misses}
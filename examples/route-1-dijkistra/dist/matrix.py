@@ -0,0 +1,93 @@
+"""
+Matriz de distâncias (origens x destinos) sobre um CompiledGraph.
+
+Todas as origens e destinos viram nós virtuais de um mesmo QueryOverlay:
+um nó virtual apenas divide uma aresta em duas partes que somam o
+comprimento original, então não altera nenhuma distância. Cada busca é um
+Dijkstra que para quando todos os pontos do outro lado foram fixados, e
+nenhum caminho é montado – só as distâncias.
+
+O número de buscas é o menor dos dois lados: com mais origens do que
+destinos (ex.: muitos talhões para poucas usinas), as buscas partem dos
+destinos pelas arestas de entrada e a matriz é montada transposta.
+"""
+import csv
+import json
+
+import numpy as np
+
+from overlay import QueryOverlay
+from parallel import map_in_pool
+from search import dijkstra
+
+MATRIX_FORMATS = ("npy", "csv")
+
+
+def distance_rows(graph, source_snaps, target_snaps, reverse=False):
+    """
+    Linhas da matriz para 'source_snaps': array (len(source_snaps),
+    len(target_snaps)) em metros, com inf onde não há caminho. Com
+    reverse=True as buscas seguem as arestas de entrada, e a linha i tem a
+    distância de cada "target" até source_snaps[i].
+    """
+    overlay = QueryOverlay(graph)
+    sources = [overlay.add(snap) for snap in source_snaps]
+    targets = [overlay.add(snap) for snap in target_snaps]
+    neighbors = overlay.predecessors if reverse else overlay.successors
+    wanted = set(targets)
+
+    rows = np.full((len(sources), len(targets)), np.inf)
+    for i, source in enumerate(sources):
+        dist, _ = dijkstra(neighbors, source, wanted)
+        rows[i] = [dist.get(target, np.inf) for target in targets]
+    return rows
+
+
+def distance_matrix(graph, source_snaps, target_snaps, workers=1):
+    """
+    Matriz (len(source_snaps), len(target_snaps)) de distâncias mínimas em
+    metros (inf = inalcançável). Com workers > 1 as buscas são divididas em
+    blocos executados no pool de processos de parallel.py.
+    """
+    reverse = len(source_snaps) > len(target_snaps)
+    if reverse:
+        source_snaps, target_snaps = target_snaps, source_snaps
+
+    workers = max(1, int(workers or 1))
+    if workers == 1 or len(source_snaps) < 2:
+        matrix = distance_rows(graph, source_snaps, target_snaps, reverse)
+    else:
+        size = -(-len(source_snaps) // workers)
+        blocks = [(source_snaps[start:start + size], target_snaps, reverse)
+                  for start in range(0, len(source_snaps), size)]
+        matrix = np.vstack(map_in_pool(graph, distance_rows, blocks, workers))
+
+    return matrix.T if reverse else matrix
+
+
+def save_matrix(matrix, sources, targets, filename, fmt="npy"):
+    """
+    Grava a matriz e retorna os arquivos gerados.
+
+      • "npy" – <filename>.npy (float64, inf = inalcançável) e
+                <filename>.json com os nomes e coordenadas das linhas
+                (sources) e colunas (targets)
+      • "csv" – <filename>.csv com os nomes dos destinos no cabeçalho, o
+                nome da origem na primeira coluna e célula vazia onde não
+                há caminho
+    """
+    if fmt == "npy":
+        np.save(f"{filename}.npy", np.ascontiguousarray(matrix, dtype=np.float64))
+        with open(f"{filename}.json", "w", encoding="utf-8") as f:
+            json.dump({"sources": sources, "targets": targets, "unit": "m"}, f)
+        return [f"{filename}.npy", f"{filename}.json"]
+
+    if fmt == "csv":
+        with open(f"{filename}.csv", "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([""] + [target["name"] for target in targets])
+            for source, row in zip(sources, matrix.tolist()):
+                writer.writerow([source["name"]] + [f"{d:.3f}" if d != np.inf else "" for d in row])
+        return [f"{filename}.csv"]
+
+    raise ValueError(f"Formato de matriz desconhecido: {fmt} (use um de {MATRIX_FORMATS})")
@@ -0,0 +1,169 @@
+"""
+Nós virtuais de consulta sobre um CompiledGraph imutável.
+
+Em vez de dividir a aresta mais próxima (como add_node_in_edge faz no
+nx.DiGraph), cada ponto de origem/destino vira um nó virtual que só existe
+dentro de um QueryOverlay. O nó virtual é ligado às duas direções da aresta
+encaixada (u->v e, se existir, v->u), com comprimentos proporcionais à
+posição do ponto na aresta. O grafo base nunca é alterado, então:
+  • o custo de cada consulta não cresce ao longo de um lote;
+  • encaixes posteriores nunca caem em "meias arestas" de consultas antigas;
+  • um mesmo grafo pode ser compartilhado por consultas concorrentes.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from geodesy import geodesic_lengths
+
+Snap = namedtuple("Snap", ["edge", "t", "point", "segment"])
+Snap.__doc__ = """
+Encaixe de um ponto na aresta 'edge', na fração 't' (0 = u, 1 = v) do seu
+comprimento, dentro do segmento 'segment' da geometria da aresta.
+"""
+
+
+def snap_point(graph, point):
+    """
+    Encaixa 'point' (shapely Point) na aresta mais próxima do grafo.
+    Retorna um Snap, ou None se o grafo não tiver arestas.
+
+    Em arestas retas a fração t é a posição projetada na linha. Em arestas
+    contraídas (com vários vértices) t é a fração do comprimento geodésico
+    até o ponto projetado, para que as partes somem o 'length' da aresta
+    na mesma proporção do desenho da via.
+    """
+    index = graph.edge_index()
+    edge = index.nearest(point)
+    if edge is None:
+        return None
+
+    line = index.line(edge)
+    proj_dist = line.project(point)
+    new_point = line.interpolate(proj_dist)
+    coords = np.asarray(line.coords)
+
+    if len(coords) == 2:
+        t = proj_dist / line.length if line.length > 0 else 0.0
+        return Snap(edge, t, (new_point.x, new_point.y), 0)
+
+    # Segmento da polilinha onde caiu a projeção
+    planar = np.hypot(*np.diff(coords, axis=0).T)
+    cumulative = np.concatenate([[0.0], np.cumsum(planar)])
+    segment = int(min(np.searchsorted(cumulative, proj_dist, side="right") - 1, len(planar) - 1))
+    fraction = (proj_dist - cumulative[segment]) / planar[segment] if planar[segment] > 0 else 0.0
+
+    geo = geodesic_lengths(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    total = geo.sum()
+    t = (geo[:segment].sum() + fraction * geo[segment]) / total if total > 0 else 0.0
+    return Snap(edge, float(min(max(t, 0.0), 1.0)), (new_point.x, new_point.y), segment)
+
+
+class QueryOverlay:
+    """
+    Conjunto de nós virtuais de uma consulta. Os nós virtuais recebem ids a
+    partir de graph.number_of_nodes; as arestas extras (e os vértices
+    intermediários delas, em arestas contraídas) ficam em dicionários
+    próprios e são somadas às do grafo base em successors().
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.base_nodes = graph.number_of_nodes
+        self._coords = []
+        self._by_point = {}
+        self._out = {}
+        self._in = {}
+        self._geom = {}
+        self._on_edge = {}
+
+    def __len__(self):
+        return len(self._coords)
+
+    def _add_edge(self, u, v, length, interior):
+        self._out.setdefault(u, []).append((v, length))
+        self._in.setdefault(v, []).append((u, length))
+        if interior:
+            self._geom[(u, v)] = interior
+
+    def _attach(self, node, edge, t, segment):
+        """Liga 'node' à aresta 'edge' na posição t e aos outros nós virtuais da mesma aresta."""
+        graph = self.graph
+        u = graph.edge_source(edge)
+        v = int(graph.indices[edge])
+        length = float(graph.lengths[edge])
+        interior = graph.edge_interior(edge)
+
+        # interior[:segment] são os vértices entre u e o ponto encaixado
+        self._add_edge(u, node, length * t, interior[:segment])
+        self._add_edge(node, v, length * (1.0 - t), interior[segment:])
+
+        for other_t, other, other_segment in self._on_edge.get(edge, []):
+            if other_t <= t:
+                self._add_edge(other, node, length * (t - other_t), interior[other_segment:segment])
+            else:
+                self._add_edge(node, other, length * (other_t - t), interior[segment:other_segment])
+        self._on_edge.setdefault(edge, []).append((t, node, segment))
+
+    def add(self, snap):
+        """Cria (ou reaproveita) o nó virtual do encaixe e retorna o seu id."""
+        node = self._by_point.get(snap.point)
+        if node is not None:
+            return node
+
+        node = self.base_nodes + len(self._coords)
+        self._coords.append(snap.point)
+        self._by_point[snap.point] = node
+
+        self._attach(node, snap.edge, snap.t, snap.segment)
+
+        # Via de mão dupla: o ponto também divide a aresta inversa v->u, desde
+        # que ela tenha o mesmo desenho (percorrido ao contrário)
+        graph = self.graph
+        u = graph.edge_source(snap.edge)
+        v = int(graph.indices[snap.edge])
+        reverse = graph.find_edge(v, u)
+        if reverse is not None and reverse != snap.edge:
+            interior = graph.edge_interior(snap.edge)
+            if graph.edge_interior(reverse) == interior[::-1]:
+                self._attach(node, reverse, 1.0 - snap.t, len(interior) - snap.segment)
+
+        return node
+
+    def successors(self, u):
+        """(v, length) das arestas de saída de u, incluindo as do overlay."""
+        extra = self._out.get(u)
+        if u >= self.base_nodes:
+            return extra or []
+        base = self.graph.successors(u)
+        return base + extra if extra else base
+
+    def predecessors(self, v):
+        """(u, length) das arestas de entrada de v, incluindo as do overlay."""
+        extra = self._in.get(v)
+        if v >= self.base_nodes:
+            return extra or []
+        base = self.graph.predecessors(v)
+        return base + extra if extra else base
+
+    def coord(self, node):
+        if node >= self.base_nodes:
+            return self._coords[node - self.base_nodes]
+        x, y = self.graph.coords[node]
+        return float(x), float(y)
+
+    def path_coords(self, path):
+        """
+        Converte uma lista de ids de nós em coordenadas (lon, lat), incluindo
+        os vértices intermediários das arestas contraídas percorridas.
+        """
+        if not path:
+            return []
+        coords = [self.coord(path[0])]
+        for a, b in zip(path, path[1:]):
+            interior = self._geom.get((a, b))
+            if interior is None and a < self.base_nodes and b < self.base_nodes:
+                interior = self.graph.edge_interior(self.graph.find_edge(a, b))
+            coords.extend(interior or [])
+            coords.append(self.coord(b))
+        return coords
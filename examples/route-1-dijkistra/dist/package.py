@@ -1,17 +1,32 @@
 import argparse
-import http.server
 import json
 import sys
-import osmnx as ox
-from shapely.ops import nearest_points
-import geopandas as gpd
-import networkx as nx
-import shapely
-from shapely.geometry import Point, shape, LineString, MultiLineString
-from geopy.distance import distance
-import math
+import os
+import threading
+import time
+from functools import partial
 from pathlib import Path
 
+import numpy as np
+from shapely.geometry import Point, LineString
+from shapely.ops import substring
+
+from edge_index import EdgeIndex
+from geodesy import segment_lengths
+from geojson_stream import GeoJSONStream, read_payload
+from graph_cache import (CompiledGraph, GraphCache, MemoryGraphCache, map_digest, DEFAULT_CACHE_DIR,
+                         DEFAULT_MAX_BYTES, DEFAULT_MEMORY_BYTES, DEFAULT_MEMORY_GRAPHS)
+from matrix import distance_matrix, save_matrix
+from overlay import snap_point
+from parallel import ENGINES, prepare_engine, run_route_tasks
+from route_writer import GPX_FOOTER, GPX_HEADER, RouteWriter, gpx_track
+from simplify import contract_degree2
+
+# networkx (construção do grafo e modo par a par), http.server (modo
+# servidor) e o pool de processos (workers > 1) são importados só quando
+# usados: numa execução que acha o grafo no cache o processo não paga o
+# import deles. Ver benchmarks/bench_startup.py.
+
 def get_cli_args() -> argparse.Namespace:
     """
     Lê a linha de comando e retorna um Namespace com:
@@ -46,6 +61,38 @@ def get_cli_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def get_server_args() -> argparse.Namespace:
+    """
+    Linha de comando do modo servidor: python3 package.py <porta> [opções].
+    """
+    from server import DEFAULT_MAX_BODY_BYTES
+
+    parser = argparse.ArgumentParser(
+        description="Roteador como serviço HTTP (POST /input, GET /metrics)."
+    )
+    parser.add_argument("port", type=int, help="Porta TCP do serviço")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Endereço em que o serviço ouve (sem autenticação: exponha com cuidado)")
+    parser.add_argument(
+        "--project_id",
+        required=False,
+        default=None,
+        help="Projeto usado quando a requisição não informar project_id"
+    )
+    parser.add_argument("--max_graphs", type=int, default=DEFAULT_MEMORY_GRAPHS,
+                        help="Quantidade máxima de grafos mantidos na memória")
+    parser.add_argument("--max_graph_bytes", type=int, default=DEFAULT_MEMORY_BYTES,
+                        help="Tamanho máximo (bytes) dos grafos mantidos na memória")
+    parser.add_argument("--data_root", default=DEFAULT_DATA_ROOT,
+                        help="Pasta de onde podem ser lidos os arquivos de map e points")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help="Pasta do cache de grafos em disco")
+    parser.add_argument("--cache_max_bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help="Tamanho máximo (bytes) do cache de grafos em disco")
+    parser.add_argument("--no_cache", action="store_true", help="Não usa o cache de grafos em disco")
+    parser.add_argument("--max_body_bytes", type=int, default=DEFAULT_MAX_BODY_BYTES,
+                        help="Tamanho máximo (bytes) do corpo de um POST /input; acima dele a resposta é 413")
+    return parser.parse_args()
+
 
 def main(workflow_id: str, project_id: str):
     filePath = Path(f'/tmp/is/{workflow_id}.json')
@@ -53,18 +100,375 @@ def main(workflow_id: str, project_id: str):
         raise FileNotFoundError(f'File {filePath} not found')
         exit(1)
 
-    with open(filePath, 'r') as f:
-        data = json.load(f)
-        a_map = data['map']
-        points = data['points']
-        process(a_map, points, project_id)
+    # O mapa é lido em streaming (GeoJSONStream), sem json.load do arquivo inteiro
+    data = read_payload(filePath)
+    a_map = data['map']
+    points = data['points']
+    options = data.get('options', {})
+    process(a_map, points, project_id, options, output=data.get('output'))
+
+
+def build_graph(a_map, length_method="geodesic", simplify=True):
+    """
+    Constrói o nx.DiGraph do mapa (dict GeoJSON ou GeoJSONStream, cujas
+    features são lidas uma a uma do disco) e, se pedido, contrai as cadeias
+    de grau 2.
+    """
+    features = a_map.get("features", []) if isinstance(a_map, dict) else a_map
+    G = lines_to_G(iter_geojson_lines(features), length_method=length_method)
+    if simplify:
+        nodes = G.number_of_nodes()
+        G = contract_degree2(G)
+        print(f"Grafo simplificado: {nodes} -> {G.number_of_nodes()} nós.")
+    return G
+
+
+def graph_build_options(options):
+    """Opções que mudam o grafo construído (e portanto a chave do cache)."""
+    return {"length_method": options.get("length_method", "geodesic"),
+            "simplify": bool(options.get("simplify", True))}
+
+
+def load_compiled_graph(a_map, options=None, key=None):
+    """
+    Retorna o grafo compilado (CompiledGraph) do mapa, usando o cache em disco.
+
+    options (todas opcionais):
+      • length_method   – "geodesic" (padrão) ou "haversine"
+      • simplify        – contrai cadeias de nós de grau 2 (padrão True)
+      • cache           – False desliga o cache (padrão True)
+      • cache_dir       – pasta do cache (padrão /tmp/is/cache/graphs)
+      • cache_max_bytes – tamanho máximo da pasta do cache (padrão 2 GiB)
+
+    A chave é o hash do conteúdo do mapa mais as opções de construção, então
+    um mapa alterado ou outro length_method gera uma nova entrada. Num acerto
+    os arrays são abertos com memory-map, sem reconstruir o grafo. 'key'
+    permite informar uma chave já calculada (ver graph_key).
+    """
+    options = options or {}
+    build_options = graph_build_options(options)
+
+    if not options.get("cache", True):
+        return CompiledGraph.from_networkx(build_graph(a_map, **build_options))
+
+    cache = GraphCache(options.get("cache_dir", DEFAULT_CACHE_DIR),
+                       options.get("cache_max_bytes", DEFAULT_MAX_BYTES))
+    key = key or map_digest(a_map, build_options)
+
+    compiled = cache.get(key)
+    if compiled is not None:
+        print(f"Grafo {key[:12]} carregado do cache.")
+        return compiled
+
+    compiled = CompiledGraph.from_networkx(build_graph(a_map, **build_options))
+    cache.put(key, compiled, meta=build_options)
+    return compiled
+
 
+_MAP_KEYS = {}
+_PREPARE_LOCK = threading.Lock()
 
-def process(map, points, project_id):
+# Modo servidor: arquivos de entrada só são lidos de DEFAULT_DATA_ROOT (ou
+# --data_root), as opções do cache em disco são fixadas na linha de comando
+# e nomes que entram em caminhos de saída não podem conter separadores.
+DEFAULT_DATA_ROOT = "/tmp/is"
+SERVER_CACHE_OPTIONS = ("cache", "cache_dir", "cache_max_bytes")
+MODES = ("routes", "matrix")
 
-    G = geojson_dict_to_G(map)
-    print(f"Grafo carregado com {G.number_of_nodes()} nós e {G.number_of_edges()} arestas.")
 
+def graph_key(a_map, build_options):
+    """
+    Chave do grafo de 'a_map' (dict GeoJSON ou caminho de um arquivo). Para
+    arquivos o hash é guardado por (caminho, tamanho, mtime), então um mapa
+    já visto não é relido a cada requisição do modo servidor.
+    """
+    if not isinstance(a_map, (str, os.PathLike)):
+        return map_digest(a_map, build_options)
+    path = Path(a_map).resolve()
+    stat = path.stat()
+    memo = (str(path), stat.st_size, stat.st_mtime_ns, json.dumps(build_options, sort_keys=True))
+    key = _MAP_KEYS.get(memo)
+    if key is None:
+        key = _MAP_KEYS[memo] = map_digest(GeoJSONStream(path), build_options)
+    return key
+
+
+def handle_input(payload, graphs, timings, project_id=None, data_root=DEFAULT_DATA_ROOT, cache_options=None):
+    """
+    Atende um POST /input do modo servidor (ver server.py).
+
+    payload: {"input": {"map": ..., "points": ...}, "options": {...},
+              "project_id": "..."}
+    map e points podem vir com o conteúdo JSON ou com o caminho de um
+    arquivo dentro de 'data_root'. As opções do cache em disco vêm de
+    'cache_options' (linha de comando), nunca da requisição. O grafo é
+    procurado primeiro no LRU em memória ('graphs', um MemoryGraphCache);
+    só na primeira vez o mapa é lido e o grafo é aberto do cache em disco ou
+    construído. Os tempos de cada etapa vão para 'timings' (segundos).
+    """
+    from server import RequestError
+
+    if not isinstance(payload, dict):
+        raise RequestError("O corpo da requisição deve ser um objeto JSON.")
+    data = payload.get("input", payload)
+    options = payload.get("options") or data.get("options") or {}
+    if not isinstance(data, dict) or not isinstance(options, dict):
+        raise RequestError("'input' e 'options' devem ser objetos JSON.")
+    options = {k: v for k, v in options.items() if k not in SERVER_CACHE_OPTIONS}
+    options.update(cache_options or {})
+    project_id = str(payload.get("project_id") or project_id or "")
+    if not project_id:
+        raise RequestError("Informe project_id na requisição ou em --project_id.")
+    output = payload.get("output") or {}
+    if not isinstance(output, dict):
+        raise RequestError("'output' deve ser um objeto JSON.")
+    _check_name(project_id, "project_id", RequestError)
+    _check_options(options, RequestError)
+    if "file_name" in output:
+        _check_name(str(output["file_name"]), "output.file_name", RequestError)
+    if "map" not in data or "points" not in data:
+        raise RequestError("Informe map e points em 'input'.")
+
+    start = time.perf_counter()
+    a_map = data["map"]
+    if isinstance(a_map, str):
+        a_map = _input_path(a_map, data_root, "map", RequestError)
+    key = graph_key(a_map, graph_build_options(options))
+
+    def load():
+        the_map = GeoJSONStream(a_map) if isinstance(a_map, (str, os.PathLike)) else a_map
+        compiled = load_compiled_graph(the_map, options, key=key)
+        compiled.edge_index()
+        return compiled
+
+    graph, hit = graphs.get_or_load(key, load)
+    with _PREPARE_LOCK:
+        prepare_engine(graph, options.get("engine", "dijkstra"))
+    timings["graph"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    points = data["points"]
+    if isinstance(points, str):
+        points = get_dict_from_json_file(_input_path(points, data_root, "points", RequestError))
+    if options.get("mode") != "matrix":
+        for points_element in points:
+            for end in ("from", "to"):
+                _check_name(str(points_element[end]["name"]), f"points[].{end}.name", RequestError)
+    result = process(None, points, project_id, options, graph=graph, output=output)
+    timings["route"] = time.perf_counter() - start
+
+    body = {"project_id": project_id, "graph": key, "graph_cached": hit}
+    body["matrix" if options.get("mode") == "matrix" else "routes"] = result
+    return body
+
+
+def _check_name(name, what, error=ValueError):
+    """Recusa nomes que, juntados a um caminho de saída, sairiam da pasta."""
+    if not name or name in (".", "..") or any(c in name for c in "/\\\0"):
+        raise error(f"{what} inválido: não pode ser vazio nem conter '/', '\\' ou '..'.")
+
+
+def _check_options(options, error=ValueError):
+    """Recusa engine, mode e workers fora dos valores aceitos por process()."""
+    engine = options.get("engine", "dijkstra")
+    if engine not in ENGINES:
+        raise error(f"engine inválido: {engine!r} (use um de {', '.join(ENGINES)}).")
+    mode = options.get("mode", "routes")
+    if mode not in MODES:
+        raise error(f"mode inválido: {mode!r} (use um de {', '.join(MODES)}).")
+    workers = options.get("workers", 1)
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+        raise error(f"workers inválido: {workers!r} (use um inteiro maior que zero).")
+
+
+def _input_path(path, root, what, error=ValueError):
+    """Caminho de um arquivo de entrada, que precisa estar dentro de 'root'."""
+    resolved = Path(root, path).resolve()
+    if not resolved.is_relative_to(Path(root).resolve()) or not resolved.is_file():
+        raise error(f"{what}: arquivo não encontrado em {root}.")
+    return resolved
+
+
+def process(map, points, project_id, options=None, graph=None, output=None):
+    """
+    Calcula as rotas de 'points' sobre o mapa.
+
+    Por padrão as requisições são agrupadas pela coordenada de origem e cada
+    origem distinta faz uma única busca de Dijkstra, da qual saem o caminho e
+    a distância de todos os seus destinos (ver process_batch). Com
+    options["batch"] = False cada par é roteado separadamente.
+    options["workers"] define quantos processos executam as buscas do lote e
+    options["engine"] o motor de busca (ver process_batch).
+
+    Com options["mode"] = "matrix" nenhuma rota é gerada: é calculada a
+    matriz de distâncias entre as origens e os destinos (ver process_matrix).
+
+    'output' é a seção "output" do payload (output_type "gpx" ou "geojson"
+    e file_name); com options["combine_output"] todas as rotas vão para um
+    único arquivo e com options["gzip"] os arquivos são comprimidos (ver
+    open_route_writer).
+
+    'graph' permite reaproveitar um CompiledGraph já carregado (modo
+    servidor); nesse caso 'map' não é lido. Retorna um resumo por elemento
+    de 'points' (ver route_summary), ou o resumo da matriz.
+    """
+    options = options or {}
+
+    if graph is None:
+        graph = load_compiled_graph(map, options)
+    print(f"Grafo carregado com {graph.number_of_nodes} nós e {graph.number_of_edges} arestas.")
+
+    mode = options.get("mode", "routes")
+    if mode == "matrix":
+        return process_matrix(graph, points, project_id, workers=options.get("workers", 1),
+                              fmt=options.get("matrix_format", "npy"))
+    if mode != "routes":
+        raise ValueError(f"Modo desconhecido: {mode} (use 'routes' ou 'matrix')")
+
+    with open_route_writer(project_id, options, output) as writer:
+        if options.get("batch", True):
+            return process_batch(graph, points, project_id, workers=options.get("workers", 1),
+                                 engine=options.get("engine", "dijkstra"), writer=writer)
+        return process_pairwise(graph.to_networkx(), points, project_id, writer=writer)
+
+
+def route_summary(points_element, distance_m=None, filename=None):
+    """Resumo de uma rota: nomes das pontas, distância em metros e arquivo gerado (None se não houver rota)."""
+    return {"from": points_element["from"].get("name"),
+            "to": points_element["to"].get("name"),
+            "distance_m": distance_m,
+            "file": filename}
+
+
+def process_batch(graph, points, project_id, workers=1, engine="dijkstra", writer=None):
+    """
+    Roteamento um-para-muitos sobre o grafo compilado, que nunca é alterado:
+    cada ponto distinto é encaixado uma única vez na aresta mais próxima e,
+    para cada origem distinta, a origem e os seus destinos viram nós
+    virtuais de um QueryOverlay descartado ao fim da busca. Cada origem
+    executa um único Dijkstra, que para quando todos os destinos foram
+    alcançados.
+
+    Com workers > 1 as origens são distribuídas num pool de processos que
+    compartilham o grafo por memory-map (ver parallel.py). Os arquivos de
+    saída são gravados sempre na ordem de 'points'.
+
+    engine escolhe o motor de busca: "dijkstra" (padrão, uma busca por
+    origem), "bidirectional", "astar" ou "ch" (hierarquia de contração,
+    pré-processada uma vez e guardada no cache). Todos retornam as mesmas
+    distâncias, a menos de arredondamento de ponto flutuante.
+
+    As rotas são gravadas pelo 'writer' (RouteWriter) em segundo plano,
+    enquanto as próximas são calculadas; sem writer, um GPX por rota.
+    """
+    if writer is None:
+        with RouteWriter() as writer:
+            return process_batch(graph, points, project_id, workers, engine, writer)
+
+    graph = prepare_engine(graph, engine)
+
+    # 1) Encaixar cada ponto distinto na aresta mais próxima
+    snaps = {}
+    for points_element in points:
+        for end in ("from", "to"):
+            coord = tuple(points_element[end]["point"][:2])
+            if coord not in snaps:
+                snaps[coord] = snap_point(graph, Point(coord))
+
+    if any(snap is None for snap in snaps.values()):
+        print("Não foi possível criar nós de origem ou destino. Encerrando.")
+        return [route_summary(points_element) for points_element in points]
+
+    # 2) Agrupar as requisições pela origem
+    groups = {}
+    for points_element in points:
+        groups.setdefault(tuple(points_element["from"]["point"][:2]), []).append(points_element)
+
+    # 3) Um Dijkstra por origem, com parada quando todos os destinos foram fixados
+    tasks = [(snaps[origin], [snaps[tuple(el["to"]["point"][:2])] for el in elements])
+             for origin, elements in groups.items()]
+    results = run_route_tasks(graph, tasks, workers, engine)
+
+    summaries = {}
+    for (origin, elements), routes in zip(groups.items(), results):
+        print(f"Nó A: {snaps[origin].point} – {len(elements)} destino(s).")
+
+        for points_element, route in zip(elements, routes):
+            B_point = snaps[tuple(points_element["to"]["point"][:2])].point
+            if route is None:
+                print(f"Não foi possível encontrar uma rota entre A e B ({B_point}).")
+                summaries[id(points_element)] = route_summary(points_element)
+                continue
+
+            distancia_m, rota = route
+            print(f"Distância de A até B ({B_point}) = {distancia_m:.2f} metros")
+            filename = write_route(writer, rota, project_id, points_element, distancia_m)
+            summaries[id(points_element)] = route_summary(points_element, distancia_m, filename)
+
+    return [summaries[id(points_element)] for points_element in points]
+
+
+def matrix_endpoints(points):
+    """
+    Origens e destinos da matriz. 'points' pode ser
+    {"sources": [{"name", "point"}, ...], "targets": [...]} ou a lista de
+    pares usual, da qual saem as origens ("from") e os destinos ("to")
+    distintos, na ordem em que aparecem.
+    """
+    if isinstance(points, dict):
+        return points["sources"], points["targets"]
+
+    sources, targets = {}, {}
+    for points_element in points:
+        sources.setdefault(tuple(points_element["from"]["point"][:2]), points_element["from"])
+        targets.setdefault(tuple(points_element["to"]["point"][:2]), points_element["to"])
+    return list(sources.values()), list(targets.values())
+
+
+def process_matrix(graph, points, project_id, workers=1, fmt="npy"):
+    """
+    Matriz de distâncias (metros) entre todas as origens e todos os
+    destinos, sem montar os caminhos nem gerar GPX. Uma busca atende uma
+    linha (ou coluna) inteira; ver matrix.py. Grava
+    <output>/distance_matrix.npy (+ .json com os rótulos) ou .csv.
+    """
+    sources, targets = matrix_endpoints(points)
+
+    snaps = {}
+    for endpoint in sources + targets:
+        coord = tuple(endpoint["point"][:2])
+        if coord not in snaps:
+            snaps[coord] = snap_point(graph, Point(coord))
+    if any(snap is None for snap in snaps.values()):
+        raise ValueError("Não foi possível encaixar as origens e destinos no grafo (mapa sem vias).")
+
+    matrix = distance_matrix(graph,
+                             [snaps[tuple(endpoint["point"][:2])] for endpoint in sources],
+                             [snaps[tuple(endpoint["point"][:2])] for endpoint in targets],
+                             workers)
+
+    def labels(endpoints):
+        return [{"name": endpoint.get("name"), "point": list(endpoint["point"][:2])} for endpoint in endpoints]
+
+    files = save_matrix(matrix, labels(sources), labels(targets), matrix_filename(project_id), fmt)
+    unreachable = int(np.isinf(matrix).sum())
+    print(f"Matriz {matrix.shape[0]} x {matrix.shape[1]} gravada em {files[0]} ({unreachable} pares sem caminho).")
+
+    return {"sources": len(sources), "targets": len(targets), "unreachable": unreachable, "files": files}
+
+
+def process_pairwise(G, points, project_id, writer=None):
+    """
+    Roteamento par a par: insere A e B no nx.DiGraph com add_node_in_edge
+    (que altera o grafo) e executa uma busca para cada elemento de 'points'.
+    """
+    import networkx as nx
+
+    if writer is None:
+        with RouteWriter() as writer:
+            return process_pairwise(G, points, project_id, writer)
+
+    summaries = []
     for points_element in points:
 
         pA = Point(points_element["from"]["point"][0], points_element["from"]["point"][1])  # A
@@ -76,54 +480,83 @@ def process(map, points, project_id):
 
         if A_node is None or B_node is None:
             print("Não foi possível criar nós de origem ou destino. Encerrando.")
-            return
+            break
 
         print(f"Nó A: {A_node}, Nó B: {B_node}")
         print(f"Agora temos {G.number_of_nodes()} nós e {G.number_of_edges()} arestas no grafo.")
 
-        # 4) Executar Dijkstra (shortest_path)
+        # 4) Executar Dijkstra (uma única busca devolve caminho e distância)
         try:
-            rota = nx.shortest_path(G, A_node, B_node, weight='length')
-            distancia = nx.shortest_path_length(G, A_node, B_node, weight='length')
-            print(f"Rota encontrada! Distância: {distancia:.2f} (mesma unidade do CRS, ex: graus ou metros).")
+            distancia_m, rota = nx.single_source_dijkstra(G, A_node, B_node, weight='length')
         except nx.NetworkXNoPath:
             print("Não foi possível encontrar uma rota entre A e B.")
-            return
+            break
 
-        distancia_m = nx.shortest_path_length(G, A_node, B_node, weight='length')
         print(f"Distância de A até B = {distancia_m:.2f} metros")
 
-        #if data["output"]["output_type"] == "gpx":
-        filename = "/opt/infinitestack/etc/data/projects/"+project_id+"/output/"+points_element["from"]["name"]+"_"+points_element["to"]["name"]+".gpx"
-        filename = filename.replace(' ','-').lower()
-        gen_gpx_file(rota, filename)
+        filename = write_route(writer, expand_route(G, rota), project_id, points_element, distancia_m)
+        summaries.append(route_summary(points_element, distancia_m, filename))
+
+    return summaries + [route_summary(points_element) for points_element in points[len(summaries):]]
+
+
+def write_route(writer, rota, project_id, points_element, distance_m):
+    """Envia a rota ao writer e retorna o arquivo onde ela será gravada."""
+    name = f'{points_element["from"]["name"]} - {points_element["to"]["name"]}'
+    properties = {"from": points_element["from"]["name"], "to": points_element["to"]["name"],
+                  "distance_m": distance_m}
+    return writer.add(rota, route_filename(project_id, points_element, extension=""), name, properties)
+
+
+def expand_route(G, rota):
+    """Inclui na rota os vértices intermediários das arestas que têm 'geometry'."""
+    coords = list(rota[:1])
+    for u, v in zip(rota, rota[1:]):
+        geometry = G.edges[u, v].get("geometry")
+        if geometry is not None:
+            coords.extend(list(geometry.coords)[1:-1])
+        coords.append(v)
+    return coords
+
+
+def output_dir(project_id):
+    return "/opt/infinitestack/etc/data/projects/"+project_id+"/output/"
+
+
+def route_filename(project_id, points_element, extension=".gpx"):
+    #if data["output"]["output_type"] == "gpx":
+    filename = output_dir(project_id)+points_element["from"]["name"]+"_"+points_element["to"]["name"]+extension
+    return filename.replace(' ','-').lower()
+
+
+def matrix_filename(project_id):
+    """Caminho (sem extensão) da matriz de distâncias do projeto."""
+    return output_dir(project_id)+"distance_matrix"
+
+
+def open_route_writer(project_id, options=None, output=None):
+    """
+    RouteWriter configurado pela seção "output" do payload (output_type
+    "gpx" ou "geojson", file_name) e pelas opções combine_output e gzip.
+    Com combine_output o lote inteiro vai para <output>/<file_name>.<tipo>.
+    """
+    options = options or {}
+    output = output or {}
+    combine = bool(options.get("combine_output", False))
+    return RouteWriter(fmt=str(output.get("output_type", "gpx")).lower(),
+                       combine=combine,
+                       combined_path=output_dir(project_id) + output.get("file_name", "route") if combine else None,
+                       compress=bool(options.get("gzip", False)))
+
 
 def gen_gpx_file(rota, filename):
     """
     Gera um arquivo GPX a partir de uma lista de coordenadas em (lon, lat).
-    Cada coordenada da lista vira um <trkpt> dentro de um <trkseg>.
+    Cada coordenada da lista vira um <trkpt> dentro de um <trkseg>. Para
+    lotes, prefira RouteWriter (gravação em segundo plano, arquivo único).
     """
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        f.write(
-            '<gpx version="1.1" creator="MeuScript" '
-            'xmlns="http://www.topografix.com/GPX/1/1" '
-            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
-            'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
-            'http://www.topografix.com/GPX/1/1/gpx.xsd">\n'
-        )
-        f.write('  <trk>\n')
-        f.write('    <name>Rota Gerada</name>\n')
-        f.write('    <trkseg>\n')
-
-        for (lon, lat) in rota:
-            # GPX precisa lat="..." e lon="..."
-            # Supondo que (lon, lat) está em graus (EPSG:4326)
-            f.write(f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n')
-
-        f.write('    </trkseg>\n')
-        f.write('  </trk>\n')
-        f.write('</gpx>\n')
+        f.write(GPX_HEADER + gpx_track(rota) + GPX_FOOTER)
 
 
 def add_node_in_edge(G, point):
@@ -146,30 +579,21 @@ def add_node_in_edge(G, point):
       3) Se o grafo estiver em lat/long, você estará usando distância euclidiana
          ou geopy dentro do 'length'? Ajuste conforme sua necessidade.
       4) Se nenhuma aresta for encontrada, retornamos (G, None).
+      5) A busca usa o EdgeIndex guardado em G.graph["edge_index"] (STRtree),
+         que é atualizado aqui a cada divisão de aresta. Se G for alterado por
+         fora desta função, chame get_edge_index(G, rebuild=True).
     """
 
-    min_dist = math.inf
-    nearest_edge = None
-    nearest_line = None
+    # 1. Localizar a aresta mais próxima do 'point' através do índice
+    #    espacial do grafo (construído na primeira chamada e reaproveitado)
+    index = get_edge_index(G)
+    nearest_edge = index.nearest(point)
 
-    # 1. Localizar a aresta mais próxima do 'point'
-    for (u, v, data) in G.edges(data=True):
-        # Pegamos a geometria armazenada ou criamos a partir de (u, v)
-        line = data.get("geometry", None)
-        if line is None:
-            line = LineString([u, v])
-
-        dist = line.distance(point)
-        if dist < min_dist:
-            min_dist = dist
-            nearest_edge = (u, v, data)
-            nearest_line = line
-
-    if nearest_edge is None or nearest_line is None:
+    if nearest_edge is None:
         print("Nenhuma aresta encontrada para inserir o novo nó.")
         return G, None
 
-    (u, v, data) = nearest_edge
+    (u, v, nearest_line) = nearest_edge
 
     # 2. Projetar 'point' sobre a line para achar a posição exata
     proj_dist = nearest_line.project(point)
@@ -178,20 +602,35 @@ def add_node_in_edge(G, point):
     new_node = (x_new, y_new)
 
     # 3. Remover a aresta antiga (u->v)
+    edge_length = None
     if G.has_edge(u, v):
+        edge_length = G.edges[u, v].get("length")
         G.remove_edge(u, v)
-
-    # 4. Dividir a geometria em duas sub-linhas
-    line_a = LineString([u, new_node])
-    line_b = LineString([new_node, v])
-
-    dist_a = line_a.length
-    dist_b = line_b.length
+        index.remove_edge(u, v)
+
+    # 4. Dividir a geometria em duas sub-linhas (seguindo o desenho da via
+    #    quando a aresta foi contraída e tem vários vértices)
+    if len(nearest_line.coords) > 2:
+        line_a = LineString([u] + list(substring(nearest_line, 0, proj_dist).coords)[1:-1] + [new_node])
+        line_b = LineString([new_node] + list(substring(nearest_line, proj_dist, nearest_line.length).coords)[1:-1] + [v])
+    else:
+        line_a = LineString([u, new_node])
+        line_b = LineString([new_node, v])
+
+    # O 'length' da aresta (metros) é dividido na proporção da posição projetada
+    if edge_length is not None and nearest_line.length > 0:
+        dist_a = edge_length * proj_dist / nearest_line.length
+        dist_b = edge_length - dist_a
+    else:
+        dist_a = line_a.length
+        dist_b = line_b.length
 
     # 5. Adicionar a nova aresta (u->new_node)
     G.add_edge(u, new_node, length=dist_a, geometry=line_a)
+    index.add_edge(u, new_node, line_a)
     # 6. Adicionar a nova aresta (new_node->v)
     G.add_edge(new_node, v, length=dist_b, geometry=line_b)
+    index.add_edge(new_node, v, line_b)
 
     # 7. Assegurar que o nó novo está presente
     G.add_node(new_node)
@@ -199,16 +638,30 @@ def add_node_in_edge(G, point):
     return G, new_node
 
 
-def geojson_dict_to_G(geojson_dict):
+def get_edge_index(G, rebuild=False):
     """
-    Recebe um dicionário no formato GeoJSON (já carregado),
-    cria um GeoDataFrame, e converte para um grafo dirigido (nx.DiGraph),
-    respeitando vias de mão única ou mão dupla com base na propriedade 'oneway'.
+    Retorna o índice espacial das arestas de G, construindo-o uma única vez
+    por grafo e guardando-o em G.graph["edge_index"].
+    """
+    index = G.graph.get("edge_index")
+    if index is None or index.G is not G:
+        index = EdgeIndex(G)
+        G.graph["edge_index"] = index
+    elif rebuild:
+        index.rebuild()
+    return index
+
+
+def geojson_dict_to_G(geojson_dict, length_method="geodesic"):
+    """
+    Recebe um dicionário no formato GeoJSON (já carregado) e converte para
+    um grafo dirigido (nx.DiGraph), respeitando vias de mão única ou mão
+    dupla com base na propriedade 'oneway'.
 
     Regra de exemplo:
       - Se feature["properties"]["oneway"] == "true", insere arestas só na direção
         do vértice[i] -> vértice[i+1].
-      - Se == "false", insere arestas nas duas direções.
+      - Se == "false" (ou ausente), insere arestas nas duas direções.
 
     geojson_dict: dicionário seguindo o formato GeoJSON
                   ex: {
@@ -222,62 +675,96 @@ def geojson_dict_to_G(geojson_dict):
                         ]
                       }
 
+    length_method: "geodesic" (WGS-84, mesmo resultado do geopy com diferença
+                   < 1e-6 m) ou "haversine" (esfera, erro relativo até ~0.5 %).
+                   Ver geodesy.py.
+
     Retorna: nx.DiGraph
     """
+    lines = iter_geojson_lines(geojson_dict.get("features", []))
+    return lines_to_G(lines, length_method=length_method)
+
+
+def iter_geojson_lines(features):
+    """
+    Percorre as features GeoJSON e gera (coords, oneway) para cada LineString,
+    inclusive as partes de MultiLineString. Outras geometrias são ignoradas.
+    As coordenadas são lidas direto do dict, sem criar objetos shapely.
+    """
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        oneway_value = props.get("oneway", "false")  # default "false"
+
+        geom_type = geometry.get("type")
+        if geom_type == "LineString":
+            yield geometry["coordinates"], oneway_value
+        elif geom_type == "MultiLineString":
+            for coords in geometry["coordinates"]:
+                yield coords, oneway_value
+        # Ignora geometrias que não sejam (Multi)LineString
 
-    # 1. Converter o dict GeoJSON para um GeoDataFrame
-    #    Extraindo a geometria e as propriedades de cada feature
-    features_list = []
-    for feature in geojson_dict.get("features", []):
-        geometry = shape(feature["geometry"])  # cria uma geometria shapely
-        props = feature.get("properties", {}).copy()
-        props["geometry"] = geometry
-        features_list.append(props)
 
-    # Construir um GeoDataFrame em CRS lat/lon (EPSG:4326) – ajuste se for outro
-    gdf = gpd.GeoDataFrame(features_list, crs="EPSG:4326")
+def lines_to_G(lines, length_method="geodesic", batch_size=200_000):
+    """
+    Constrói o nx.DiGraph a partir de um iterável de (coords, oneway).
+
+    Os segmentos são acumulados em lotes de até 'batch_size' em arrays NumPy,
+    os comprimentos de cada lote são calculados numa única chamada vetorizada
+    (geodesy.segment_lengths) e as arestas são inseridas em bloco com
+    add_edges_from, na mesma ordem da inserção segmento a segmento.
+    """
+    import networkx as nx
 
-    # 2. Criar o DiGraph
     G = nx.DiGraph()
     found_lines = 0
 
-    # 3. Definir função auxiliar para inserir as arestas
-    def add_edges_between_coords(coords, oneway):
-        for i in range(len(coords) - 1):
-            lon1, lat1 = coords[i]
-            lon2, lat2 = coords[i + 1]
-
-            # Distância geodésica em metros, via geopy
-            dist_m = distance((lat1, lon1), (lat2, lon2)).meters
-
-            # Sempre adicionamos a aresta de (lon1, lat1) -> (lon2, lat2)
-            G.add_node((lon1, lat1))
-            G.add_node((lon2, lat2))
-            G.add_edge((lon1, lat1), (lon2, lat2), length=dist_m)
-
-            # Se a via não for oneway, adicionamos também a direção contrária
-            if oneway == "false":
-                G.add_edge((lon2, lat2), (lon1, lat1), length=dist_m)
-
-    # 4. Iterar nas linhas do GeoDataFrame
-    for _, row in gdf.iterrows():
-        geom = row["geometry"]
-        oneway_value = row.get("oneway", "false")  # default "false"
-
-        if isinstance(geom, LineString):
-            found_lines += 1
-            coords = list(geom.coords)
-            add_edges_between_coords(coords, oneway_value)
-
-        elif isinstance(geom, MultiLineString):
-            for line_part in geom:
-                if isinstance(line_part, LineString):
-                    found_lines += 1
-                    coords = list(line_part.coords)
-                    add_edges_between_coords(coords, oneway_value)
-        else:
-            # Ignora geometrias que não sejam (Multi)LineString
-            pass
+    batch_coords = []   # arrays (k, 2) de cada linha
+    batch_oneway = []   # bool por linha
+    batch_segments = 0
+
+    def flush():
+        if not batch_coords:
+            return
+        starts = []
+        ends = []
+        for coords in batch_coords:
+            starts.append(coords[:-1])
+            ends.append(coords[1:])
+        start = np.concatenate(starts)
+        end = np.concatenate(ends)
+        lengths = segment_lengths(start[:, 0], start[:, 1], end[:, 0], end[:, 1], method=length_method)
+
+        two_way = np.repeat(
+            np.array([not oneway for oneway in batch_oneway], dtype=bool),
+            [len(coords) - 1 for coords in batch_coords],
+        )
+
+        def edges():
+            for a, b, dist_m, both in zip(map(tuple, start.tolist()), map(tuple, end.tolist()),
+                                          lengths.tolist(), two_way.tolist()):
+                # Sempre adicionamos a aresta de (lon1, lat1) -> (lon2, lat2)
+                yield a, b, {"length": dist_m}
+                # Se a via não for oneway, adicionamos também a direção contrária
+                if both:
+                    yield b, a, {"length": dist_m}
+
+        G.add_edges_from(edges())
+        batch_coords.clear()
+        batch_oneway.clear()
+
+    for coords, oneway_value in lines:
+        found_lines += 1
+        coords = np.asarray(coords, dtype=np.float64)
+        if coords.ndim != 2 or len(coords) < 2:
+            continue
+        batch_coords.append(coords[:, :2])
+        batch_oneway.append(oneway_value != "false")
+        batch_segments += len(coords) - 1
+        if batch_segments >= batch_size:
+            flush()
+            batch_segments = 0
+    flush()
 
     if found_lines == 0:
         raise ValueError("Nenhuma (Multi)LineString encontrada no dicionário GeoJSON.")
@@ -290,7 +777,21 @@ def get_dict_from_json_file(file_path):
         return data
 
 if __name__ == '__main__':
-    args = get_cli_args()
-    print(f"PROJECT_ID → {args.project_id}")
-    workflow_id = 'router' #args.project_id
-    main(workflow_id, args.project_id)
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1].isdigit():
+        # Modo servidor: python3 package.py <porta>
+        from server import serve
+
+        args = get_server_args()
+        if args.project_id:
+            _check_name(args.project_id, "--project_id")
+        cache_options = {"cache": not args.no_cache, "cache_dir": args.cache_dir,
+                         "cache_max_bytes": args.cache_max_bytes}
+        serve(args.port, partial(handle_input, project_id=args.project_id, data_root=args.data_root,
+                                 cache_options=cache_options),
+              MemoryGraphCache(args.max_graphs, args.max_graph_bytes), host=args.host,
+              max_body_bytes=args.max_body_bytes)
+    else:
+        args = get_cli_args()
+        print(f"PROJECT_ID → {args.project_id}")
+        workflow_id = 'router' #args.project_id
+        main(workflow_id, args.project_id)
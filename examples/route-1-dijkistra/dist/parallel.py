@@ -0,0 +1,167 @@
+"""
+Execução das rotas de um lote, em série ou num pool de processos.
+
+O grafo compilado é compartilhado com os workers pelo disco: cada worker
+abre os mesmos arquivos .npy com memory-map (CompiledGraph.load), então as
+páginas ficam uma única vez no cache do sistema operacional, em vez de cada
+processo desserializar a sua própria cópia do grafo. O encaixe dos pontos
+(que precisa do STRtree) é feito uma vez no processo principal; os workers
+recebem apenas os Snaps e montam o QueryOverlay de cada tarefa.
+"""
+import os
+import shutil
+import tempfile
+
+from ch import ContractionHierarchy
+from graph_cache import CompiledGraph
+from overlay import QueryOverlay
+from search import astar, bidirectional_dijkstra, dijkstra, great_circle_heuristic, path_to
+
+ENGINES = ("dijkstra", "bidirectional", "astar", "ch")
+
+_WORKER_GRAPH = None
+
+
+def point_to_point(graph, overlay, source, target, engine):
+    """Busca ponto a ponto com o motor escolhido. Retorna (distância, caminho) ou None."""
+    if engine == "bidirectional":
+        return bidirectional_dijkstra(overlay.successors, overlay.predecessors, source, target)
+    if engine == "astar":
+        heuristic = great_circle_heuristic(overlay.coord, overlay.coord(target))
+        return astar(overlay.successors, source, target, heuristic)
+    if engine == "ch":
+        return graph.ch.query(overlay, source, target)
+    raise ValueError(f"Motor de busca desconhecido: {engine} (use um de {ENGINES})")
+
+
+def route_group(graph, origin_snap, dest_snaps, engine="dijkstra"):
+    """
+    Roteia uma origem para vários destinos. Com engine="dijkstra" uma única
+    busca atende todos os destinos; os demais motores fazem uma busca ponto
+    a ponto por destino. Retorna, na ordem de 'dest_snaps',
+    (distância, [(lon, lat), ...]) ou None quando o destino é inalcançável.
+    """
+    overlay = QueryOverlay(graph)
+    A_node = overlay.add(origin_snap)
+    B_nodes = [overlay.add(snap) for snap in dest_snaps]
+
+    results = []
+    if engine == "dijkstra":
+        dist, pred = dijkstra(overlay.successors, A_node, set(B_nodes))
+        for B_node in B_nodes:
+            if B_node not in dist:
+                results.append(None)
+            else:
+                results.append((dist[B_node], overlay.path_coords(path_to(pred, B_node))))
+        return results
+
+    for B_node in B_nodes:
+        found = point_to_point(graph, overlay, A_node, B_node, engine)
+        if found is None:
+            results.append(None)
+        else:
+            results.append((found[0], overlay.path_coords(found[1])))
+    return results
+
+
+def prepare_engine(graph, engine):
+    """
+    Prepara o que o motor precisa antes das consultas. Para "ch" carrega a
+    hierarquia gravada junto do grafo no cache ou, se ainda não existir,
+    constrói e grava para as próximas execuções.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de busca desconhecido: {engine} (use um de {ENGINES})")
+    if engine != "ch" or graph.ch is not None:
+        return graph
+
+    if graph.path is not None:
+        graph.ch = ContractionHierarchy.load(graph.path)
+    if graph.ch is None:
+        print("Construindo a hierarquia de contração...")
+        graph.ch = ContractionHierarchy.build(graph)
+        if graph.path is not None:
+            graph.ch.save(graph.path)
+    return graph
+
+
+def _init_worker(graph_path, engine):
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = CompiledGraph.load(graph_path, mmap=True)
+    if engine == "ch":
+        _WORKER_GRAPH.ch = ContractionHierarchy.load(graph_path)
+
+
+def _run_task(task):
+    fn, args = task
+    return fn(_WORKER_GRAPH, *args)
+
+
+def split_tasks(tasks, workers):
+    """
+    Quando há menos origens do que workers (ex.: uma única usina com
+    centenas de talhões), divide os destinos das maiores origens em blocos
+    para que todos os workers tenham trabalho. Retorna a lista de tarefas e,
+    para cada uma, o índice da tarefa original a que ela pertence.
+    """
+    if len(tasks) >= workers:
+        return tasks, list(range(len(tasks)))
+
+    total = sum(len(dests) for _, dests in tasks)
+    split, owners = [], []
+    for i, (origin, dests) in enumerate(tasks):
+        parts = max(1, min(len(dests), round(workers * len(dests) / max(total, 1))))
+        size = -(-len(dests) // parts)
+        for start in range(0, len(dests), size):
+            split.append((origin, dests[start:start + size]))
+            owners.append(i)
+    return split, owners
+
+
+def run_route_tasks(graph, tasks, workers=1, engine="dijkstra"):
+    """
+    Executa as tarefas [(origin_snap, [dest_snap, ...]), ...] e retorna os
+    resultados de route_group na mesma ordem das tarefas, independente da
+    ordem em que os workers terminam.
+    """
+    workers = max(1, int(workers or 1))
+    if workers == 1 or len(tasks) == 0:
+        return [route_group(graph, origin, dests, engine) for origin, dests in tasks]
+
+    split, owners = split_tasks(tasks, workers)
+    partial = map_in_pool(graph, route_group, [(origin, dests, engine) for origin, dests in split],
+                          workers, engine)
+
+    results = [[] for _ in tasks]
+    for owner, chunk in zip(owners, partial):
+        results[owner].extend(chunk)
+    return results
+
+
+def map_in_pool(graph, fn, tasks, workers, engine="dijkstra"):
+    """
+    Executa fn(graph, *args) para cada 'args' de 'tasks' num pool de
+    processos e retorna os resultados na ordem de 'tasks'. 'fn' precisa ser
+    uma função de módulo (é enviada aos workers por pickle) e 'graph' é
+    aberto em cada worker por memory-map.
+    """
+    tmp_dir = None
+    graph_path = graph.path
+    if graph_path is None or not os.path.exists(graph_path):
+        # Grafo fora do cache: grava numa pasta temporária (em memória, se
+        # /dev/shm existir) só para esta execução
+        tmp_dir = tempfile.mkdtemp(prefix="is-graph-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        graph.save(tmp_dir)
+        if graph.ch is not None:
+            graph.ch.save(tmp_dir)
+        graph_path = tmp_dir
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=_init_worker, initargs=(str(graph_path), engine)) as pool:
+            return list(pool.map(_run_task, [(fn, args) for args in tasks]))
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
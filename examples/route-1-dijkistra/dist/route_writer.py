@@ -0,0 +1,179 @@
+"""
+Gravação das rotas calculadas (GPX ou GeoJSON).
+
+O RouteWriter recebe as rotas do laço de roteamento e as formata e grava
+numa thread separada, através de uma fila limitada: o roteamento não
+espera pelo disco e, se o disco ficar para trás, a fila cheia segura o
+produtor em vez de acumular rotas na memória. O texto é montado em blocos
+grandes (buffer_size) antes de cada write.
+
+  • combine=False – um arquivo por rota (comportamento original); em
+                    GeoJSON, uma FeatureCollection com uma única Feature
+  • combine=True  – um único arquivo para o lote: GPX com um <trk> por rota
+                    ou GeoJSON FeatureCollection com uma Feature por rota
+  • compress=True – arquivos .gz (gzip)
+"""
+import gzip
+import json
+import queue
+import threading
+
+OUTPUT_FORMATS = ("gpx", "geojson")
+BUFFER_SIZE = 1 << 20
+QUEUE_SIZE = 256
+
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="MeuScript" '
+    'xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
+    'http://www.topografix.com/GPX/1/1/gpx.xsd">\n'
+)
+GPX_FOOTER = '</gpx>\n'
+GEOJSON_HEADER = '{"type":"FeatureCollection","features":[\n'
+GEOJSON_FOOTER = '\n]}\n'
+
+
+def _xml_escape(text):
+    return str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def gpx_track(rota, name="Rota Gerada"):
+    """<trk> com um <trkseg> e um <trkpt> por coordenada (lon, lat) de 'rota'."""
+    # GPX precisa lat="..." e lon="..."; as coordenadas estão em (lon, lat), EPSG:4326
+    points = "".join(f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n' for lon, lat in rota)
+    return f'  <trk>\n    <name>{_xml_escape(name)}</name>\n    <trkseg>\n{points}    </trkseg>\n  </trk>\n'
+
+
+def geojson_feature(rota, properties=None):
+    """Feature GeoJSON (LineString) da rota, como texto."""
+    return json.dumps({"type": "Feature",
+                       "properties": properties or {},
+                       "geometry": {"type": "LineString", "coordinates": [list(c) for c in rota]}},
+                      separators=(",", ":"))
+
+
+class RouteWriter:
+    """
+    Grava rotas em segundo plano. Uso:
+
+        with RouteWriter("gpx", combine=True, combined_path=".../route") as writer:
+            path = writer.add(rota, filename, name, properties)
+
+    add() retorna o arquivo onde a rota vai ficar; close() (chamado ao sair
+    do with) espera a fila esvaziar, fecha os arquivos e repassa qualquer
+    erro de gravação ocorrido na thread.
+    """
+
+    def __init__(self, fmt="gpx", combine=False, combined_path=None, compress=False,
+                 buffer_size=BUFFER_SIZE, queue_size=QUEUE_SIZE):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de saída desconhecido: {fmt} (use um de {OUTPUT_FORMATS})")
+        if combine and not combined_path:
+            raise ValueError("combined_path é obrigatório com combine=True")
+        self.fmt = fmt
+        self.combine = combine
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.suffix = "." + fmt + (".gz" if compress else "")
+        self.combined_path = combined_path + self.suffix if combine else None
+        self.files = []
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="route-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def path(self, filename):
+        """Arquivo de uma rota gravada separadamente ('filename' sem extensão)."""
+        return filename + self.suffix
+
+    def add(self, rota, filename=None, name="Rota Gerada", properties=None):
+        if self._error is not None:
+            raise self._error
+        path = self.combined_path if self.combine else self.path(filename)
+        self._queue.put((rota, path, name, properties))
+        return path
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.files
+
+    # ------------------------------------------------------------------
+    # Thread de gravação
+    # ------------------------------------------------------------------
+    def _open(self, path):
+        self.files.append(path)
+        if self.compress:
+            return gzip.open(path, "wb", compresslevel=6)
+        return open(path, "wb", buffering=self.buffer_size)
+
+    def _header(self):
+        return GPX_HEADER if self.fmt == "gpx" else GEOJSON_HEADER
+
+    def _format(self, rota, name, properties):
+        if self.fmt == "gpx":
+            return gpx_track(rota, name)
+        return geojson_feature(rota, properties)
+
+    def _run(self):
+        combined = None
+        pending = []
+        pending_size = 0
+        first = True
+        done = False
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    done = True
+                    break
+                rota, path, name, properties = item
+                text = self._format(rota, name, properties)
+
+                if not self.combine:
+                    footer = GPX_FOOTER if self.fmt == "gpx" else GEOJSON_FOOTER
+                    text = self._header() + text + footer
+                    with self._open(path) as f:
+                        f.write(text.encode("utf-8"))
+                    continue
+
+                if combined is None:
+                    combined = self._open(path)
+                    pending.append(self._header())
+                if self.fmt == "geojson" and not first:
+                    pending.append(",\n")
+                first = False
+                pending.append(text)
+                pending_size += len(text)
+                if pending_size >= self.buffer_size:
+                    combined.write("".join(pending).encode("utf-8"))
+                    pending.clear()
+                    pending_size = 0
+
+            if self.combine:
+                if combined is None:
+                    # Lote sem nenhuma rota: o arquivo combinado é gravado vazio
+                    combined = self._open(self.combined_path)
+                    pending.append(self._header())
+                pending.append(GPX_FOOTER if self.fmt == "gpx" else GEOJSON_FOOTER)
+                combined.write("".join(pending).encode("utf-8"))
+        except Exception as e:
+            self._error = e
+            # Continua consumindo a fila para o produtor não ficar bloqueado
+            while not done:
+                done = self._queue.get() is None
+        finally:
+            if combined is not None:
+                combined.close()
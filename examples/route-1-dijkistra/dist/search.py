@@ -0,0 +1,169 @@
+"""
+Buscas de caminho mínimo usadas pelo roteador.
+"""
+import heapq
+import math
+from itertools import count
+
+from geodesy import EARTH_RADIUS_M
+
+HEURISTIC_FACTOR = 0.99
+
+
+def dijkstra(successors, source, targets=None):
+    """
+    Dijkstra de origem única. 'successors(u)' retorna as arestas de saída
+    de u como (v, length) – ex.: QueryOverlay.successors ou
+    CompiledGraph.successors.
+
+    Se 'targets' for informado, a busca para assim que todos eles tiverem
+    distância definitiva, em vez de percorrer o grafo inteiro. Uma única
+    busca atende então todos os destinos de uma mesma origem.
+
+    Retorna (dist, pred): distância final de cada nó fixado e o predecessor
+    de cada nó alcançado, para reconstruir os caminhos com path_to().
+    """
+    remaining = set(targets) if targets is not None else None
+    if remaining is not None:
+        remaining.discard(source)
+
+    dist = {}
+    seen = {source: 0.0}
+    pred = {source: None}
+    c = count()
+    heap = [(0.0, next(c), source)]
+
+    while heap:
+        d, _, u = heapq.heappop(heap)
+        if u in dist:
+            continue
+        dist[u] = d
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        for v, length in successors(u):
+            vd = d + length
+            if v not in dist and (v not in seen or vd < seen[v]):
+                seen[v] = vd
+                pred[v] = u
+                heapq.heappush(heap, (vd, next(c), v))
+
+    return dist, pred
+
+
+def path_to(pred, target):
+    """Reconstrói o caminho origem -> target a partir do dicionário de predecessores."""
+    path = [target]
+    node = pred[target]
+    while node is not None:
+        path.append(node)
+        node = pred[node]
+    path.reverse()
+    return path
+
+
+def bidirectional_dijkstra(successors, predecessors, source, target):
+    """
+    Dijkstra bidirecional ponto a ponto: uma busca parte da origem pelas
+    arestas de saída e outra do destino pelas arestas de entrada, sempre
+    avançando a de menor fronteira. Para quando a soma das duas fronteiras
+    alcança o melhor caminho já encontrado.
+
+    Retorna (distância, caminho) ou None se não houver caminho.
+    """
+    if source == target:
+        return 0.0, [source]
+
+    neighbors = (successors, predecessors)
+    dist = ({}, {})
+    seen = ({source: 0.0}, {target: 0.0})
+    pred = ({source: None}, {target: None})
+    c = count()
+    heaps = ([(0.0, next(c), source)], [(0.0, next(c), target)])
+
+    best = math.inf
+    meet = None
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, _, u = heapq.heappop(heaps[side])
+        if u in dist[side]:
+            continue
+        dist[side][u] = d
+
+        other = seen[1 - side]
+        for v, length in neighbors[side](u):
+            vd = d + length
+            if v not in dist[side] and (v not in seen[side] or vd < seen[side][v]):
+                seen[side][v] = vd
+                pred[side][v] = u
+                heapq.heappush(heaps[side], (vd, next(c), v))
+            if v in other and v in seen[side]:
+                total = seen[side][v] + other[v]
+                if total < best:
+                    best = total
+                    meet = v
+
+    if meet is None:
+        return None
+
+    path = path_to(pred[0], meet)
+    node = pred[1][meet]
+    while node is not None:
+        path.append(node)
+        node = pred[1][node]
+    return best, path
+
+
+def astar(successors, source, target, heuristic):
+    """
+    A* ponto a ponto. 'heuristic(u)' deve ser uma estimativa admissível (que
+    nunca superestima) da distância de u até o destino. Nós podem ser
+    reabertos quando um caminho melhor aparece, então a heurística não
+    precisa ser consistente para o resultado ser ótimo.
+
+    Retorna (distância, caminho) ou None se não houver caminho.
+    """
+    g = {source: 0.0}
+    pred = {source: None}
+    c = count()
+    heap = [(heuristic(source), next(c), 0.0, source)]
+
+    while heap:
+        _, _, gu, u = heapq.heappop(heap)
+        if gu > g[u]:
+            continue
+        if u == target:
+            return gu, path_to(pred, target)
+        for v, length in successors(u):
+            ng = gu + length
+            if v not in g or ng < g[v]:
+                g[v] = ng
+                pred[v] = u
+                heapq.heappush(heap, (ng + heuristic(v), next(c), ng, v))
+
+    return None
+
+
+def great_circle_heuristic(coord, target_coord, factor=HEURISTIC_FACTOR):
+    """
+    Heurística do A*: distância de grande círculo (haversine) até o destino,
+    multiplicada por 'factor' < 1. A esfera pode superestimar a geodésica do
+    elipsoide WGS-84 em até ~0.5 %, então o fator 0.99 mantém a heurística
+    admissível para comprimentos 'geodesic' e 'haversine'.
+    """
+    lon_t, lat_t = target_coord
+    lat_t = math.radians(lat_t)
+    cos_t = math.cos(lat_t)
+    scale = 2.0 * EARTH_RADIUS_M * factor
+
+    def heuristic(node):
+        lon, lat = coord(node)
+        lat = math.radians(lat)
+        a = (math.sin((lat_t - lat) / 2.0) ** 2
+             + math.cos(lat) * cos_t * math.sin(math.radians(lon_t - lon) / 2.0) ** 2)
+        return scale * math.asin(math.sqrt(min(a, 1.0)))
+
+    return heuristic
@@ -0,0 +1,168 @@
+"""
+Modo servidor do roteador (python3 package.py <porta>).
+
+Um processo de longa duração que atende POST /input, uma thread por
+requisição (ThreadingHTTPServer). Os imports pesados e os grafos já
+carregados ficam na memória entre as chamadas, então uma requisição sobre
+um mapa já visto paga só o encaixe dos pontos e as buscas.
+
+Rotas:
+  • POST /input   – corpo JSON no formato do README; responde com as rotas
+                    e o tempo de cada etapa (timings_ms)
+  • GET  /metrics – latências (p50/p90/p99/máx) das últimas requisições,
+                    por etapa, contadores de status e estado do LRU de grafos
+  • GET  /health  – "ok"
+
+O serviço não tem autenticação e por padrão ouve só em 127.0.0.1. Erros de
+validação (RequestError) voltam com a sua mensagem; os demais voltam com
+uma mensagem genérica e o detalhe fica só no log do processo, para que uma
+requisição não consiga ler o conteúdo de arquivos pelas mensagens de erro:
+400 para um corpo malformado, 500 para falhas do servidor (inclusive de E/S,
+como uma pasta de saída inexistente). Corpos maiores que max_body_bytes são
+recusados com 413 antes de serem lidos.
+"""
+import json
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+DEFAULT_METRICS_WINDOW = 1000
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class RequestError(ValueError):
+    """Requisição inválida; a mensagem pode ser devolvida ao cliente."""
+    status = 400
+
+
+class PayloadTooLarge(RequestError):
+    """Corpo acima do limite do servidor (max_body_bytes)."""
+    status = 413
+
+
+class LatencyMetrics:
+    """Janela das últimas requisições, com os tempos (s) de cada etapa."""
+
+    def __init__(self, window=DEFAULT_METRICS_WINDOW):
+        self.started = time.time()
+        self._samples = deque(maxlen=window)
+        self._status = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, status, timings):
+        with self._lock:
+            self._status[status] += 1
+            self._samples.append(timings)
+
+    def snapshot(self):
+        with self._lock:
+            samples = list(self._samples)
+            status = dict(self._status)
+
+        stages = {}
+        for timings in samples:
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, []).append(seconds)
+
+        latency_ms = {}
+        for stage, values in stages.items():
+            values = np.asarray(values) * 1000
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            latency_ms[stage] = {"count": len(values), "mean": float(values.mean()),
+                                 "p50": float(p50), "p90": float(p90), "p99": float(p99),
+                                 "max": float(values.max())}
+
+        return {"uptime_s": time.time() - self.started,
+                "requests": sum(status.values()),
+                "status": {str(code): count for code, count in status.items()},
+                "window": len(samples),
+                "latency_ms": latency_ms}
+
+
+class RouteRequestHandler(BaseHTTPRequestHandler):
+    server_version = "InfiniteStackRouter/1.0"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = self.server.metrics.snapshot()
+            body["graphs"] = self.server.graphs.stats()
+            self._send_json(200, body)
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"Rota desconhecida: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/input":
+            self._send_json(404, {"error": f"Rota desconhecida: {self.path}"})
+            return
+
+        start = time.perf_counter()
+        timings = {}
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise RequestError("Content-Length inválido.")
+            if length > self.server.max_body_bytes:
+                # O corpo não é lido, então a conexão não pode ser reaproveitada
+                self.close_connection = True
+                raise PayloadTooLarge(f"Corpo da requisição maior que {self.server.max_body_bytes} bytes.")
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            timings["parse"] = time.perf_counter() - start
+            body = self.server.handle(payload, self.server.graphs, timings)
+            status = 200
+        except RequestError as e:
+            status, body = e.status, {"error": str(e)}
+        except (KeyError, ValueError, TypeError):
+            traceback.print_exc()
+            status, body = 400, {"error": "Requisição inválida."}
+        except Exception:
+            traceback.print_exc()
+            status, body = 500, {"error": "Erro interno."}
+
+        timings["total"] = time.perf_counter() - start
+        self.server.metrics.record(status, timings)
+        body["timings_ms"] = {stage: seconds * 1000 for stage, seconds in timings.items()}
+        self._send_json(status, body)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+
+def serve(port, handle, graphs, host=DEFAULT_HOST, metrics_window=DEFAULT_METRICS_WINDOW,
+          max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+    """
+    Atende requisições até o processo ser interrompido.
+
+    handle(payload, graphs, timings) processa o corpo de um POST /input,
+    registra em 'timings' o tempo (s) de cada etapa e retorna o dict da
+    resposta. 'graphs' é o MemoryGraphCache compartilhado pelas threads.
+    Corpos com mais de 'max_body_bytes' bytes são recusados com 413.
+    """
+    httpd = ThreadingHTTPServer((host, port), RouteRequestHandler)
+    httpd.daemon_threads = True
+    httpd.handle = handle
+    httpd.graphs = graphs
+    httpd.metrics = LatencyMetrics(metrics_window)
+    httpd.max_body_bytes = max_body_bytes
+
+    print(f"Roteador ouvindo em http://{host}:{port} (POST /input, GET /metrics)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
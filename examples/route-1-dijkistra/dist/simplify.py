@@ -0,0 +1,127 @@
+"""
+Simplificação topológica do grafo viário: contração de cadeias de grau 2.
+
+Uma estrada sinuosa desenhada com 200 vértices e sem cruzamentos vira 200
+nós em geojson_dict_to_G. Aqui cada cadeia de nós "de passagem" é trocada
+por uma única aresta entre os nós das pontas, com o comprimento somado e a
+geometria completa (LineString com todos os vértices), de modo que a saída
+GPX continua seguindo o desenho da via.
+
+Um nó x é de passagem quando tem exatamente dois vizinhos distintos a e b e:
+  • mão única: entra só a->x e sai só x->b;
+  • mão dupla: a->x, x->b, b->x e x->a.
+"""
+from shapely.geometry import LineString
+
+
+def _pass_through(G, x):
+    """Retorna True se x é um nó de passagem (grau 2) que pode ser contraído."""
+    succ = G._succ[x]
+    pred = G._pred[x]
+    if x in succ:
+        return False
+    neighbors = set(succ) | set(pred)
+    if len(neighbors) != 2:
+        return False
+    if len(succ) == 1 and len(pred) == 1:
+        return set(succ) != set(pred)
+    return len(succ) == 2 and len(pred) == 2
+
+
+def _edge_coords(u, v, data):
+    geometry = data.get("geometry")
+    if geometry is not None and len(geometry.coords) > 2:
+        return list(geometry.coords)
+    return [u, v]
+
+
+def _chains(G, contractible, anchors):
+    """
+    Percorre, a partir de cada ponta, cada cadeia de nós de passagem:
+    gera (ponta, nós internos, nó final).
+    """
+    for anchor in anchors:
+        for first in G._succ[anchor]:
+            interior = []
+            prev, node = anchor, first
+            while node in contractible:
+                interior.append(node)
+                prev, node = node, next(w for w in G._succ[node] if w != prev)
+            yield anchor, interior, node
+
+
+def _ring_nodes(G, start):
+    """Nós do anel de nós de passagem que contém 'start'."""
+    ring = [start]
+    prev, node = start, next(iter(G._succ[start]))
+    while node != start:
+        ring.append(node)
+        prev, node = node, next(w for w in G._succ[node] if w != prev)
+    return ring
+
+
+def _extra_anchors(chains, contractible):
+    """
+    Nós de passagem que precisam virar ponta para que nenhuma via se perca:
+    o nó do meio de cada cadeia que volta à própria ponta (laço) ou que liga
+    o mesmo par de nós, na mesma direção, que outra aresta ou cadeia (fica
+    a com menos nós internos). Também um nó de cada anel sem cruzamentos.
+    """
+    extra = set()
+    reached = set()
+    by_ends = {}
+    for anchor, interior, end in chains:
+        reached.update(interior)
+        if anchor == end and interior:
+            extra.add(interior[len(interior) // 2])
+        else:
+            by_ends.setdefault((anchor, end), []).append(interior)
+    for interiors in by_ends.values():
+        interiors.sort(key=len)
+        extra.update(interior[len(interior) // 2] for interior in interiors[1:])
+    return extra, contractible - reached
+
+
+def contract_degree2(G, weight="length"):
+    """
+    Retorna um novo nx.DiGraph com as cadeias de nós de grau 2 contraídas.
+
+    Cada aresta resultante guarda a soma de 'weight' da cadeia e, quando
+    contraída, a 'geometry' (LineString) com todos os vértices do caminho.
+    Toda via do grafo original continua representada: quando uma cadeia
+    viraria um laço na própria ponta ou repetiria o par (origem, destino)
+    de outra aresta, um nó do meio dela é mantido como ponta (o DiGraph só
+    guarda uma aresta por par). Anéis sem nenhum cruzamento também mantêm
+    nós como pontas.
+    """
+    import networkx as nx
+
+    contractible = {x for x in G if _pass_through(G, x)}
+    while True:
+        anchors = [x for x in G if x not in contractible]
+        chains = list(_chains(G, contractible, anchors))
+        extra, unreached = _extra_anchors(chains, contractible)
+        # Anéis formados só por nós de passagem: um dos nós vira ponta
+        for x in G:
+            if x in unreached:
+                extra.add(x)
+                unreached.difference_update(_ring_nodes(G, x))
+        if not extra:
+            break
+        contractible -= extra
+
+    H = nx.DiGraph()
+    H.add_nodes_from(anchors)
+    for anchor, interior, end in chains:
+        path = [anchor, *interior, end]
+        coords = []
+        length = 0.0
+        for u, v in zip(path, path[1:]):
+            data = G._succ[u][v]
+            coords.extend(_edge_coords(u, v, data)[1 if coords else 0:])
+            length += data[weight]
+        attrs = {weight: length}
+        if len(coords) > 2:
+            attrs["geometry"] = LineString(coords)
+        H.add_edge(anchor, end, **attrs)
+    return H
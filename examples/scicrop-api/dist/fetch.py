@@ -0,0 +1,176 @@
+"""
+Concurrent fetching of SciCrop API endpoints.
+
+Fetcher.fetch_all() runs the endpoint calls on a bounded thread pool:
+  - each distinct coordinate is fetched once, however many times it appears
+    (the last `remembered` coordinates are kept in memory; older repeats
+    come from the ResponseCache, if any);
+  - every worker thread reuses its own SciCropClient (and its connections);
+  - calls are spaced by a shared rate limiter and retried with exponential
+    backoff;
+  - at most `max_in_flight` calls are pending at a time, and results are
+    yielded in input order as soon as they are ready;
+  - with a ResponseCache, responses younger than its TTL are reused across
+    runs instead of calling the endpoint again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from infinitestack.scicrop_api import SciCropClient
+
+ENDPOINT = "weather-current"
+MAX_WORKERS = 8
+RATE_LIMIT = 20.0
+MAX_RETRIES = 3
+BACKOFF = 0.5
+CACHE_PATH = "/tmp/is/cache/scicrop-api.sqlite"
+CACHE_TTL = 900.0
+REMEMBERED = 10_000
+
+
+class RateLimiter:
+    """Spaces calls at least 1 / rate seconds apart across all threads (rate <= 0 disables it)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def coordinate_key(data):
+    return data["lat"], data["lon"]
+
+
+class ResponseCache:
+    """
+    Endpoint responses stored in a SQLite file, keyed on (endpoint, lat, lon).
+    The coordinates are the ones sent to the API, so after grid snapping
+    nearby points share an entry. Entries older than ttl seconds are
+    ignored and replaced.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "endpoint TEXT, lat TEXT, lon TEXT, fetched REAL, response TEXT, "
+                "PRIMARY KEY (endpoint, lat, lon))")
+
+    def get(self, endpoint, data):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched, response FROM responses WHERE endpoint = ? AND lat = ? AND lon = ?",
+                (endpoint, data["lat"], data["lon"])).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return json.loads(row[1])
+
+    def put(self, endpoint, data, response):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (endpoint, data["lat"], data["lon"], time.time(), json.dumps(response)))
+
+    def purge(self):
+        """Deletes the expired entries."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM responses WHERE fetched < ?", (time.time() - self.ttl,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Fetcher:
+
+    def __init__(self, endpoint=ENDPOINT, max_workers=MAX_WORKERS, rate_limit=RATE_LIMIT,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF, client_factory=SciCropClient,
+                 cache=None):
+        self.endpoint = endpoint
+        self.max_workers = max(1, int(max_workers))
+        self.max_in_flight = 4 * self.max_workers
+        self.remembered = max(REMEMBERED, self.max_in_flight)
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = backoff
+        self.client_factory = client_factory
+        self.cache = cache
+        self.limiter = RateLimiter(rate_limit)
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.client_factory()
+        return client
+
+    def fetch(self, data):
+        """
+        Calls the endpoint for one coordinate (or reads it from the cache),
+        retrying failures with exponential backoff.
+        """
+        if self.cache is not None:
+            response = self.cache.get(self.endpoint, data)
+            if response is not None:
+                return response
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            try:
+                response = self._client().call_endpoint(self.endpoint, data)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"Request for lat: {data['lat']}, lon: {data['lon']} failed ({e}), "
+                      f"retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if self.cache is not None:
+                self.cache.put(self.endpoint, data, response)
+            return response
+
+    def fetch_all(self, data_list):
+        """
+        Yields (data, response) for every item of data_list (any iterable,
+        consumed lazily), in order. Items with the same coordinate share a
+        single call.
+        """
+        futures = OrderedDict()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for data in data_list:
+                key = coordinate_key(data)
+                future = futures.get(key)
+                if future is None:
+                    future = futures[key] = pool.submit(self.fetch, data)
+                    if len(futures) > self.remembered:
+                        futures.popitem(last=False)
+                else:
+                    futures.move_to_end(key)
+                pending.append((data, future))
+                if len(pending) >= self.max_in_flight:
+                    data, future = pending.popleft()
+                    yield data, future.result()
+            while pending:
+                data, future = pending.popleft()
+                yield data, future.result()
@@ -0,0 +1,134 @@
+"""
+Streaming reader for large GeoJSON files.
+
+json.load builds every dict and list of the document at once. Here the file
+is read in chunks and each feature of "features" is decoded on its own
+(json.JSONDecoder.raw_decode over the current chunk), handed to the caller
+and dropped, so memory is bounded by the read chunk and one feature.
+
+The same reader as route-1-dijkistra's geojson_stream.py (each dist is
+self-contained), without the content hash the router uses for its graph
+cache.
+"""
+import json
+import re
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+    """Cursor over a JSON text file read in chunks."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Reads one more chunk (at least as long as what is still unconsumed)."""
+        if self.eof:
+            return False
+        pending = self.buf[self.pos:]
+        chunk = self.f.read(max(self.chunk_size, len(pending)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = pending + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next character after whitespace, or "" at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Invalid JSON: expected one of {chars!r}, found {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        """Decodes the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value cut at the end of the chunk: read more and retry
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the chunk may go on in the next one
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def object_keys(self):
+        """
+        Walks a JSON object, yielding its keys. The consumer must read
+        (value()) or walk the value of each key before asking for the next.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def array_items(self):
+        """Yields each element of a JSON array."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+class GeoJSONStream:
+    """
+    Features of the GeoJSON document stored at 'path', inside the object
+    given by 'prefix' (e.g. () for a file that is the FeatureCollection
+    itself). Can be iterated several times; each iteration reads the file
+    again.
+    """
+
+    def __init__(self, path, prefix=(), chunk_size=CHUNK_SIZE):
+        self.path = Path(path)
+        self.prefix = tuple(prefix)
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            reader = _Reader(f, self.chunk_size)
+            for name in self.prefix:
+                for key in reader.object_keys():
+                    if key == name:
+                        break
+                    reader.value()
+                else:
+                    return
+            for key in reader.object_keys():
+                if key != "features":
+                    reader.value()
+                    continue
+                yield from reader.array_items()
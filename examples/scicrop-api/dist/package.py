@@ -1,154 +1,155 @@
 import argparse
-import json
 from pathlib import Path
 from infinitestack.scicrop_api import SciCropClient
 from infinitestack import orm
 from infinitestack import package_wrapper
 
+from fetch import (BACKOFF, CACHE_PATH, CACHE_TTL, MAX_RETRIES, MAX_WORKERS, RATE_LIMIT,
+                   Fetcher, ResponseCache)
+from geojson_stream import GeoJSONStream
+from sampling import SAMPLING_MODES, feature_requests, geometry_vertices
+from writer import BATCH_SIZE, BatchWriter
+
 
 def process_response_data(data):
     client = SciCropClient()
     return client.call_endpoint("weather-current", data)
 
 
-def process_request_data(workflow_id):
+def validate_features(features, sampling="vertices"):
+    """
+    Checks every feature, down to its vertices, before any request is made,
+    so an invalid feature stops the run before anything is written to the
+    databases. 'features' may be any iterable, such as a GeoJSONStream.
+    """
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling} (use one of {SAMPLING_MODES})")
+
+    found = False
+    for feature in features:
+        found = True
+        geometry = feature.get('geometry')
+        properties = feature.get('properties', {})
+
+        if not properties.get('label'):
+            raise ValueError(
+                f"Missing 'label' in properties: {feature}")
+
+        if not geometry:
+            raise ValueError(f"Missing geometry in feature: {feature}")
+
+        if not geometry.get('type') or geometry.get('coordinates') is None:
+            raise ValueError(f"Invalid geometry in feature: {feature}")
+
+        for vertex in geometry_vertices(geometry['type'], geometry['coordinates']):
+            if len(vertex) != 2 or not all(
+                    isinstance(v, (int, float)) and not isinstance(v, bool) for v in vertex):
+                raise ValueError(f"Invalid coordinates in feature: {feature}")
+
+    if not found:
+        raise ValueError("No features found in GeoJSON")
+
+
+def iter_request_data(workflow_id, sampling="vertices", grid=None):
+    # The GeoJSON file is read twice, one feature at a time: a first pass
+    # validates every feature, and the second yields their requests, so
+    # neither the document nor the full request list is ever in memory
     file_path = Path(f'/tmp/is/{workflow_id}.json')
 
     if not file_path.exists():
         print(f'File {file_path} not found')
         exit(1)
 
+    features = GeoJSONStream(file_path, ())
     try:
-        with open(file_path, 'r') as f:
-            geojson = json.load(f)
-            features = geojson.get('features', [])
-
-            if not features:
-                raise ValueError("No features found in GeoJSON")
-
-            data_list = []
-
-            for feature in features:
-                geometry = feature.get('geometry')
-                properties = feature.get('properties', {})
-                label = properties.get('label')
-
-                if not label:
-                    raise ValueError(
-                        f"Missing 'label' in properties: {feature}")
-
-                if not geometry:
-                    raise ValueError(f"Missing geometry in feature: {feature}")
-
-                geom_type = geometry.get('type')
-                coordinates = geometry.get('coordinates')
-
-                if not geom_type or coordinates is None:
-                    raise ValueError(f"Invalid geometry in feature: {feature}")
-
-                if geom_type == 'Point':
-                    lon, lat = coordinates
-                    data_list.append({
-                        'lat': str(lat),
-                        'lon': str(lon),
-                        'label': label
-                    })
-
-                elif geom_type == 'LineString':
-                    for coord in coordinates:
-                        lon, lat = coord
-                        data_list.append({
-                            'lat': str(lat),
-                            'lon': str(lon),
-                            'label': label
-                        })
-
-                elif geom_type == 'Polygon':
-                    for ring in coordinates:
-                        for coord in ring:
-                            lon, lat = coord
-                            data_list.append({
-                                'lat': str(lat),
-                                'lon': str(lon),
-                                'label': label
-                            })
-
-                elif geom_type == 'MultiPoint':
-                    for coord in coordinates:
-                        lon, lat = coord
-                        data_list.append({
-                            'lat': str(lat),
-                            'lon': str(lon),
-                            'label': label
-                        })
-
-                elif geom_type == 'MultiLineString':
-                    for line in coordinates:
-                        for coord in line:
-                            lon, lat = coord
-                            data_list.append({
-                                'lat': str(lat),
-                                'lon': str(lon),
-                                'label': label
-                            })
-
-                elif geom_type == 'MultiPolygon':
-                    for polygon in coordinates:
-                        for ring in polygon:
-                            for coord in ring:
-                                lon, lat = coord
-                                data_list.append({
-                                    'lat': str(lat),
-                                    'lon': str(lon),
-                                    'label': label
-                                })
-
-                else:
-                    raise ValueError(f"Unsupported geometry type: {geom_type}")
-
-            return data_list
-
+        validate_features(features, sampling)
     except Exception as e:
         print(f"Error processing file: {e}")
         exit(1)
 
+    # Points already requested, per label: at most one entry per distinct
+    # sampled point, fewer than the vertices of the document.
+    seen_by_label = {}
+
+    for feature in features:
+        geometry = feature['geometry']
+        label = feature['properties']['label']
+        seen = seen_by_label.setdefault(label, set())
+        yield from feature_requests(
+            label, geometry['type'], geometry['coordinates'], sampling, grid, seen)
+
 
-def build_request(data):
-    json_response = process_response_data(data)
+def process_request_data(workflow_id, sampling="vertices", grid=None):
+    return list(iter_request_data(workflow_id, sampling, grid))
+
+
+def build_request(data, json_response=None):
+    if json_response is None:
+        json_response = process_response_data(data)
     request = package_wrapper.build_requests(
         "scicrop-api", json_response, extra_fields={"label": data["label"]})
     return request
 
 
-def save_database(data_list, database_names, project_name):
+def save_database(data_list, database_names, project_name, fetcher=None,
+                  batch_size=BATCH_SIZE):
+    # data_list may be a generator: each coordinate is fetched once,
+    # concurrently, as it arrives, and the results are written to every
+    # target database in batches
+    fetcher = fetcher or Fetcher()
+
+    orms = []
     for database in database_names:
         my_orm = orm.Orm(database)
         my_orm.set_project(project_name)
+        orms.append(my_orm)
 
-        for data in data_list:
+    with BatchWriter(orms, batch_size) as writer:
+        for data, json_response in fetcher.fetch_all(data_list):
             print(
                 f"Processing data for lat: {data['lat']}, lon: {data['lon']}")
-            request = build_request(data)
-            my_orm.insert_data_json(request)
+            writer.add(build_request(data, json_response))
 
 
 def get_database_names_from_package():
     return package_wrapper.get_database_names_from_package("scicrop-api")
 
 
-def main(workflow_id, project_name):
+def main(workflow_id, project_name, fetcher=None, sampling="vertices", grid=None,
+         batch_size=BATCH_SIZE):
     database_names = get_database_names_from_package()
-    data_list = process_request_data(workflow_id)
-    save_database(data_list, database_names, project_name)
+    data_list = iter_request_data(workflow_id, sampling, grid)
+    save_database(data_list, database_names, project_name, fetcher, batch_size)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--workflow_id', type=str, required=True)
     parser.add_argument('--project_name', type=str, required=True)
+    parser.add_argument('--max_workers', type=int, default=MAX_WORKERS,
+                        help='Concurrent API requests')
+    parser.add_argument('--rate_limit', type=float, default=RATE_LIMIT,
+                        help='Maximum API requests per second (0 = unlimited)')
+    parser.add_argument('--max_retries', type=int, default=MAX_RETRIES,
+                        help='Retries per failed API request')
+    parser.add_argument('--backoff', type=float, default=BACKOFF,
+                        help='Initial retry delay in seconds, doubled on each retry')
+    parser.add_argument('--sampling', choices=SAMPLING_MODES, default='vertices',
+                        help='Points requested per geometry')
+    parser.add_argument('--grid', type=float, default=None,
+                        help='Snap points to a grid of this resolution, in degrees')
+    parser.add_argument('--cache_ttl', type=float, default=CACHE_TTL,
+                        help='Seconds a cached API response stays valid (0 = no cache)')
+    parser.add_argument('--cache_path', type=str, default=CACHE_PATH,
+                        help='SQLite file of the response cache')
+    parser.add_argument('--batch_size', type=int, default=BATCH_SIZE,
+                        help='Records buffered before each database write')
     args, _ = parser.parse_known_args()
 
     workflow_id = args.workflow_id
     project_name = args.project_name
+    cache = ResponseCache(args.cache_path, args.cache_ttl) if args.cache_ttl > 0 else None
+    fetcher = Fetcher(max_workers=args.max_workers, rate_limit=args.rate_limit,
+                      max_retries=args.max_retries, backoff=args.backoff, cache=cache)
 
-    main(workflow_id, project_name)
+    main(workflow_id, project_name, fetcher, args.sampling, args.grid, args.batch_size)
@@ -0,0 +1,172 @@
+"""
+Reduction of GeoJSON geometries to the points sent to the weather endpoint.
+
+  - vertices (default): every vertex, as before, but without repeats (for
+    example the closing vertex of each polygon ring);
+  - centroid: one point per polygon, its area-weighted centroid (points and
+    lines keep their vertices);
+  - representative: like centroid, but moved inside the polygon when the
+    centroid falls outside it (concave or holed polygons).
+
+With a grid resolution (in degrees) every point is snapped to the centre of
+its grid cell, so vertices a few metres apart collapse into one request.
+Points are deduplicated per label after snapping.
+"""
+import math
+
+SAMPLING_MODES = ("vertices", "centroid", "representative")
+
+
+def geometry_vertices(geom_type, coordinates):
+    """Yields every (lon, lat) vertex of a GeoJSON geometry."""
+    if geom_type == 'Point':
+        yield tuple(coordinates[:2])
+    elif geom_type in ('LineString', 'MultiPoint'):
+        for coord in coordinates:
+            yield tuple(coord[:2])
+    elif geom_type in ('Polygon', 'MultiLineString'):
+        for ring in coordinates:
+            for coord in ring:
+                yield tuple(coord[:2])
+    elif geom_type == 'MultiPolygon':
+        for polygon in coordinates:
+            for ring in polygon:
+                for coord in ring:
+                    yield tuple(coord[:2])
+    else:
+        raise ValueError(f"Unsupported geometry type: {geom_type}")
+
+
+def _ring_area_centroid(ring, origin):
+    """
+    Signed area and centroid of a closed or open ring (shoelace formula),
+    computed relative to 'origin' to avoid cancellation with small fields
+    far from (0, 0).
+    """
+    ox, oy = origin
+    area = cx = cy = 0.0
+    n = len(ring)
+    for i in range(n):
+        x0, y0 = ring[i][0] - ox, ring[i][1] - oy
+        x1, y1 = ring[(i + 1) % n][0] - ox, ring[(i + 1) % n][1] - oy
+        cross = x0 * y1 - x1 * y0
+        area += cross
+        cx += (x0 + x1) * cross
+        cy += (y0 + y1) * cross
+    area /= 2.0
+    if not area:
+        return 0.0, (sum(c[0] for c in ring) / n, sum(c[1] for c in ring) / n)
+    return area, (ox + cx / (6.0 * area), oy + cy / (6.0 * area))
+
+
+def polygon_centroid(polygon):
+    """
+    Centroid of a polygon (list of rings, the first one exterior), holes
+    subtracted. Degenerate or self-intersecting rings whose centroid falls
+    outside the bounding box fall back to the mean of the vertices.
+    """
+    exterior = polygon[0]
+    origin = tuple(exterior[0][:2])
+    outer_area, outer = _ring_area_centroid(exterior, origin)
+    if not outer_area:
+        return outer
+    total = abs(outer_area)
+    x, y = outer[0] * total, outer[1] * total
+    for hole in polygon[1:]:
+        area, (hx, hy) = _ring_area_centroid(hole, origin)
+        area = abs(area)
+        total -= area
+        x -= hx * area
+        y -= hy * area
+    if total > 0:
+        x, y = x / total, y / total
+    else:
+        x, y = outer
+    xs = [c[0] for c in exterior]
+    ys = [c[1] for c in exterior]
+    if not (min(xs) <= x <= max(xs) and min(ys) <= y <= max(ys)):
+        return sum(xs) / len(xs), sum(ys) / len(ys)
+    return x, y
+
+
+def _ring_contains(ring, x, y):
+    inside = False
+    n = len(ring)
+    for i in range(n):
+        x0, y0 = ring[i][:2]
+        x1, y1 = ring[(i + 1) % n][:2]
+        if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+    return inside
+
+
+def polygon_contains(polygon, x, y):
+    return _ring_contains(polygon[0], x, y) and not any(_ring_contains(h, x, y) for h in polygon[1:])
+
+
+def representative_point(polygon):
+    """
+    The centroid if it lies inside the polygon. Otherwise the midpoint of
+    the widest interior segment of the horizontal line through the
+    centroid.
+    """
+    x, y = polygon_centroid(polygon)
+    if polygon_contains(polygon, x, y):
+        return x, y
+    crossings = []
+    for ring in polygon:
+        n = len(ring)
+        for i in range(n):
+            x0, y0 = ring[i][:2]
+            x1, y1 = ring[(i + 1) % n][:2]
+            if (y0 > y) != (y1 > y):
+                crossings.append(x0 + (y - y0) * (x1 - x0) / (y1 - y0))
+    crossings.sort()
+    segments = list(zip(crossings[0::2], crossings[1::2]))
+    if not segments:
+        return x, y
+    left, right = max(segments, key=lambda s: s[1] - s[0])
+    return (left + right) / 2.0, y
+
+
+def _polygons(geom_type, coordinates):
+    if geom_type == 'Polygon':
+        return [coordinates]
+    if geom_type == 'MultiPolygon':
+        return coordinates
+    return None
+
+
+def sample_points(geom_type, coordinates, mode="vertices"):
+    """(lon, lat) points of a geometry according to the sampling mode."""
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {mode} (use one of {SAMPLING_MODES})")
+    polygons = _polygons(geom_type, coordinates) if mode != "vertices" else None
+    if not polygons:
+        return list(geometry_vertices(geom_type, coordinates))
+    reduce = polygon_centroid if mode == "centroid" else representative_point
+    return [reduce(polygon) for polygon in polygons if polygon and polygon[0]]
+
+
+def snap(value, grid):
+    """Centre of the grid cell containing value, as a string."""
+    centre = (math.floor(value / grid) + 0.5) * grid
+    return str(round(centre, 10))
+
+
+def feature_requests(label, geom_type, coordinates, mode="vertices", grid=None, seen=None):
+    """
+    Yields the {'lat', 'lon', 'label'} requests of one feature. 'seen' holds
+    the (lat, lon) already requested for this label, so features sharing a
+    label are deduplicated together.
+    """
+    seen = set() if seen is None else seen
+    for lon, lat in sample_points(geom_type, coordinates, mode):
+        if grid:
+            key = (snap(lat, grid), snap(lon, grid))
+        else:
+            key = (str(lat), str(lon))
+        if key in seen:
+            continue
+        seen.add(key)
+        yield {'lat': key[0], 'lon': key[1], 'label': label}
@@ -0,0 +1,46 @@
+"""
+Batched writes of built requests to the target databases.
+
+BatchWriter buffers up to batch_size requests and then writes the whole
+batch to every database through its infinitestack.orm.Orm, so database
+work happens in a few large bursts while the fetch pool keeps running,
+and the first rows land as soon as the first batch is full.
+"""
+BATCH_SIZE = 500
+
+
+class BatchWriter:
+
+    def __init__(self, orms, batch_size=BATCH_SIZE):
+        self.orms = list(orms)
+        self.batch_size = max(1, int(batch_size))
+        self.buffer = []
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On an error the pending, partial batch is dropped rather than
+        # written; batches flushed before the error stay in the databases
+        if exc_type is None:
+            self.flush()
+        else:
+            self.buffer = []
+
+    def add(self, request):
+        self.buffer.append(request)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return 0
+        batch, self.buffer = self.buffer, []
+        for my_orm in self.orms:
+            for request in batch:
+                my_orm.insert_data_json(request)
+        self.written += len(batch)
+        print(f"Inserted {len(batch)} records into {len(self.orms)} database(s) "
+              f"({self.written} so far)")
+        return len(batch)